@@ -0,0 +1,73 @@
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+# Уникальный индекс по lower(email), см. миграцию 0011
+EMAIL_INDEX = 'catalog_user_email_ci_uniq'
+
+
+
+def duplicate_email_accounts(user_model=User):
+    """
+    Пользователи, чей email без учёта регистра есть ещё у кого-то: (id, имя, email),
+    сгруппированные по адресу. Модель передаёт миграция 0011 (историческая версия)
+    """
+    duplicates = (
+        user_model.objects.exclude(email='').annotate(email_lower=Lower('email'))
+        .values('email_lower').annotate(total=Count('pk')).filter(total__gt=1)
+        .values_list('email_lower', flat=True)
+    )
+    accounts = user_model.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=list(duplicates))
+    return list(accounts.order_by('email_lower', 'pk').values_list('pk', 'username', 'email'))
+
+class DuplicateUser(Exception):
+    """Имя или email уже заняты; field - поле формы, к которому относится ошибка"""
+
+    def __init__(self, field):
+        super().__init__(field)
+        self.field = field
+
+
+def _duplicate_field(error):
+    message = str(error)
+    if EMAIL_INDEX in message:
+        return 'email'
+    if 'username' in message:
+        return 'username'
+    return None
+
+
+def register_user(username, email, password, full_name):
+    """
+    Создаёт пользователя одним INSERT без предварительных проверок.
+    Уникальность имени и email проверяет БД; нарушение превращается в DuplicateUser.
+    """
+    # В режиме autocommit одиночный INSERT атомарен сам по себе, BEGIN/COMMIT лишние.
+    # Внутри внешней транзакции нужна точка сохранения, чтобы ошибка не сломала её
+    connection = transaction.get_connection()
+    block = transaction.atomic() if connection.in_atomic_block else nullcontext()
+    try:
+        with block:
+            return User.objects.create_user(username=username, email=email, password=password, first_name=full_name)
+    except IntegrityError as error:
+        field = _duplicate_field(error)
+        if field is None:
+            raise
+        raise DuplicateUser(field) from error
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 с числом итераций из settings.PASSWORD_HASH_ITERATIONS.
+    Имя алгоритма прежнее, поэтому старые хэши проверяются, а при входе
+    пересчитываются с новым числом итераций.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS or PBKDF2PasswordHasher.iterations
@@ -1,9 +1,27 @@
 ﻿
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.admin.options import ShowFacets
+from django.contrib.admin.templatetags.admin_urls import add_preserved_filters
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR, PAGE_VAR
 from django import forms
+from django.db.models import Sum
+from django.http import HttpResponseRedirect
+from django.urls import reverse
+from django.utils import timezone
+from django.template.response import TemplateResponse
 from django.utils.html import format_html
-from .models import Category, Application, ApplicationImage
-from .forms import AdminApplicationForm
+from .models import Category, Application, ApplicationImage, Job
+from .forms import AdminApplicationForm, BulkStatusForm
+from .counters import counted_total
+from .deletion import ADMIN_DELETE_LIMIT, category_deletion_report, deletes_in_background, enqueue_category_deletion
+from .jobs import enqueue_on_commit
+from .pagination import CountedPaginator
+from .search import search_applications
+from .transitions import bulk_change_status, skipped_message
+
+# Фильтры списка заявок, по которым количество берётся из ApplicationCounter
+COUNTER_FILTERS = {'status__exact': 'status', 'category__id__exact': 'category_id'}
 
 
 @admin.register(Category)
@@ -11,10 +29,72 @@ class CategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'applications_count')
     search_fields = ('name',)
 
+    def get_queryset(self, request):
+        # Количество берётся из денормализованных счётчиков, а не COUNT по заявкам
+        return super().get_queryset(request).annotate(applications_total=Sum('counters__count'))
+
     def applications_count(self, obj):
-        return obj.application_set.count()
+        return obj.applications_total or 0
 
     applications_count.short_description = 'Количество заявок'
+    applications_count.admin_order_field = 'applications_total'
+
+    def get_deleted_objects(self, objs, request):
+        # Стандартная страница подтверждения загружает все связанные объекты в память,
+        # для большой категории показываем только количества
+        deleted_objects = []
+        model_count = {Category._meta.verbose_name_plural: 0, Application._meta.verbose_name_plural: 0}
+        for category in objs:
+            report = category_deletion_report(category)
+            deleted_objects.append(
+                f'{category}: заявок {report["applications"]}, '
+                f'изображений {report["images"]}, файлов {report["files"]}'
+            )
+            model_count[Category._meta.verbose_name_plural] += 1
+            model_count[Application._meta.verbose_name_plural] += report['applications']
+
+        perms_needed = set()
+        if not request.user.has_perm('catalog.delete_application'):
+            perms_needed.add(Application._meta.verbose_name)
+        return deleted_objects, model_count, perms_needed, []
+
+    def delete_model(self, request, obj):
+        # ModelAdmin.delete_view удаляет в одной транзакции: пачки Category.delete
+        # стали бы в ней точками сохранения, и база была бы заблокирована до конца.
+        # Небольшую категорию удаляем сразу, большую - фоновой задачей
+        if deletes_in_background(obj):
+            enqueue_category_deletion(obj)
+            request.queued_category_deletions = getattr(request, 'queued_category_deletions', set()) | {obj.pk}
+        else:
+            obj.delete()
+
+    def response_delete(self, request, obj_display, obj_id):
+        if obj_id not in getattr(request, 'queued_category_deletions', ()):
+            return super().response_delete(request, obj_display, obj_id)
+        self.message_user(request, self.queued_message([obj_display]), messages.WARNING)
+        post_url = reverse(f'admin:{self.opts.app_label}_{self.opts.model_name}_changelist')
+        preserved_filters = self.get_preserved_filters(request)
+        return HttpResponseRedirect(
+            add_preserved_filters({'preserved_filters': preserved_filters, 'opts': self.opts}, post_url)
+        )
+
+    def delete_queryset(self, request, queryset):
+        # QuerySet.delete() не вызывает Category.delete, а значит и пакетное удаление заявок
+        queued = []
+        for category in queryset:
+            if deletes_in_background(category):
+                enqueue_category_deletion(category)
+                queued.append(str(category))
+            else:
+                category.delete()
+        if queued:
+            self.message_user(request, self.queued_message(queued), messages.WARNING)
+
+    def queued_message(self, names):
+        return (
+            f'Заявок больше {ADMIN_DELETE_LIMIT}, категории будут удалены фоновой задачей: {", ".join(names)}. '
+            f'Удалить сразу можно командой manage.py delete_category'
+        )
 
 
 class ApplicationImageInline(admin.TabularInline):
@@ -25,18 +105,69 @@ class ApplicationImageInline(admin.TabularInline):
 
     def preview(self, obj):
         if obj.image:
-            return format_html('<img src="{}" style="max-height: 100px; max-width: 150px;" />', obj.image.url)
+            return format_html('<img src="{}" style="max-height: 100px; max-width: 150px;" />', obj.preview_url)
         return "Нет изображения"
 
     preview.short_description = 'Предпросмотр'
 
 
+def counter_filters(params):
+    """
+    Фильтры для counted_total, если выборку списка заявок можно посчитать по
+    счётчикам: только фильтры по статусу и категории. Иначе None
+    """
+    filters = {}
+    for name, value in params.items():
+        if name in (ORDER_VAR, PAGE_VAR):
+            continue
+        if name not in COUNTER_FILTERS or (name == 'category__id__exact' and not value.isdigit()):
+            return None
+        filters[COUNTER_FILTERS[name]] = value
+    return filters
+
+
+class ApplicationChangeList(ChangeList):
+    def get_filters(self, request):
+        filter_specs, has_filters, lookup_params, may_have_duplicates, has_active_filters = super().get_filters(request)
+        # Диапазон навигации по датам применяется в get_queryset отдельно, см. там
+        self.date_range = None
+        if self.date_hierarchy and f'{self.date_hierarchy}__year' in self.params:
+            self.date_range = {
+                lookup: lookup_params.pop(f'{self.date_hierarchy}__{lookup}')[0] for lookup in ('gte', 'lt')
+            }
+        return filter_specs, has_filters, lookup_params, may_have_duplicates, has_active_filters
+
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        # Без явной сортировки по колонке результаты поиска идут по релевантности.
+        # Аннотация search_rank появляется только после поиска, поэтому сортировка здесь
+        if self.query.strip() and ORDER_VAR not in self.params:
+            queryset = queryset.order_by('search_rank', '-created_at', '-pk')
+        # Выборка без диапазона дат нужна {% indexed_date_hierarchy %}: SQLite берёт
+        # по индексу только одну нижнюю границу, и при двух диапазонах по created_at
+        # поиск месяца внутри года начинался бы с начала года
+        self.undated_queryset = queryset
+        if self.date_range:
+            queryset = queryset.filter(**{
+                f'{self.date_hierarchy}__{lookup}': value for lookup, value in self.date_range.items()
+            })
+        return queryset
+
+
 @admin.register(Application)
 class ApplicationAdmin(admin.ModelAdmin):
     form = AdminApplicationForm
     list_display = ('title', 'user', 'category', 'status', 'created_at', 'admin_actions')
     list_filter = ('status', 'category', 'created_at')
+    list_select_related = ('user', 'category')
     search_fields = ('title', 'user__username', 'description')
+    # Навигация по датам использует индекс app_created_idx
+    date_hierarchy = 'created_at'
+    # На миллионах заявок полный COUNT(*) и подсчёт фасетов занимают больше,
+    # чем сама страница: общее количество не показывается, а количество
+    # выборки берётся из счётчиков или кэша, см. get_paginator
+    show_full_result_count = False
+    show_facets = ShowFacets.NEVER
     readonly_fields = ('created_at', 'user', 'title', 'description', 'category', 'can_change_status_display')
     fieldsets = (
         ('Информация о заявке', {
@@ -47,6 +178,47 @@ class ApplicationAdmin(admin.ModelAdmin):
         }),
     )
     inlines = [ApplicationImageInline]
+    actions = ['change_status']
+
+    @admin.action(description='Изменить статус выбранных заявок', permissions=['change'])
+    def change_status(self, request, queryset):
+        # Сначала показывается форма общего комментария, затем она отправляется с apply
+        form = BulkStatusForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            updated, skipped = bulk_change_status(
+                queryset.values_list('pk', flat=True), form.cleaned_data['status'], form.cleaned_data['comment'],
+            )
+            status = dict(Application.STATUS_CHOICES)[form.cleaned_data['status']]
+            self.message_user(request, f'Статус "{status}" установлен у заявок: {len(updated)}', messages.SUCCESS)
+            if skipped:
+                self.message_user(request, skipped_message(skipped), messages.WARNING)
+            return None
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Изменение статуса заявок',
+            'opts': self.model._meta,
+            'form': form,
+            'selected': request.POST.getlist(ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+            'action': 'change_status',
+        }
+        return TemplateResponse(request, 'admin/catalog/application/change_status.html', context)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Полнотекстовый поиск вместо LIKE '%...%' по всем search_fields
+        if not search_term.strip():
+            return queryset, False
+        return search_applications(queryset, search_term), False
+
+    def get_changelist(self, request, **kwargs):
+        return ApplicationChangeList
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        # get_paginator вызывается и для истории изменений, там счётчики не подходят
+        filters = counter_filters(request.GET) if queryset.model is Application else None
+        count = counted_total(**filters) if filters is not None else None
+        return CountedPaginator(queryset, per_page, orphans, allow_empty_first_page, count=count)
 
     def can_change_status_display(self, obj):
         if obj.can_change_status():
@@ -69,11 +241,16 @@ class ApplicationAdmin(admin.ModelAdmin):
 
         design_image = form.cleaned_data.get('design_image')
         if design_image and obj.status == 'completed':
-            ApplicationImage.objects.create(
+            application_image = ApplicationImage.objects.create(
                 application=obj,
                 image=design_image,
                 image_type='design'
             )
+            enqueue_on_commit(
+                'process_image',
+                key=f'process_image:{application_image.pk}',
+                image_id=application_image.pk,
+            )
 
         super().save_model(request, obj, form, change)
 
@@ -82,11 +259,28 @@ class ApplicationAdmin(admin.ModelAdmin):
 class ApplicationImageAdmin(admin.ModelAdmin):
     list_display = ('application', 'image_type', 'uploaded_at', 'preview')
     list_filter = ('image_type', 'uploaded_at')
-    readonly_fields = ('uploaded_at', 'preview')
+    list_select_related = ('application__user',)
+    show_full_result_count = False
+    paginator = CountedPaginator
+    readonly_fields = ('uploaded_at', 'preview', 'width', 'height')
 
     def preview(self, obj):
         if obj.image:
-            return format_html('<img src="{}" style="max-height: 100px; max-width: 150px;" />', obj.image.url)
+            return format_html('<img src="{}" style="max-height: 100px; max-width: 150px;" />', obj.preview_url)
         return "Нет изображения"
 
-    preview.short_description = 'Предпросмотр'
\ No newline at end of file
+    preview.short_description = 'Предпросмотр'
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('key', 'kind', 'status', 'attempts', 'run_after', 'updated_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('key',)
+    readonly_fields = ('kind', 'key', 'payload', 'attempts', 'locked_at', 'last_error', 'created_at', 'updated_at')
+    actions = ['retry']
+
+    @admin.action(description='Поставить в очередь повторно', permissions=['change'])
+    def retry(self, request, queryset):
+        updated = queryset.exclude(status='running').update(status='pending', attempts=0, run_after=timezone.now())
+        self.message_user(request, f'Задач поставлено в очередь: {updated}')
@@ -0,0 +1,191 @@
+# JSON для дашбордов: строки берутся через values(), без моделей и шаблонов
+import functools
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Sum
+from django.http import HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.http import require_GET
+
+from .models import Application, ApplicationCounter, Category
+from .pagination import CursorEncoder, InvalidCursor, KeysetPaginator
+
+# Поле ответа -> путь в ORM
+APPLICATION_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'description': 'description',
+    'status': 'status',
+    'category_id': 'category_id',
+    'category': 'category__name',
+    'user': 'user__username',
+    'admin_comment': 'admin_comment',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+APPLICATION_DEFAULT_FIELDS = ('id', 'title', 'status', 'category', 'user', 'created_at', 'updated_at')
+# Ключ курсора и версия строки для ETag нужны всегда, даже если клиент их не запросил
+APPLICATION_REQUIRED_PATHS = ('id', 'created_at', 'updated_at')
+# Значения из связанных таблиц: переименование категории или пользователя не меняет
+# updated_at заявки, поэтому при выводе они тоже входят в ETag
+APPLICATION_JOINED_PATHS = ('category__name', 'user__username')
+
+CATEGORY_FIELDS = {'id': 'id', 'name': 'name', 'applications': 'applications'}
+
+API_PER_PAGE = 100
+API_MAX_PER_PAGE = 1000
+# Сколько строк кодируется в JSON за один фрагмент ответа
+STREAM_CHUNK_ROWS = 200
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def api_view(view):
+    """
+    Только GET и только для сотрудников. Ошибки возвращаются в JSON,
+    а не редиректом на страницу входа
+    """
+    @require_GET
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not (request.user.is_active and request.user.is_staff):
+            return JsonResponse({'error': 'Доступ только для сотрудников'}, status=403)
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({'error': str(error)}, status=error.status)
+    return wrapper
+
+
+def selected_fields(request, available, default):
+    """Поля из параметра fields=a,b,c или поля по умолчанию"""
+    value = request.GET.get('fields')
+    if not value:
+        return list(default)
+    fields = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in available]
+    if unknown or not fields:
+        raise ApiError(f'Неизвестные поля: {", ".join(unknown)}. Доступны: {", ".join(available)}')
+    return fields
+
+
+def int_param(request, name, default=None, maximum=None):
+    value = request.GET.get(name)
+    if value in (None, ''):
+        return default
+    if not value.isdigit() or int(value) < 1:
+        raise ApiError(f'{name}: ожидается положительное целое число')
+    return min(int(value), maximum) if maximum else int(value)
+
+
+def etag_response(request, etag, build):
+    """304, если клиент прислал тот же ETag, иначе ответ из build() с заголовком ETag"""
+    etag = quote_etag(etag)
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = build()
+    response['ETag'] = etag
+    # Ответ зависит от того, кто его запросил
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def content_etag(data):
+    # CursorEncoder сохраняет микросекунды: правка строки в ту же миллисекунду тоже меняет ETag
+    return hashlib.md5(json.dumps(data, cls=CursorEncoder).encode(), usedforsecurity=False).hexdigest()
+
+
+def stream_json(rows, fields, paths, extra):
+    """
+    JSON-объект {"results": [...], **extra} по частям, без сборки всей строки ответа.
+    Сами строки уже загружены: ETag считается по ним до отправки заголовков,
+    а их число ограничено API_MAX_PER_PAGE
+    """
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    yield '{"results":['
+    for start in range(0, len(rows), STREAM_CHUNK_ROWS):
+        chunk = rows[start:start + STREAM_CHUNK_ROWS]
+        prefix = ',' if start else ''
+        yield prefix + ','.join(
+            encoder.encode({name: row[path] for name, path in zip(fields, paths)}) for row in chunk
+        )
+    yield '],' + encoder.encode(extra)[1:]
+
+
+@api_view
+def applications(request):
+    """
+    Заявки по убыванию даты создания, страница за страницей по курсору.
+    Параметры: fields, status, category, limit, cursor (из next или previous предыдущего ответа)
+    """
+    fields = selected_fields(request, APPLICATION_FIELDS, APPLICATION_DEFAULT_FIELDS)
+    paths = [APPLICATION_FIELDS[name] for name in fields]
+    per_page = int_param(request, 'limit', API_PER_PAGE, API_MAX_PER_PAGE)
+
+    queryset = Application.objects.all()
+    status = request.GET.get('status')
+    if status:
+        if status not in dict(Application.STATUS_CHOICES):
+            raise ApiError(f'Неизвестный статус: {status}')
+        queryset = queryset.filter(status=status)
+    category_id = int_param(request, 'category')
+    if category_id:
+        queryset = queryset.filter(category_id=category_id)
+
+    queryset = queryset.values(*dict.fromkeys([*paths, *APPLICATION_REQUIRED_PATHS]))
+    paginator = KeysetPaginator(queryset, ordering=('-created_at', '-id'), per_page=per_page)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise ApiError('Неверный курсор')
+
+    rows = page.object_list
+    # Строки страницы и их updated_at: изменение, удаление или новая строка меняют ETag
+    joined = [path for path in paths if path in APPLICATION_JOINED_PATHS]
+    etag = content_etag([
+        request.GET.urlencode(),
+        [(row['id'], row['updated_at'], *(row[path] for path in joined)) for row in rows],
+    ])
+    extra = {'next': page.next_cursor, 'previous': page.previous_cursor}
+    return etag_response(request, etag, lambda: StreamingHttpResponse(
+        stream_json(rows, fields, paths, extra), content_type='application/json',
+    ))
+
+
+@api_view
+def categories(request):
+    """Категории с количеством заявок из счётчиков. Параметр: fields"""
+    fields = selected_fields(request, CATEGORY_FIELDS, CATEGORY_FIELDS)
+    rows = Category.objects.order_by('pk').annotate(applications=Sum('counters__count')).values(
+        'id', 'name', 'applications',
+    )
+    results = []
+    for row in rows:
+        row['applications'] = row['applications'] or 0
+        results.append({name: row[name] for name in fields})
+    data = {'results': results}
+    return etag_response(
+        request, content_etag(data), lambda: JsonResponse(data, json_dumps_params={'ensure_ascii': False}),
+    )
+
+
+@api_view
+def status_counts(request):
+    """
+    Количество заявок по статусам из счётчиков, всего или в категории.
+    Параметр: category
+    """
+    counters = ApplicationCounter.objects.all()
+    category_id = int_param(request, 'category')
+    if category_id:
+        counters = counters.filter(category_id=category_id)
+    totals = dict(counters.order_by().values('status').annotate(total=Sum('count')).values_list('status', 'total'))
+    data = {'results': {status: totals.get(status) or 0 for status, _ in Application.STATUS_CHOICES}}
+    return etag_response(request, content_etag(data), lambda: JsonResponse(data))
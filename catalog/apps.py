@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CatalogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'catalog'
+
+    def ready(self):
+        # signals и timing подключают обработчики сигналов, thumbnails и deletion регистрируют фоновые задачи
+        from . import deletion, signals, thumbnails, timing  # noqa: F401
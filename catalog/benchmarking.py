@@ -0,0 +1,99 @@
+import asyncio
+import math
+import time
+
+
+def percentile(values, q):
+    """Перцентиль методом ближайшего ранга; values должны быть отсортированы"""
+    if not values:
+        return None
+    rank = max(math.ceil(q / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def summarize(durations, elapsed, errors=0):
+    """Сводка по длительностям запросов в секундах: запросы в секунду и перцентили в миллисекундах"""
+    durations = sorted(durations)
+    return {
+        'requests': len(durations),
+        'errors': errors,
+        'rps': len(durations) / elapsed if elapsed else 0.0,
+        'p50': percentile(durations, 50) * 1000 if durations else None,
+        'p95': percentile(durations, 95) * 1000 if durations else None,
+        'p99': percentile(durations, 99) * 1000 if durations else None,
+    }
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Соединение закрыто сервером')
+    status = int(status_line.split()[1])
+
+    length = None
+    keep_alive = True
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'connection' and value.strip().lower() == 'close':
+            keep_alive = False
+
+    if length is None:
+        await reader.read()
+        keep_alive = False
+    else:
+        await reader.readexactly(length)
+    return status, keep_alive
+
+
+async def load(host, port, paths, total, concurrency, headers=None):
+    """
+    Нагрузка на HTTP-сервер: concurrency соединений с keep-alive,
+    каждое последовательно отправляет запросы по кругу из paths.
+    Возвращает (длительности успешных запросов, число ошибок, общее время).
+    """
+    extra = ''.join(f'{name}: {value}\r\n' for name, value in (headers or {}).items())
+    requests = [
+        f'GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n{extra}\r\n'.encode()
+        for path in paths
+    ]
+    counter = iter(range(total))
+    durations = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        reader = writer = None
+        for number in counter:
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(host, port)
+                started = time.perf_counter()
+                writer.write(requests[number % len(requests)])
+                await writer.drain()
+                status, keep_alive = await _read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError, OSError, ValueError, IndexError):
+                errors += 1
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+                continue
+
+            if status < 400:
+                durations.append(time.perf_counter() - started)
+            else:
+                errors += 1
+            if not keep_alive:
+                writer.close()
+                reader = writer = None
+        if writer is not None:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return durations, errors, time.perf_counter() - started
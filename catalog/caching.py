@@ -0,0 +1,123 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+from .counters import status_count
+from .models import Application
+
+INDEX_TIMEOUT = 60 * 15
+INDEX_STALE_TIMEOUT = 60 * 60 * 24
+INDEX_LOCK_TIMEOUT = 30
+
+INDEX_GENERATION_KEY = 'catalog:index:generation'
+INDEX_STALE_KEY = 'catalog:index:stale'
+
+# Статусы, которые видны на главной странице
+INDEX_STATUSES = ('in_progress', 'completed')
+
+# Фрагменты {% cache %} со строками заявок в списках. Ключ содержит
+# updated_at, поэтому после save() строка сама получает новый ключ;
+# имя пользователя и категории входят в ключ, так как тоже выводятся в строке
+ROW_FRAGMENTS = ('admin_application_row', 'my_application_row')
+
+
+def _new_generation():
+    # Если счётчик вытеснен из кэша, новое поколение не должно совпасть со старыми ключами
+    return time.time_ns()
+
+
+def _index_generation():
+    generation = cache.get(INDEX_GENERATION_KEY)
+    if generation is None:
+        cache.add(INDEX_GENERATION_KEY, _new_generation(), None)
+        generation = cache.get(INDEX_GENERATION_KEY)
+    return generation
+
+
+def build_index_context():
+    """Собирает контекст главной страницы из БД"""
+    completed_applications = Application.objects.filter(
+        status='completed'
+    ).with_related().with_cover_image().order_by('-created_at')[:4]
+
+    cards = []
+    for application in completed_applications:
+        cover = application.cover_image
+        cards.append({
+            'title': application.title,
+            'created_at': application.created_at,
+            'category_name': application.category.name,
+            'image_url': cover.display_url if cover else None,
+            'image_srcset': cover.srcset if cover else '',
+        })
+
+    return {
+        'completed_applications': cards,
+        'in_progress_count': status_count('in_progress'),
+    }
+
+
+def get_index_context():
+    """
+    Контекст главной страницы из кэша.
+
+    Ключ содержит номер поколения, который увеличивается при каждой инвалидации,
+    поэтому результат, посчитанный до изменения, не попадёт в новое поколение.
+    Пересчитывает только тот воркер, который первым захватил блокировку
+    поколения, остальные до этого момента отдают последнюю готовую копию.
+    """
+    generation = _index_generation()
+    key = f'catalog:index:{generation}'
+
+    context = cache.get(key)
+    if context is not None:
+        return context
+
+    if cache.add(f'{key}:lock', True, INDEX_LOCK_TIMEOUT):
+        try:
+            context = build_index_context()
+            cache.set(key, context, INDEX_TIMEOUT)
+            cache.set(INDEX_STALE_KEY, context, INDEX_STALE_TIMEOUT)
+        finally:
+            cache.delete(f'{key}:lock')
+        return context
+
+    context = cache.get(INDEX_STALE_KEY)
+    if context is not None:
+        return context
+
+    # Холодный кэш: копии ещё нет, ждать соседа бессмысленно
+    return build_index_context()
+
+
+async def aget_index_context():
+    """
+    Асинхронный вариант get_index_context для ASGI.
+    Попадание в кэш обходится без потока; промах, с блокировкой и запросами
+    к БД, выполняется синхронной версией в потоке.
+    """
+    generation = await cache.aget(INDEX_GENERATION_KEY)
+    if generation is not None:
+        context = await cache.aget(f'catalog:index:{generation}')
+        if context is not None:
+            return context
+    return await sync_to_async(get_index_context)()
+
+
+def invalidate_index_context():
+    # Другие процессы увидят новое поколение, только если кэш общий, см. CACHES в settings
+    try:
+        cache.incr(INDEX_GENERATION_KEY)
+    except ValueError:
+        cache.add(INDEX_GENERATION_KEY, _new_generation(), None)
+
+
+def row_fragment_keys(application):
+    vary_on = [application.pk, application.updated_at, application.user.username, application.category.name]
+    return [make_template_fragment_key(fragment, vary_on) for fragment in ROW_FRAGMENTS]
+
+
+def invalidate_row_fragments(application):
+    cache.delete_many(row_fragment_keys(application))
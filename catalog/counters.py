@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import Application, ApplicationCounter
+
+
+def adjust_counter(category_id, status, delta):
+    if not delta:
+        return
+    counters = ApplicationCounter.objects.filter(category_id=category_id, status=status)
+    if not counters.update(count=F('count') + delta):
+        ApplicationCounter.objects.get_or_create(category_id=category_id, status=status)
+        counters.update(count=F('count') + delta)
+
+
+def status_count(status):
+    return counted_total(status=status)
+
+
+def counted_total(**filters):
+    """Количество заявок по счётчикам; filters - category_id и/или status"""
+    return ApplicationCounter.objects.filter(**filters).aggregate(total=Sum('count'))['total'] or 0
+
+
+def actual_counts():
+    """Реальные количества из таблицы заявок: {(category_id, status): count}"""
+    rows = Application.objects.order_by().values('category_id', 'status').annotate(total=Count('id'))
+    return {(row['category_id'], row['status']): row['total'] for row in rows}
+
+
+def stored_counts():
+    rows = ApplicationCounter.objects.exclude(count=0).values_list('category_id', 'status', 'count')
+    return {(category_id, status): count for category_id, status, count in rows}
+
+
+def rebuild_counters():
+    with transaction.atomic():
+        counts = actual_counts()
+        ApplicationCounter.objects.all().delete()
+        ApplicationCounter.objects.bulk_create(
+            ApplicationCounter(category_id=category_id, status=status, count=count)
+            for (category_id, status), count in counts.items()
+        )
+    return counts
@@ -0,0 +1,93 @@
+from django.db import transaction
+from django.db.models import Count
+
+from .caching import invalidate_index_context
+from .counters import adjust_counter
+from .jobs import enqueue_on_commit, job
+from .models import Application, ApplicationImage, Category
+from .signals import bulk_delete
+
+DELETE_BATCH_SIZE = 500
+# Категорию с большим числом заявок админка не удаляет в запросе, а ставит задачу delete_category
+ADMIN_DELETE_LIMIT = DELETE_BATCH_SIZE
+
+IMAGE_FILE_FIELDS = ('image', 'thumb_small', 'thumb_medium')
+
+
+def category_deletion_report(category):
+    """Что будет удалено вместе с категорией, без удаления"""
+    images = ApplicationImage.objects.filter(application__category=category)
+    files = set()
+    for names in images.values_list(*IMAGE_FILE_FIELDS).iterator():
+        files.update(name for name in names if name)
+    return {
+        'applications': Application.objects.filter(category=category).count(),
+        'images': images.count(),
+        'files': len(files),
+    }
+
+
+def delete_category_applications(category, batch_size=None, dry_run=False):
+    """
+    Удаляет заявки категории пачками по batch_size.
+
+    Каждая пачка удаляется в своей короткой транзакции, поэтому SQLite не
+    блокируется надолго, а в памяти одновременно находится только одна пачка.
+    Счётчики уменьшаются сгруппированно по статусам, а пути файлов пачки
+    уходят одной фоновой задачей delete_media после фиксации транзакции.
+    С dry_run=True ничего не удаляет и только возвращает отчёт.
+    """
+    if dry_run:
+        return category_deletion_report(category)
+
+    batch_size = batch_size or DELETE_BATCH_SIZE
+    report = {'applications': 0, 'images': 0, 'files': 0}
+    while True:
+        with transaction.atomic(), bulk_delete():
+            applications = Application.objects.filter(category=category).order_by('pk')
+            ids = list(applications.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+
+            statuses = Application.objects.filter(pk__in=ids).order_by().values('status').annotate(total=Count('pk'))
+            for row in statuses:
+                adjust_counter(category.pk, row['status'], -row['total'])
+
+            files = set()
+            for names in ApplicationImage.objects.filter(application_id__in=ids).values_list(*IMAGE_FILE_FIELDS):
+                files.update(name for name in names if name)
+
+            _, deleted = Application.objects.filter(pk__in=ids).delete()
+            report['applications'] += deleted.get(Application._meta.label, 0)
+            report['images'] += deleted.get(ApplicationImage._meta.label, 0)
+            report['files'] += len(files)
+
+            if files:
+                # Ключ по составу пачки: id заявок не переиспользуются, поэтому повторный
+                # запуск после прерванного не получит уже выполненную задачу старой пачки
+                enqueue_on_commit(
+                    'delete_media',
+                    key=f'delete_media:category:{category.pk}:{ids[0]}-{ids[-1]}',
+                    names=sorted(files),
+                )
+            transaction.on_commit(invalidate_index_context)
+    return report
+
+
+def deletes_in_background(category):
+    """Нужно ли удалять категорию фоновой задачей, а не в запросе админки"""
+    return Application.objects.filter(category=category).count() > ADMIN_DELETE_LIMIT
+
+
+def enqueue_category_deletion(category):
+    enqueue_on_commit('delete_category', key=f'delete_category:{category.pk}', category_id=category.pk)
+
+
+@job('delete_category')
+def delete_category(category_id):
+    """Удаляет категорию пачками вне запроса, как manage.py delete_category"""
+    try:
+        category = Category.objects.get(pk=category_id)
+    except Category.DoesNotExist:
+        return
+    category.delete()
@@ -0,0 +1,40 @@
+import os
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+
+LOCK_FILE_NAME = 'cache.lock'
+
+
+class LockingFileBasedCache(FileBasedCache):
+    """
+    Файловый кэш, в котором add и incr атомарны между процессами.
+
+    В FileBasedCache оба сначала читают значение, потом записывают, и два
+    процесса могут одновременно увеличить счётчик до одного и того же числа
+    или оба получить одну блокировку. Здесь проверка и запись выполняются под
+    эксклюзивной блокировкой файла в каталоге кэша. На этих операциях держатся
+    номер поколения и блокировка пересчёта главной страницы (catalog.caching).
+    """
+
+    @contextmanager
+    def _locked(self):
+        self._createdir()
+        # Файл без суффикса .djcache: clear() и вытеснение его не трогают
+        with open(os.path.join(self._dir, LOCK_FILE_NAME), 'ab') as file:
+            locks.lock(file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(file)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        # decr в BaseCache вызывает incr с отрицательным шагом
+        with self._locked():
+            return super().incr(key, delta, version)
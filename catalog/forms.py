@@ -1,9 +1,12 @@
 from django import forms
-from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from django.core.exceptions import ValidationError
+from .accounts import DuplicateUser, register_user
 from .models import Application, Category, ApplicationImage
-import os
+from .transitions import BULK_STATUSES
+from .uploads import validate_image_upload
+
+IMAGE_ACCEPT = '.jpg,.jpeg,.png,.bmp'
 
 
 class CustomUserCreationForm(forms.Form):  # Изменяем на forms.Form вместо UserCreationForm
@@ -52,10 +55,6 @@ class CustomUserCreationForm(forms.Form):  # Изменяем на forms.Form в
         if not username:
             raise ValidationError('Имя пользователя обязательно для заполнения')
 
-        # Проверяем уникальность username
-        if User.objects.filter(username=username).exists():
-            raise ValidationError('Пользователь с таким именем уже существует')
-
         # Простая проверка на допустимые символы
         import re
         if not re.match(r'^[\w.@+-]+$', username):
@@ -81,10 +80,6 @@ class CustomUserCreationForm(forms.Form):  # Изменяем на forms.Form в
         if '@' not in email:
             raise ValidationError('Введите корректный адрес электронной почты (должен содержать @)')
 
-        # Проверяем уникальность email
-        if User.objects.filter(email=email).exists():
-            raise ValidationError('Пользователь с таким email уже существует')
-
         return email
 
     def clean_password1(self):
@@ -119,16 +114,24 @@ class CustomUserCreationForm(forms.Form):  # Изменяем на forms.Form в
 
         return agreement
 
-    def save(self, commit=True):
-        # Создаем пользователя вручную
-        user = User.objects.create_user(
-            username=self.cleaned_data['username'],
-            email=self.cleaned_data['email'],
-            password=self.cleaned_data['password1'],
-            first_name=self.cleaned_data['full_name']
-        )
+    duplicate_errors = {
+        'username': 'Пользователь с таким именем уже существует',
+        'email': 'Пользователь с таким email уже существует',
+    }
 
-        return user
+    def save(self, commit=True):
+        # Уникальность имени и email проверяет БД при вставке, см. catalog.accounts.
+        # Если имя или email заняты, ошибка добавляется к полю и возвращается None
+        try:
+            return register_user(
+                username=self.cleaned_data['username'],
+                email=self.cleaned_data['email'],
+                password=self.cleaned_data['password1'],
+                full_name=self.cleaned_data['full_name'],
+            )
+        except DuplicateUser as error:
+            self.add_error(error.field, self.duplicate_errors[error.field])
+            return None
 
 
 # Остальные формы остаются без изменений
@@ -138,9 +141,12 @@ class ApplicationForm(forms.ModelForm):
         label='Категория',
         widget=forms.Select(attrs={'class': 'form-control'})
     )
-    image = forms.ImageField(
+    # FileField вместо ImageField: Pillow не открывает файл целиком, формат и размеры
+    # проверяются по заголовку в validate_image_upload
+    image = forms.FileField(
         label='Фотография помещения',
         help_text='Формат: jpg, jpeg, png, bmp. Максимальный размер: 2МБ',
+        widget=forms.ClearableFileInput(attrs={'accept': IMAGE_ACCEPT}),
         required=True
     )
 
@@ -159,14 +165,7 @@ class ApplicationForm(forms.ModelForm):
     def clean_image(self):
         image = self.cleaned_data.get('image')
         if image:
-            allowed_extensions = ['.jpg', '.jpeg', '.png', '.bmp']
-            ext = os.path.splitext(image.name)[1].lower()
-            if ext not in allowed_extensions:
-                raise ValidationError(
-                    f'Недопустимый формат файла. Разрешенные форматы: {", ".join(allowed_extensions)}'
-                )
-            if image.size > 2097152:
-                raise ValidationError('Размер файла не должен превышать 2 МБ')
+            validate_image_upload(image)
         return image
 
 
@@ -177,9 +176,10 @@ class AdminApplicationForm(forms.ModelForm):
         required=False,
         help_text='Обязателен при смене статуса на "Принято в работу"'
     )
-    design_image = forms.ImageField(
+    design_image = forms.FileField(
         label='Изображение дизайна',
         required=False,
+        widget=forms.ClearableFileInput(attrs={'accept': IMAGE_ACCEPT}),
         help_text='Обязательно при смене статуса на "Выполнено". Формат: jpg, jpeg, png, bmp. Максимальный размер: 2МБ'
     )
 
@@ -207,12 +207,20 @@ class AdminApplicationForm(forms.ModelForm):
     def clean_design_image(self):
         design_image = self.cleaned_data.get('design_image')
         if design_image:
-            allowed_extensions = ['.jpg', '.jpeg', '.png', '.bmp']
-            ext = os.path.splitext(design_image.name)[1].lower()
-            if ext not in allowed_extensions:
-                raise ValidationError(
-                    f'Недопустимый формат файла. Разрешенные форматы: {", ".join(allowed_extensions)}'
-                )
-            if design_image.size > 2097152:
-                raise ValidationError('Размер файла не должен превышать 2 МБ')
-        return design_image
\ No newline at end of file
+            validate_image_upload(design_image)
+        return design_image
+
+
+class BulkStatusForm(forms.Form):
+    """Общие статус и комментарий для массового изменения статуса, см. catalog.transitions"""
+    status = forms.ChoiceField(
+        label='Новый статус',
+        choices=[(value, label) for value, label in Application.STATUS_CHOICES if value in BULK_STATUSES],
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    comment = forms.CharField(
+        label='Комментарий администратора',
+        widget=forms.Textarea(attrs={'rows': 2, 'class': 'form-control'}),
+        help_text='Один комментарий для всех выбранных заявок',
+        error_messages={'required': 'При смене статуса на "Принято в работу" необходим комментарий'},
+    )
@@ -0,0 +1,129 @@
+import json
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY = 10
+# Задача, которая "выполняется" дольше этого, считается брошенной упавшим воркером
+STALE_AFTER = timedelta(minutes=15)
+# Выполненные задачи хранятся столько, сколько действует идемпотентность их ключей.
+# Упавшие не удаляются: их разбирают вручную в админке
+DONE_RETENTION = timedelta(days=7)
+PURGE_INTERVAL = 60 * 60
+PURGE_BATCH_SIZE = 1000
+
+_handlers = {}
+
+
+def job(kind):
+    """Регистрирует функцию как обработчик задач указанного типа"""
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, key=None, **payload):
+    """
+    Ставит задачу в очередь. Ключ делает постановку идемпотентной:
+    если задача с таким ключом уже есть, новая не создаётся.
+    """
+    job, created = Job.objects.get_or_create(
+        key=key or f'{kind}:{json.dumps(payload, sort_keys=True)}',
+        defaults={'kind': kind, 'payload': payload},
+    )
+    return job
+
+
+def enqueue_on_commit(kind, key=None, **payload):
+    """Ставит задачу только после фиксации транзакции, в которой созданы её данные"""
+    transaction.on_commit(lambda: enqueue(kind, key, **payload))
+
+
+def requeue_stale():
+    return Job.objects.filter(status='running', locked_at__lt=timezone.now() - STALE_AFTER).update(
+        status='pending', locked_at=None
+    )
+
+
+def purge_finished(older_than=DONE_RETENTION, batch_size=PURGE_BATCH_SIZE):
+    """Удаляет выполненные задачи старше older_than пачками по batch_size"""
+    finished = Job.objects.filter(status='done', updated_at__lt=timezone.now() - older_than)
+    deleted = 0
+    while True:
+        pks = list(finished.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        deleted += Job.objects.filter(pk__in=pks).delete()[0]
+
+
+def claim():
+    """Забирает одну готовую к выполнению задачу, пока её не забрал другой воркер"""
+    now = timezone.now()
+    candidates = Job.objects.filter(status='pending', run_after__lte=now).order_by('run_after', 'pk')
+    for pk in candidates.values_list('pk', flat=True)[:10]:
+        # Условный UPDATE срабатывает только у одного из конкурирующих воркеров
+        claimed = Job.objects.filter(pk=pk, status='pending').update(
+            status='running', locked_at=now, attempts=F('attempts') + 1
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run(job):
+    handler = _handlers.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f'Нет обработчика для задач типа "{job.kind}"')
+        handler(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            logger.error('Задача %s не выполнена после %s попыток', job.key, job.attempts)
+        else:
+            job.status = 'pending'
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1))
+    else:
+        job.status = 'done'
+        job.last_error = ''
+    job.locked_at = None
+    job.save(update_fields=['status', 'last_error', 'run_after', 'locked_at', 'updated_at'])
+    return job
+
+
+def work(stop=None, poll_interval=1.0, once=False):
+    """
+    Цикл воркера: выполняет задачи, пока не получит сигнал остановки.
+    С once=True выходит, как только очередь опустела.
+    В простое раз в PURGE_INTERVAL удаляет старые выполненные задачи.
+    """
+    processed = 0
+    purged_at = None
+    while stop is None or not stop.is_set():
+        job = claim()
+        if job is None:
+            if once:
+                break
+            requeue_stale()
+            if purged_at is None or time.monotonic() - purged_at >= PURGE_INTERVAL:
+                purge_finished()
+                purged_at = time.monotonic()
+            if stop is not None:
+                stop.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+            continue
+        run(job)
+        processed += 1
+    return processed
@@ -0,0 +1,238 @@
+import datetime
+import json
+import time
+import urllib.error
+import urllib.request
+from contextlib import ExitStack, nullcontext
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from catalog import urls
+from catalog.benchmarking import summarize
+from catalog.models import Application
+
+# Кто открывает страницу: None - аноним, 'user' - владелец заявок, 'staff' - сотрудник
+ROUTE_ROLES = {
+    'index': None,
+    'register': None,
+    'profile': 'user',
+    'create_application': 'user',
+    'my_applications': 'user',
+    'delete_application': 'user',
+    'admin_application_list': 'staff',
+    'admin_application_detail': 'staff',
+    'api_applications': 'staff',
+    'api_categories': 'staff',
+    'api_status_counts': 'staff',
+}
+# Маршруты, которые принимают только POST: замер GET к ним неприменим
+POST_ONLY_ROUTES = {'admin_application_bulk_status'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет все страницы catalog/urls.py (GET): p50/p95/p99, число SQL-запросов и размер ответа. '
+        'Результат можно сохранить как базовую линию и сравнивать с ней следующие запуски'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--route', action='append', dest='routes', help='Имя маршрута; можно несколько')
+        parser.add_argument('--user', help='Пользователь для личных страниц (по умолчанию владелец новой заявки)')
+        parser.add_argument('--staff', help='Сотрудник для страниц администрирования (по умолчанию первый найденный)')
+        parser.add_argument(
+            '--base-url',
+            help='Адрес запущенного сервера, например http://127.0.0.1:8000; без него запросы идут через тестовый клиент',
+        )
+        parser.add_argument('--host', default='localhost', help='Заголовок Host для тестового клиента')
+        parser.add_argument(
+            '--database',
+            action='append',
+            dest='databases',
+            choices=sorted(settings.DATABASES),
+            help='Алиас БД, запросы к которой считаются; можно несколько (по умолчанию все)',
+        )
+        parser.add_argument(
+            '--session-profile',
+            choices=sorted(settings.SESSION_PROFILES),
+            help='Хранение сессий и сообщений на время замера (только для тестового клиента), см. SESSION_PROFILES',
+        )
+        parser.add_argument('--save', help='Сохранить результат в JSON')
+        parser.add_argument('--compare', help='Сравнить с сохранённым JSON')
+        parser.add_argument(
+            '--max-regression',
+            type=float,
+            help='Завершиться с ошибкой, если p95 вырос больше чем на столько процентов или выросло число запросов',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        profile = options['session_profile']
+        if profile and options['base_url']:
+            raise CommandError('--session-profile меняет настройки только этого процесса, с --base-url он не работает')
+
+        # Клиенты создаются внутри, чтобы вход записал сессию в выбранное хранилище
+        with override_settings(**settings.SESSION_PROFILES[profile]) if profile else nullcontext():
+            clients = self.make_clients()
+            routes = self.make_routes(options['routes'])
+
+            results = {}
+            for name, url, role in routes:
+                results[name] = self.measure(clients[role], url)
+
+        self.print_results(results)
+        report = {
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'iterations': options['iterations'],
+            'base_url': options['base_url'],
+            'session_profile': profile or settings.SESSION_PROFILE,
+            'routes': results,
+        }
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Сохранено в {options["save"]}')
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)
+            self.compare(baseline['routes'], results)
+
+    def make_clients(self):
+        user = self.find_user(self.options['user'], is_staff=False)
+        staff = self.find_user(self.options['staff'], is_staff=True)
+        clients = {None: Client(HTTP_HOST=self.options['host'])}
+        for role, account in (('user', user), ('staff', staff)):
+            client = Client(HTTP_HOST=self.options['host'])
+            client.force_login(account)
+            clients[role] = client
+        self.user = user
+        return clients
+
+    def find_user(self, username, is_staff):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Пользователь {username} не найден')
+        if is_staff:
+            account = User.objects.filter(is_staff=True, is_superuser=True).order_by('pk').first()
+        else:
+            owner = Application.objects.filter(status='new').order_by('pk').values('user_id')[:1]
+            account = User.objects.filter(pk__in=owner).first()
+        if account is None:
+            raise CommandError('Нет подходящего пользователя: заполните БД командой seed или укажите --user/--staff')
+        return account
+
+    def make_routes(self, selected):
+        application = Application.objects.filter(user=self.user, status='new').order_by('-pk').first()
+        routes = []
+        for pattern in urls.urlpatterns:
+            name = pattern.name
+            if (selected and name not in selected) or name in POST_ONLY_ROUTES:
+                continue
+            if name not in ROUTE_ROLES:
+                self.stderr.write(f'Для маршрута {name} не описан сценарий в ROUTE_ROLES, пропущен')
+                continue
+            kwargs = {}
+            if 'pk' in pattern.pattern.converters:
+                if application is None:
+                    self.stderr.write(f'У пользователя {self.user} нет новой заявки, маршрут {name} пропущен')
+                    continue
+                kwargs['pk'] = application.pk
+            routes.append((name, reverse(name, kwargs=kwargs), ROUTE_ROLES[name]))
+        return routes
+
+    def measure(self, client, url):
+        request = self.http_request if self.options['base_url'] else self.client_request
+        for _ in range(self.options['warmup']):
+            request(client, url)
+
+        durations = []
+        errors = 0
+        started = time.perf_counter()
+        for _ in range(self.options['iterations']):
+            request_started = time.perf_counter()
+            status, size = request(client, url)
+            durations.append(time.perf_counter() - request_started)
+            if status >= 400:
+                errors += 1
+        result = summarize(durations, time.perf_counter() - started, errors)
+        result['status'] = status
+        result['bytes'] = size
+
+        # Запросы считаются отдельным проходом, чтобы перехват SQL не искажал время
+        if self.options['base_url']:
+            result['queries'] = None
+        else:
+            with ExitStack() as stack:
+                captured = [
+                    stack.enter_context(CaptureQueriesContext(connections[alias]))
+                    for alias in self.options['databases'] or connections
+                ]
+                request(client, url)
+            result['queries'] = sum(len(context) for context in captured)
+        return result
+
+    @staticmethod
+    def client_request(client, url):
+        response = client.get(url)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, len(content)
+
+    def http_request(self, client, url):
+        cookie = '; '.join(f'{name}={morsel.value}' for name, morsel in client.cookies.items())
+        request = urllib.request.Request(self.options['base_url'].rstrip('/') + url, headers={'Cookie': cookie})
+        opener = urllib.request.build_opener(NoRedirect)
+        try:
+            with opener.open(request) as response:
+                return response.status, len(response.read())
+        except urllib.error.HTTPError as error:
+            return error.code, len(error.read())
+
+    def print_results(self, results):
+        self.stdout.write(
+            f'{"маршрут":<26}{"код":>5}{"p50, мс":>10}{"p95, мс":>10}{"p99, мс":>10}{"запросов":>10}{"байт":>10}'
+        )
+        for name, result in results.items():
+            queries = '-' if result['queries'] is None else result['queries']
+            self.stdout.write(
+                f'{name:<26}{result["status"]:>5}{result["p50"]:>10.1f}{result["p95"]:>10.1f}'
+                f'{result["p99"]:>10.1f}{queries:>10}{result["bytes"]:>10}'
+            )
+
+    def compare(self, baseline, results):
+        self.stdout.write(f'\n{"маршрут":<26}{"p50":>10}{"p95":>10}{"запросов":>12}{"байт":>12}')
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                self.stdout.write(f'{name:<26}{"нет в базовой линии":>44}')
+                continue
+            p50 = (result['p50'] / before['p50'] - 1) * 100
+            p95 = (result['p95'] / before['p95'] - 1) * 100
+            queries = None
+            if result['queries'] is not None and before.get('queries') is not None:
+                queries = result['queries'] - before['queries']
+            self.stdout.write(
+                f'{name:<26}{p50:>+9.0f}%{p95:>+9.0f}%{"-" if queries is None else f"{queries:+d}":>12}'
+                f'{result["bytes"] - before["bytes"]:>+12d}'
+            )
+            limit = self.options['max_regression']
+            if limit is not None and (p95 > limit or (queries or 0) > 0):
+                regressions.append(name)
+
+        if regressions:
+            raise CommandError(f'Регрессия по сравнению с базовой линией: {", ".join(regressions)}')
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Замеряется сама страница, а не та, на которую она перенаправляет
+    def redirect_request(self, *args, **kwargs):
+        return None
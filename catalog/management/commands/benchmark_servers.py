@@ -0,0 +1,103 @@
+import asyncio
+import importlib.util
+import socket
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.benchmarking import load, summarize
+
+# Как запускается каждый вариант; нужные пакеты ставятся отдельно (pip install uvicorn gunicorn)
+SERVERS = {
+    'asgi': ('uvicorn', lambda host, port, options: [
+        sys.executable, '-m', 'uvicorn', 'designpro.asgi:application',
+        '--host', host, '--port', str(port), '--workers', str(options['workers']),
+        '--no-access-log', '--log-level', 'warning',
+    ]),
+    'wsgi': ('gunicorn', lambda host, port, options: [
+        sys.executable, '-m', 'gunicorn', 'designpro.wsgi:application',
+        '--bind', f'{host}:{port}', '--workers', str(options['workers']), '--threads', str(options['threads']),
+        '--log-level', 'warning',
+    ]),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает ASGI (uvicorn) и WSGI (gunicorn) под высокой конкурентностью: '
+        'запросы в секунду и перцентили времени ответа'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            action='append',
+            dest='paths',
+            help='Адрес страницы; можно указать несколько раз (по умолчанию "/catalog/")',
+        )
+        parser.add_argument('--servers', default='asgi,wsgi', help='Через запятую: asgi, wsgi')
+        parser.add_argument('--requests', type=int, default=10000)
+        parser.add_argument('--concurrency', type=int, default=256)
+        parser.add_argument('--warmup', type=int, default=200, help='Запросов до начала замера')
+        parser.add_argument('--workers', type=int, default=2, help='Процессов сервера')
+        parser.add_argument('--threads', type=int, default=8, help='Потоков на процесс gunicorn')
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument(
+            '--cookie',
+            help='Заголовок Cookie для страниц, требующих входа, например "sessionid=..."',
+        )
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or ['/catalog/']
+        headers = {'Cookie': options['cookie']} if options['cookie'] else None
+        names = [name.strip() for name in options['servers'].split(',') if name.strip()]
+        for name in names:
+            if name not in SERVERS:
+                raise CommandError(f'Неизвестный сервер: {name}')
+            module = SERVERS[name][0]
+            if importlib.util.find_spec(module) is None:
+                raise CommandError(f'Для варианта {name} нужен пакет {module}: pip install {module}')
+
+        results = {}
+        for name in names:
+            self.stdout.write(f'{name}: запуск {SERVERS[name][0]}...')
+            process = self.start_server(name, options)
+            try:
+                asyncio.run(load(
+                    options['host'], options['port'], paths, options['warmup'], options['concurrency'], headers,
+                ))
+                durations, errors, elapsed = asyncio.run(load(
+                    options['host'], options['port'], paths, options['requests'], options['concurrency'], headers,
+                ))
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+            results[name] = summarize(durations, elapsed, errors)
+
+        self.stdout.write(f'{"сервер":<8}{"запр/с":>10}{"p50, мс":>10}{"p95, мс":>10}{"p99, мс":>10}{"ошибок":>9}')
+        for name, result in results.items():
+            if not result['requests']:
+                self.stdout.write(f'{name:<8}{"нет успешных ответов":>40}{result["errors"]:>9}')
+                continue
+            self.stdout.write(
+                f'{name:<8}{result["rps"]:>10.0f}{result["p50"]:>10.1f}{result["p95"]:>10.1f}'
+                f'{result["p99"]:>10.1f}{result["errors"]:>9}'
+            )
+
+    def start_server(self, name, options):
+        host, port = options['host'], options['port']
+        process = subprocess.Popen(SERVERS[name][1](host, port, options))
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'Сервер {name} завершился с кодом {process.returncode}')
+            try:
+                with socket.create_connection((host, port), timeout=1):
+                    return process
+            except OSError:
+                time.sleep(0.2)
+        process.terminate()
+        raise CommandError(f'Сервер {name} не начал принимать соединения за 30 секунд')
@@ -0,0 +1,86 @@
+import itertools
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from catalog.benchmarking import summarize
+
+USERNAME_PREFIX = 'bench_signup_'
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет регистрацию через страницу register: регистраций в секунду, p50/p95 и SQL-запросов '
+        'на регистрацию для нескольких значений числа итераций PBKDF2. Созданные пользователи удаляются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=50, help='Регистраций на каждое значение')
+        parser.add_argument(
+            '--work-factors',
+            default='',
+            help='Числа итераций PBKDF2 через запятую; по умолчанию текущее из settings',
+        )
+        parser.add_argument('--host', default='localhost', help='Заголовок Host для тестового клиента')
+
+    def handle(self, *args, **options):
+        try:
+            work_factors = [int(value) for value in options['work_factors'].split(',') if value.strip()]
+        except ValueError:
+            raise CommandError('--work-factors: ожидаются целые числа через запятую')
+        self.client = Client(HTTP_HOST=options['host'])
+        self.numbers = itertools.count()
+
+        self.stdout.write(
+            f'{"итераций":>10}{"хэш, мс":>10}{"рег./с":>10}{"p50, мс":>10}{"p95, мс":>10}{"запросов":>10}{"ошибок":>8}'
+        )
+        try:
+            for work_factor in work_factors or [None]:
+                with override_settings(PASSWORD_HASH_ITERATIONS=work_factor):
+                    self.run(options['count'])
+        finally:
+            User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+    def signup(self):
+        number = next(self.numbers)
+        response = self.client.post(reverse('register'), {
+            'username': f'{USERNAME_PREFIX}{number}',
+            'full_name': 'Тестовый Пользователь',
+            'email': f'{USERNAME_PREFIX}{number}@example.com',
+            'password1': 'password',
+            'password2': 'password',
+            'agreement': 'on',
+        })
+        # Успешная регистрация перенаправляет на вход
+        return response.status_code == 302
+
+    def run(self, count):
+        started = time.perf_counter()
+        password_hash = make_password('password')
+        hash_ms = (time.perf_counter() - started) * 1000
+
+        durations = []
+        errors = 0
+        started = time.perf_counter()
+        for _ in range(count):
+            signup_started = time.perf_counter()
+            if not self.signup():
+                errors += 1
+            durations.append(time.perf_counter() - signup_started)
+        result = summarize(durations, time.perf_counter() - started, errors)
+
+        # Запросы считаются отдельной регистрацией, чтобы перехват SQL не искажал время
+        with CaptureQueriesContext(connection) as context:
+            self.signup()
+
+        iterations = password_hash.split('$')[1]
+        self.stdout.write(
+            f'{iterations:>10}{hash_ms:>10.1f}{result["rps"]:>10.1f}{result["p50"]:>10.1f}{result["p95"]:>10.1f}'
+            f'{len(context):>10}{errors:>8}'
+        )
@@ -0,0 +1,36 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет просроченные сессии из БД пачками. В отличие от clearsessions каждая пачка - '
+        'отдельная короткая транзакция, и запись в SQLite не блокируется надолго'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.0, help='Пауза между пачками, секунды')
+
+    def handle(self, *args, **options):
+        engine = import_module(settings.SESSION_ENGINE)
+        if not hasattr(engine.SessionStore, 'get_model_class'):
+            self.stdout.write(f'{settings.SESSION_ENGINE} не хранит сессии в БД, удалять нечего')
+            return
+
+        model = engine.SessionStore.get_model_class()
+        # Граница фиксируется один раз, иначе цикл мог бы не закончиться
+        now = timezone.now()
+        deleted = 0
+        while True:
+            keys = list(model.objects.filter(expire_date__lt=now).values_list('pk', flat=True)[:options['batch_size']])
+            if not keys:
+                break
+            deleted += model.objects.filter(pk__in=keys).delete()[0]
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено просроченных сессий: {deleted}'))
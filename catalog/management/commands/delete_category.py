@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.deletion import DELETE_BATCH_SIZE, category_deletion_report
+from catalog.models import Category
+
+
+class Command(BaseCommand):
+    help = 'Удаляет категорию вместе с заявками пачками, не блокируя базу надолго'
+
+    def add_arguments(self, parser):
+        parser.add_argument('category_id', type=int)
+        parser.add_argument('--batch-size', type=int, default=DELETE_BATCH_SIZE)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, сколько заявок, изображений и файлов будет удалено',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            category = Category.objects.get(pk=options['category_id'])
+        except Category.DoesNotExist:
+            raise CommandError(f'Категория {options["category_id"]} не найдена')
+
+        report = category_deletion_report(category)
+        self.stdout.write(
+            f'Категория "{category}": заявок {report["applications"]}, '
+            f'изображений {report["images"]}, файлов {report["files"]}'
+        )
+        if options['dry_run']:
+            return
+
+        category.delete(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Категория удалена, файлы будут удалены фоновыми задачами'))
@@ -0,0 +1,62 @@
+import csv
+import json
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.transfer import CSV_FILES, EXPORT_FIELDS, EXPORT_QUERYSETS, serialize
+
+
+class Command(BaseCommand):
+    help = 'Выгружает категории, заявки и изображения в JSONL или CSV потоком, с постоянным расходом памяти'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output',
+            help='Файл для JSONL ("-" - стандартный вывод) или каталог для CSV',
+        )
+        parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['format'] == 'jsonl':
+            total = self.export_jsonl(options['output'], options['chunk_size'])
+        else:
+            total = self.export_csv(options['output'], options['chunk_size'])
+
+        elapsed = time.monotonic() - started
+        self.stderr.write(f'Выгружено строк: {total} за {elapsed:.1f} с ({total / max(elapsed, 0.001):.0f} строк/с)')
+
+    def rows(self, model, chunk_size):
+        queryset = EXPORT_QUERYSETS[model]().values(*EXPORT_FIELDS[model])
+        for row in queryset.iterator(chunk_size=chunk_size):
+            yield serialize(row)
+
+    def export_jsonl(self, output, chunk_size):
+        total = 0
+        file = sys.stdout if output == '-' else open(output, 'w', encoding='utf-8')
+        try:
+            for model in EXPORT_FIELDS:
+                for row in self.rows(model, chunk_size):
+                    file.write(json.dumps({'model': model, **row}, ensure_ascii=False))
+                    file.write('\n')
+                    total += 1
+        finally:
+            if file is not sys.stdout:
+                file.close()
+        return total
+
+    def export_csv(self, output, chunk_size):
+        os.makedirs(output, exist_ok=True)
+        total = 0
+        for model, fields in EXPORT_FIELDS.items():
+            with open(os.path.join(output, CSV_FILES[model]), 'w', encoding='utf-8', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=fields)
+                writer.writeheader()
+                for row in self.rows(model, chunk_size):
+                    writer.writerow(row)
+                    total += 1
+        return total
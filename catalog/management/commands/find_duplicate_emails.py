@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.accounts import duplicate_email_accounts
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает пользователей с одинаковым email без учёта регистра. '
+        'Пока они есть, миграция catalog 0011 (уникальный email) не применится'
+    )
+
+    def handle(self, *args, **options):
+        accounts = duplicate_email_accounts()
+        for pk, username, email in accounts:
+            self.stdout.write(f'  id={pk} {username} <{email}>')
+        if accounts:
+            raise CommandError(
+                f'Пользователей с повторяющимся email: {len(accounts)}. '
+                'Измените или очистите адреса, затем выполните migrate'
+            )
+        self.stdout.write(self.style.SUCCESS('Повторяющихся адресов нет'))
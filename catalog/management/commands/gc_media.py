@@ -0,0 +1,129 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from catalog.deletion import IMAGE_FILE_FIELDS
+from catalog.models import ApplicationImage
+from catalog.storage import application_storage, remove_unless_recent
+from catalog.uploads import UPLOAD_TEMP_DIR
+
+# Каталоги внутри MEDIA_ROOT, которые принадлежат изображениям заявок
+MEDIA_DIRECTORIES = ('applications', UPLOAD_TEMP_DIR)
+
+
+def scan_files(path):
+    """Обходит дерево каталогов через os.scandir, не собирая список файлов целиком"""
+    try:
+        entries = os.scandir(path)
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from scan_files(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+class Command(BaseCommand):
+    help = 'Удаляет из MEDIA_ROOT файлы изображений, на которые не ссылается ни одна запись'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, какие файлы будут удалены',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=float,
+            default=24,
+            help='Не трогать файлы моложе указанного числа часов (загрузки, ещё не сохранённые в БД)',
+        )
+        parser.add_argument('--workers', type=int, default=4, help='Количество потоков для удаления')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--progress-every',
+            type=int,
+            default=10000,
+            help='Печатать прогресс каждые N просмотренных файлов',
+        )
+
+    def handle(self, *args, **options):
+        self.storage = application_storage()
+        self.dry_run = options['dry_run']
+        started = time.monotonic()
+
+        # Из БД берутся только имена файлов, потоком
+        referenced = set()
+        rows = ApplicationImage.objects.values_list(*IMAGE_FILE_FIELDS).iterator(chunk_size=options['batch_size'])
+        for names in rows:
+            referenced.update(name for name in names if name)
+        self.stdout.write(f'Файлов в БД: {len(referenced)}')
+
+        self.stats = {'scanned': 0, 'orphaned': 0, 'removed': 0, 'bytes': 0}
+        self.min_age = options['min_age'] * 3600
+        threshold = time.time() - self.min_age
+        batch = []
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for directory in MEDIA_DIRECTORIES:
+                for entry in scan_files(self.storage.path(directory)):
+                    self.stats['scanned'] += 1
+                    if self.stats['scanned'] % options['progress_every'] == 0:
+                        self.report_progress(started)
+
+                    name = os.path.relpath(entry.path, self.storage.location).replace(os.sep, '/')
+                    if name in referenced:
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                    if stat.st_mtime > threshold:
+                        continue
+
+                    self.stats['orphaned'] += 1
+                    batch.append((name, entry.path, stat.st_size))
+                    if len(batch) >= options['batch_size']:
+                        self.remove(executor, batch)
+                        batch = []
+            if batch:
+                self.remove(executor, batch)
+
+        elapsed = time.monotonic() - started
+        action = 'будет удалено' if self.dry_run else 'удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Просмотрено файлов: {self.stats["scanned"]}, без ссылок: {self.stats["orphaned"]}, '
+            f'{action}: {self.stats["removed"]} ({self.stats["bytes"] / 1024 / 1024:.1f} МБ) '
+            f'за {elapsed:.1f} с'
+        ))
+
+    def remove(self, executor, batch):
+        # Запись могла появиться уже после выборки имён из БД; временные файлы загрузок в БД не попадают
+        batch = [
+            item for item in batch
+            if item[0].startswith(f'{UPLOAD_TEMP_DIR}/') or not self.storage.is_referenced(item[0])
+        ]
+        if self.dry_run:
+            for name, path, size in batch:
+                self.stdout.write(f'  {name}')
+            results = [(True, size) for name, path, size in batch]
+        else:
+            results = executor.map(self.remove_file, batch)
+
+        for removed, size in results:
+            if removed:
+                self.stats['removed'] += 1
+                self.stats['bytes'] += size
+
+    def remove_file(self, item):
+        # После обхода файл мог получить новую загрузку (_commit обновляет время изменения),
+        # поэтому возраст проверяется ещё раз, уже после того как файл убран с места
+        name, path, size = item
+        return remove_unless_recent(path, self.min_age), size
+
+    def report_progress(self, started):
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Просмотрено {self.stats["scanned"]} файлов ({self.stats["scanned"] / elapsed:.0f} файлов/с), '
+            f'без ссылок {self.stats["orphaned"]}'
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from catalog.models import ApplicationImage
+from catalog.thumbnails import generate_derivatives
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии изображений заявок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать копии для всех изображений, а не только для тех, у которых их нет',
+        )
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        images = ApplicationImage.objects.order_by('pk')
+        if not options['all']:
+            images = images.filter(thumb_medium='')
+
+        done = failed = 0
+        for image in images.iterator(chunk_size=options['batch_size']):
+            try:
+                generate_derivatives(image)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'Изображение {image.pk} ({image.image.name}): {e}')
+            else:
+                done += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Готово: {done}, ошибок: {failed}'))
@@ -0,0 +1,246 @@
+import csv
+import json
+import os
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from catalog.caching import invalidate_index_context
+from catalog.counters import rebuild_counters
+from catalog.models import Application, ApplicationImage, Category
+from catalog.transfer import CSV_FILES, EXPORT_FIELDS, deserialize, preserve_timestamps
+
+# Поля, по которым строка с тем же id в БД считается загруженной этим же импортом до сбоя.
+# Строка с тем же id, но другими значениями - чужая: она не перезаписывается
+IDENTITY_FIELDS = {
+    Application: ('user_id', 'title', 'created_at'),
+    ApplicationImage: ('application_id', 'image'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает категории, заявки и изображения из выгрузки export_applications пачками через bulk_create. '
+        'id из выгрузки сохраняются, поэтому новый импорт возможен только в БД без заявок и изображений. '
+        'Прерванный импорт продолжается с последней сохранённой пачки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Файл JSONL или каталог с CSV')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с позицией импорта (по умолчанию <source>.checkpoint)',
+        )
+        parser.add_argument(
+            '--create-users',
+            action='store_true',
+            help='Создавать отсутствующих пользователей с неиспользуемым паролем вместо пропуска их заявок',
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.create_users = options['create_users']
+        self.checkpoint_path = options['checkpoint'] or f'{options["source"].rstrip(os.sep)}.checkpoint'
+        self.positions = self.load_checkpoint()
+        if any(self.positions.values()):
+            self.stdout.write(f'Продолжение импорта с позиции {self.positions}')
+        elif Application.objects.exists() or ApplicationImage.objects.exists():
+            raise CommandError(
+                'В БД уже есть заявки или изображения: id из выгрузки совпали бы с ними. '
+                'Импорт загружается только в пустую БД'
+            )
+
+        # Кэши внешних ключей: каждое имя ищется в БД не более одного раза
+        self.users = {}
+        self.categories = {}
+        self.builders = {
+            'category': self.build_categories,
+            'application': self.build_applications,
+            'image': self.build_images,
+        }
+        self.stats = {'imported': 0, 'skipped': 0, 'existing': 0, 'conflicts': 0}
+        started = time.monotonic()
+
+        rows = self.read_jsonl(options['source']) if options['format'] == 'jsonl' else self.read_csv(options['source'])
+        seen = dict.fromkeys(EXPORT_FIELDS, 0)
+        batch, batch_model = [], None
+        with preserve_timestamps():
+            for model, row in rows:
+                if model not in EXPORT_FIELDS:
+                    raise CommandError(f'Неизвестный тип строки: {model}')
+                seen[model] += 1
+                if seen[model] <= self.positions[model]:
+                    continue
+                if batch and (model != batch_model or len(batch) >= self.batch_size):
+                    self.flush(batch_model, batch)
+                    batch = []
+                batch_model = model
+                batch.append(deserialize(row))
+            if batch:
+                self.flush(batch_model, batch)
+
+        self.reset_sequences()
+        rebuild_counters()
+        invalidate_index_context()
+        if os.path.exists(self.checkpoint_path):
+            os.unlink(self.checkpoint_path)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено строк: {self.stats["imported"]}, пропущено: {self.stats["skipped"]}, '
+            f'уже были в БД: {self.stats["existing"]} '
+            f'за {elapsed:.1f} с ({self.stats["imported"] / max(elapsed, 0.001):.0f} строк/с)'
+        ))
+        if self.stats['conflicts']:
+            self.stderr.write(self.style.WARNING(
+                f'Не загружено строк с id, занятым другими данными: {self.stats["conflicts"]}. '
+                f'Заявки: {", ".join(map(str, sorted(self.conflicting_applications)))}'
+            ))
+
+    def read_jsonl(self, source):
+        with open(source, encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    row = json.loads(line)
+                    yield row.pop('model', None), row
+
+    def read_csv(self, source):
+        for model, file_name in CSV_FILES.items():
+            path = os.path.join(source, file_name)
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding='utf-8', newline='') as file:
+                for row in csv.DictReader(file):
+                    yield model, row
+
+    def load_checkpoint(self):
+        positions = dict.fromkeys(EXPORT_FIELDS, 0)
+        # id заявок, не загруженных из-за чужой строки с тем же id: их изображения тоже не загружаются
+        self.conflicting_applications = set()
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding='utf-8') as file:
+                data = json.load(file)
+            self.conflicting_applications.update(data.pop('conflicting_applications', []))
+            positions.update(data)
+        return positions
+
+    def save_checkpoint(self):
+        temporary_path = f'{self.checkpoint_path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump({**self.positions, 'conflicting_applications': sorted(self.conflicting_applications)}, file)
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def flush(self, model, rows):
+        with transaction.atomic():
+            objects = self.exclude_existing(self.builders[model](rows))
+            if objects:
+                type(objects[0]).objects.bulk_create(objects)
+                self.stats['imported'] += len(objects)
+        self.positions[model] += len(rows)
+        self.save_checkpoint()
+
+    def exclude_existing(self, objects):
+        """
+        Убирает строки, id которых уже есть в БД. Такие же значения - строка
+        загружена до сбоя, после фиксации пачки, но до записи позиции.
+        Другие значения - id занят чужой строкой, это конфликт
+        """
+        if not objects:
+            return objects
+        model = type(objects[0])
+        fields = IDENTITY_FIELDS[model]
+        existing = {
+            pk: values
+            for pk, *values in model.objects.filter(pk__in=[obj.pk for obj in objects]).values_list('pk', *fields)
+        }
+        new = []
+        for obj in objects:
+            if obj.pk not in existing:
+                new.append(obj)
+            elif existing[obj.pk] == [getattr(obj, name) for name in fields]:
+                self.stats['existing'] += 1
+            else:
+                self.stats['conflicts'] += 1
+                if model is Application:
+                    self.conflicting_applications.add(obj.pk)
+        return new
+
+    def reset_sequences(self):
+        # Строки вставлены с явными id: следующий id должен идти после них (в SQLite это происходит само)
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Category, Application, ApplicationImage]):
+                cursor.execute(sql)
+
+    def resolve_categories(self, names):
+        """Находит или создаёт категории по имени, возвращает количество созданных"""
+        missing = {name for name in names if name not in self.categories}
+        if not missing:
+            return 0
+        for pk, name in Category.objects.filter(name__in=missing).order_by('-pk').values_list('pk', 'name'):
+            self.categories[name] = pk
+        created = Category.objects.bulk_create(
+            Category(name=name) for name in missing if name not in self.categories
+        )
+        if created and created[0].pk is None:
+            # Бэкенд не вернул id после bulk_create
+            self.categories.update(Category.objects.filter(name__in=missing).values_list('name', 'pk'))
+        else:
+            self.categories.update((category.name, category.pk) for category in created)
+        return len(created)
+
+    def resolve_users(self, usernames):
+        missing = {username for username in usernames if username not in self.users}
+        if not missing:
+            return
+        self.users.update(User.objects.filter(username__in=missing).values_list('username', 'pk'))
+        absent = missing - self.users.keys()
+        if absent and self.create_users:
+            User.objects.bulk_create(User(username=username, password=make_password(None)) for username in absent)
+            self.users.update(User.objects.filter(username__in=absent).values_list('username', 'pk'))
+        for username in absent - self.users.keys():
+            # Запоминаем отсутствие, чтобы не искать снова
+            self.users[username] = None
+
+    def build_categories(self, rows):
+        # Категории сопоставляются по имени, уже существующие используются повторно
+        created = self.resolve_categories(row['name'] for row in rows)
+        self.stats['imported'] += created
+        self.stats['existing'] += len(rows) - created
+        return []
+
+    def build_applications(self, rows):
+        self.resolve_categories(row['category__name'] for row in rows)
+        self.resolve_users(row['user__username'] for row in rows)
+        objects = []
+        for row in rows:
+            user_id = self.users[row['user__username']]
+            if user_id is None:
+                continue
+            objects.append(Application(
+                id=row['id'],
+                user_id=user_id,
+                category_id=self.categories[row['category__name']],
+                title=row['title'],
+                description=row['description'],
+                status=row['status'],
+                created_at=row['created_at'],
+                admin_comment=row['admin_comment'],
+            ))
+        self.stats['skipped'] += len(rows) - len(objects)
+        return objects
+
+    def build_images(self, rows):
+        # Заявки без пользователя были пропущены, их изображения тоже пропускаем.
+        # Изображения заявок с конфликтом id достались бы чужой заявке
+        existing = set(
+            Application.objects.filter(pk__in={row['application_id'] for row in rows}).values_list('pk', flat=True)
+        ) - self.conflicting_applications
+        objects = [ApplicationImage(**row) for row in rows if row['application_id'] in existing]
+        self.stats['skipped'] += len(rows) - len(objects)
+        return objects
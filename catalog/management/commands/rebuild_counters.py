@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.counters import actual_counts, rebuild_counters, stored_counts
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики заявок по категориям и статусам или проверяет их'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сравнить счётчики с таблицей заявок, ничего не меняя',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            counts = rebuild_counters()
+            self.stdout.write(self.style.SUCCESS(
+                f'Счётчики пересчитаны: {len(counts)} записей, {sum(counts.values())} заявок'
+            ))
+            return
+
+        actual = actual_counts()
+        stored = stored_counts()
+        mismatches = sorted(
+            (key, stored.get(key, 0), actual.get(key, 0))
+            for key in actual.keys() | stored.keys()
+            if stored.get(key, 0) != actual.get(key, 0)
+        )
+        for (category_id, status), stored_count, actual_count in mismatches:
+            self.stdout.write(
+                f'Категория {category_id}, статус {status}: в счётчике {stored_count}, на самом деле {actual_count}'
+            )
+        if mismatches:
+            raise CommandError(f'Расхождений: {len(mismatches)}. Запустите команду без --verify')
+        self.stdout.write(self.style.SUCCESS('Счётчики совпадают с таблицей заявок'))
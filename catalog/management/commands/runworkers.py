@@ -0,0 +1,71 @@
+import multiprocessing
+import os
+import signal
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _worker_main(stop, poll_interval, once):
+    # Процесс может быть запущен через spawn, тогда Django нужно поднять заново
+    django.setup()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from catalog.jobs import work
+
+    try:
+        work(stop=stop, poll_interval=poll_interval, once=once)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Запускает пул процессов, выполняющих фоновые задачи из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Количество процессов-воркеров (по умолчанию по числу ядер)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Пауза в секундах между проверками пустой очереди',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить всё, что есть в очереди, и завершиться',
+        )
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context()
+        stop = context.Event()
+
+        # Соединения родителя не должны достаться дочерним процессам
+        connections.close_all()
+        workers = [
+            context.Process(
+                target=_worker_main,
+                args=(stop, options['poll_interval'], options['once']),
+                name=f'catalog-worker-{number}',
+            )
+            for number in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f'Запущено воркеров: {len(workers)}')
+
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            stop.set()
+            for worker in workers:
+                worker.join()
+        self.stdout.write('Воркеры остановлены')
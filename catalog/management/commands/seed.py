@@ -0,0 +1,157 @@
+import datetime
+import random
+import time
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from PIL import Image
+
+from catalog.caching import invalidate_index_context
+from catalog.counters import rebuild_counters
+from catalog.models import Application, ApplicationImage, Category
+from catalog.storage import application_storage
+from catalog.transfer import preserve_timestamps
+
+# Даты заявок отсчитываются от фиксированного момента, чтобы данные не зависели от дня запуска
+SEED_EPOCH = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+SEED_PERIOD_DAYS = 365
+
+STATUS_WEIGHTS = {'new': 5, 'in_progress': 3, 'completed': 2}
+
+CATEGORY_NAMES = [
+    'Кухня', 'Ванная', 'Гостиная', 'Спальня', 'Детская', 'Прихожая', 'Балкон', 'Кабинет', 'Ландшафт', 'Офис',
+]
+TITLE_WORDS = ['Ремонт', 'Дизайн', 'Перепланировка', 'Освещение', 'Отделка', 'Мебель', 'Интерьер', 'Декор']
+DESCRIPTION_WORDS = (
+    'нужен современный проект светлый тёплый минимализм лофт скандинавский стиль дерево камень плитка '
+    'обои покраска потолок пол окно дверь шкаф хранение зонирование бюджет срок площадь метров'
+).split()
+
+# Заглушки разных цветов: одинаковые файлы в ContentAddressedStorage хранятся один раз
+PLACEHOLDER_COLORS = [
+    (231, 76, 60), (52, 152, 219), (46, 204, 113), (241, 196, 15), (155, 89, 182), (26, 188, 156),
+    (230, 126, 34), (149, 165, 166), (52, 73, 94), (236, 240, 241), (192, 57, 43), (41, 128, 185),
+]
+PLACEHOLDER_SIZE = (640, 480)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет БД синтетическими пользователями, категориями, заявками и изображениями. '
+        'С одинаковым --seed на пустой БД получаются одинаковые данные'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--staff', type=int, default=1, help='Сотрудников с доступом к админке')
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--applications', type=int, default=1000)
+        parser.add_argument(
+            '--images',
+            type=int,
+            default=1,
+            help='Изображений-планов на заявку; у выполненных заявок дополнительно есть дизайн',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--password', default='password', help='Пароль всех созданных пользователей')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.monotonic()
+
+        users = self.create_users(options['users'], options['staff'], options['password'])
+        categories = self.create_categories(options['categories'])
+        placeholders = self.create_placeholders()
+
+        created = {'applications': 0, 'images': 0}
+        with preserve_timestamps():
+            remaining = options['applications']
+            while remaining > 0:
+                size = min(remaining, self.batch_size)
+                applications, images = self.create_batch(size, users, categories, placeholders, options['images'])
+                created['applications'] += applications
+                created['images'] += images
+                remaining -= size
+
+        rebuild_counters()
+        invalidate_index_context()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(users)}, категорий {len(categories)}, '
+            f'заявок {created["applications"]}, изображений {created["images"]} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
+
+    def create_users(self, count, staff, password):
+        # Хэш пароля считается один раз: PBKDF2 на каждого пользователя занял бы минуты
+        password_hash = make_password(password)
+        users = [User(username=f'seed_user{i:06d}', email=f'seed_user{i:06d}@example.com', password=password_hash)
+                 for i in range(count)]
+        users += [
+            User(username=f'seed_staff{i:03d}', email=f'seed_staff{i:03d}@example.com', password=password_hash,
+                 is_staff=True, is_superuser=True)
+            for i in range(staff)
+        ]
+        User.objects.bulk_create(users, batch_size=self.batch_size, ignore_conflicts=True)
+        names = [user.username for user in users if not user.is_staff]
+        return list(User.objects.filter(username__in=names).order_by('username').values_list('pk', flat=True))
+
+    def create_categories(self, count):
+        names = [
+            CATEGORY_NAMES[i % len(CATEGORY_NAMES)] + (f' {i // len(CATEGORY_NAMES) + 1}' if i >= len(CATEGORY_NAMES) else '')
+            for i in range(count)
+        ]
+        existing = dict(Category.objects.filter(name__in=names).values_list('name', 'pk'))
+        Category.objects.bulk_create(Category(name=name) for name in names if name not in existing)
+        existing.update(Category.objects.filter(name__in=names).values_list('name', 'pk'))
+        return [existing[name] for name in names]
+
+    def create_placeholders(self):
+        storage = application_storage()
+        names = []
+        for color in PLACEHOLDER_COLORS:
+            buffer = BytesIO()
+            Image.new('RGB', PLACEHOLDER_SIZE, color).save(buffer, 'PNG')
+            names.append(storage.save('applications/seed.png', ContentFile(buffer.getvalue())))
+        return names
+
+    def create_batch(self, size, users, categories, placeholders, images_per_application):
+        statuses = list(STATUS_WEIGHTS)
+        weights = list(STATUS_WEIGHTS.values())
+        applications = []
+        for _ in range(size):
+            status = self.random.choices(statuses, weights)[0]
+            created_at = SEED_EPOCH - datetime.timedelta(seconds=self.random.randrange(SEED_PERIOD_DAYS * 86400))
+            applications.append(Application(
+                user_id=self.random.choice(users),
+                category_id=self.random.choice(categories),
+                title=f'{self.random.choice(TITLE_WORDS)} {self.random.choice(CATEGORY_NAMES).lower()}',
+                description=' '.join(self.random.choices(DESCRIPTION_WORDS, k=self.random.randint(20, 200))),
+                status=status,
+                created_at=created_at,
+                admin_comment='Принято в работу' if status != 'new' else None,
+            ))
+
+        with transaction.atomic():
+            Application.objects.bulk_create(applications)
+            images = []
+            for application in applications:
+                image_types = ['plan'] * images_per_application
+                if application.status == 'completed':
+                    image_types.append('design')
+                for image_type in image_types:
+                    images.append(ApplicationImage(
+                        application_id=application.pk,
+                        image=self.random.choice(placeholders),
+                        image_type=image_type,
+                        uploaded_at=application.created_at,
+                        width=PLACEHOLDER_SIZE[0],
+                        height=PLACEHOLDER_SIZE[1],
+                    ))
+            ApplicationImage.objects.bulk_create(images)
+        return len(applications), len(images)
@@ -0,0 +1,146 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Как Django открывает соединение в каждом профиле (см. DB_PROFILE в settings)
+PROFILES = {
+    'development': {'init_command': '', 'transaction_mode': None},
+    'production': {'init_command': settings.SQLITE_PRODUCTION_PRAGMAS, 'transaction_mode': 'IMMEDIATE'},
+}
+
+SCHEMA = (
+    'CREATE TABLE stress_application (id INTEGER PRIMARY KEY, category_id INTEGER, status TEXT, description TEXT)',
+    'CREATE INDEX stress_application_created ON stress_application (category_id, id)',
+    'CREATE TABLE stress_counter (category_id INTEGER PRIMARY KEY, count INTEGER NOT NULL)',
+)
+CATEGORIES = 10
+
+
+def _connect(path, profile):
+    connection = sqlite3.connect(path, isolation_level=None)
+    for command in PROFILES[profile]['init_command'].split(';'):
+        if command.strip():
+            connection.execute(command)
+    return connection
+
+
+def _writer(path, profile, start, deadline, results):
+    connection = _connect(path, profile)
+    begin = f'BEGIN {PROFILES[profile]["transaction_mode"] or ""}'.strip()
+    commits = locked = 0
+    start.wait()
+    number = os.getpid()
+    while time.time() < deadline:
+        number += 1
+        category_id = number % CATEGORIES
+        try:
+            # Как создание заявки: чтение, вставка и обновление счётчика в одной транзакции
+            connection.execute(begin)
+            connection.execute('SELECT count FROM stress_counter WHERE category_id = ?', (category_id,)).fetchone()
+            connection.execute(
+                'INSERT INTO stress_application (category_id, status, description) VALUES (?, ?, ?)',
+                (category_id, 'new', 'x' * 500),
+            )
+            connection.execute(
+                'UPDATE stress_counter SET count = count + 1 WHERE category_id = ?', (category_id,),
+            )
+            connection.execute('COMMIT')
+            commits += 1
+        except sqlite3.OperationalError as error:
+            if 'locked' not in str(error) and 'busy' not in str(error):
+                raise
+            locked += 1
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+    results.put(('writer', commits, locked))
+
+
+def _reader(path, profile, start, deadline, results):
+    connection = _connect(path, profile)
+    reads = locked = 0
+    start.wait()
+    number = 0
+    while time.time() < deadline:
+        number += 1
+        try:
+            connection.execute(
+                'SELECT id, status FROM stress_application WHERE category_id = ? ORDER BY id DESC LIMIT 20',
+                (number % CATEGORIES,),
+            ).fetchall()
+            reads += 1
+        except sqlite3.OperationalError as error:
+            if 'locked' not in str(error) and 'busy' not in str(error):
+                raise
+            locked += 1
+    results.put(('reader', reads, locked))
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест SQLite: параллельные процессы пишут и читают одну БД '
+        'в профилях development и production; выводит пропускную способность и число ошибок блокировки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--profiles', default='development,production')
+
+    def handle(self, *args, **options):
+        profiles = [name.strip() for name in options['profiles'].split(',') if name.strip()]
+        for profile in profiles:
+            if profile not in PROFILES:
+                raise CommandError(f'Неизвестный профиль: {profile}')
+
+        self.stdout.write(f'{"профиль":<13}{"записей/с":>11}{"ошибок записи":>15}{"чтений/с":>11}{"ошибок чтения":>15}')
+        for profile in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                result = self.run_profile(os.path.join(directory, 'stress.sqlite3'), profile, options)
+            self.stdout.write(
+                f'{profile:<13}{result["commits"] / options["seconds"]:>11.0f}{result["write_locked"]:>15}'
+                f'{result["reads"] / options["seconds"]:>11.0f}{result["read_locked"]:>15}'
+            )
+
+    def run_profile(self, path, profile, options):
+        connection = _connect(path, profile)
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.executemany(
+            'INSERT INTO stress_counter (category_id, count) VALUES (?, 0)', [(i,) for i in range(CATEGORIES)],
+        )
+        connection.close()
+
+        start = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        # Отсчёт идёт от момента старта, а не от запуска процессов
+        deadline = time.time() + 2 + options['seconds']
+        processes = [
+            multiprocessing.Process(target=_writer, args=(path, profile, start, deadline, results))
+            for _ in range(options['writers'])
+        ] + [
+            multiprocessing.Process(target=_reader, args=(path, profile, start, deadline, results))
+            for _ in range(options['readers'])
+        ]
+        for process in processes:
+            process.start()
+        time.sleep(deadline - options['seconds'] - time.time())
+        start.set()
+
+        result = {'commits': 0, 'write_locked': 0, 'reads': 0, 'read_locked': 0}
+        for _ in processes:
+            kind, done, locked = results.get()
+            if kind == 'writer':
+                result['commits'] += done
+                result['write_locked'] += locked
+            else:
+                result['reads'] += done
+                result['read_locked'] += locked
+        for process in processes:
+            process.join()
+        return result
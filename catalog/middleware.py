@@ -0,0 +1,170 @@
+import json
+import logging
+import mimetypes
+import os
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.http import FileResponse
+from django.utils._os import safe_join
+
+from .routers import read_only
+from .staticfiles import precompressed_path
+from .timing import collect_timings
+
+logger = logging.getLogger('catalog.timing')
+
+READ_ONLY_METHODS = ('GET', 'HEAD')
+
+# Год: файлы с хэшем в имени никогда не меняются
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
+
+
+class ReadOnlyRequestMiddleware:
+    """Запросы GET и HEAD читают из БД через соединение только для чтения, см. catalog.routers"""
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.method not in READ_ONLY_METHODS:
+            return self.get_response(request)
+        with read_only():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.method not in READ_ONLY_METHODS:
+            return await self.get_response(request)
+        with read_only():
+            return await self.get_response(request)
+
+
+class ServerTimingMiddleware:
+    """
+    Замеряет время запросов к БД, рендеринга шаблонов и работы файлового
+    хранилища в рамках запроса и отдаёт его в заголовке Server-Timing.
+    Часть запросов (SERVER_TIMING_LOG_SAMPLE_RATE) пишется в лог catalog.timing
+    одной JSON-строкой. При SERVER_TIMING = False middleware отключается целиком.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.SERVER_TIMING_LOG_SAMPLE_RATE
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with collect_timings() as timings:
+            response = self.get_response(request)
+        self.report(request, response, timings)
+        return response
+
+    async def __acall__(self, request):
+        # Запросы к БД засчитывает обёртка catalog.timing.install_db_timing
+        # в том потоке, где они выполняются, по переданному туда контексту
+        with collect_timings() as timings:
+            response = await self.get_response(request)
+        self.report(request, response, timings)
+        return response
+
+    def report(self, request, response, timings):
+        total = timings.total()
+        metrics = [
+            f'{name};dur={duration * 1000:.1f};desc="{count}"'
+            for name, (duration, count) in timings.metrics.items()
+        ]
+        metrics.append(f'total;dur={total * 1000:.1f}')
+        response.headers['Server-Timing'] = ', '.join(metrics)
+
+        if self.sample_rate and random.random() < self.sample_rate:
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 1),
+                **{
+                    f'{name}_ms': round(duration * 1000, 1)
+                    for name, (duration, count) in timings.metrics.items()
+                },
+                **{f'{name}_count': count for name, (duration, count) in timings.metrics.items()},
+            }))
+
+
+class PrecompressedStaticMiddleware:
+    """
+    Отдаёт статику, собранную collectstatic, прямо из STATIC_ROOT.
+    Если клиент принимает br или gzip и рядом лежит сжатый вариант
+    (см. catalog.staticfiles), отдаётся он. Файлы с хэшем в имени
+    кэшируются браузером на год без перепроверки.
+    В режиме DEBUG статику отдаёт runserver, и middleware отключается.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        if settings.DEBUG or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else f'/{settings.STATIC_URL}'
+        self.hashed_names = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.serve(request)
+        if response is None:
+            response = self.get_response(request)
+        return response
+
+    async def __acall__(self, request):
+        response = self.serve(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
+
+    def serve(self, request):
+        if request.method not in READ_ONLY_METHODS or not request.path.startswith(self.prefix):
+            return None
+        name = request.path[len(self.prefix):]
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        file_path, encoding = precompressed_path(path, request.headers.get('Accept-Encoding', ''))
+        content_type, _ = mimetypes.guess_type(path)
+        response = FileResponse(
+            open(file_path, 'rb'),
+            content_type=content_type or 'application/octet-stream',
+            filename=os.path.basename(path),
+        )
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        if name in self.hashed_names:
+            response.headers['Cache-Control'] = f'public, max-age={STATIC_MAX_AGE}, immutable'
+        else:
+            response.headers['Cache-Control'] = 'public, max-age=60'
+        return response
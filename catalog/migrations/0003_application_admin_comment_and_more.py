@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2025-12-04 00:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_application_applicationimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='application',
+            name='admin_comment',
+            field=models.TextField(blank=True, null=True, verbose_name='Комментарий администратора'),
+        ),
+        migrations.AddField(
+            model_name='applicationimage',
+            name='image_type',
+            field=models.CharField(choices=[('plan', 'План помещения'), ('design', 'Дизайн')], default='plan', max_length=10, verbose_name='Тип изображения'),
+        ),
+    ]
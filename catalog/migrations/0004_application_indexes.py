@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_application_admin_comment_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['created_at'], name='app_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['status', 'created_at'], name='app_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['user', 'status', 'created_at'], name='app_user_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['category', 'status', 'created_at'], name='app_cat_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='applicationimage',
+            index=models.Index(fields=['application', 'image_type'], name='appimage_app_type_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    Application = apps.get_model('catalog', 'Application')
+    ApplicationCounter = apps.get_model('catalog', 'ApplicationCounter')
+    rows = Application.objects.order_by().values('category_id', 'status').annotate(total=Count('id'))
+    ApplicationCounter.objects.bulk_create(
+        ApplicationCounter(category_id=row['category_id'], status=row['status'], count=row['total'])
+        for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_application_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('new', 'Новая'), ('in_progress', 'Принято в работу'), ('completed', 'Выполнено')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counters', to='catalog.category')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('category', 'status'), name='unique_counter_category_status')],
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_applicationcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='applicationimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота'),
+        ),
+        migrations.AddField(
+            model_name='applicationimage',
+            name='thumb_medium',
+            field=models.ImageField(blank=True, editable=False, upload_to='applications/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='applicationimage',
+            name='thumb_small',
+            field=models.ImageField(blank=True, editable=False, upload_to='applications/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='applicationimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина'),
+        ),
+    ]
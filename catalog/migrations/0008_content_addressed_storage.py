@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:00
+
+import catalog.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='applicationimage',
+            name='image',
+            field=models.ImageField(db_index=True, storage=catalog.storage.application_storage, upload_to='applications/', verbose_name='Фотография'),
+        ),
+        migrations.AlterField(
+            model_name='applicationimage',
+            name='thumb_medium',
+            field=models.ImageField(blank=True, db_index=True, editable=False, storage=catalog.storage.application_storage, upload_to='applications/thumbs/'),
+        ),
+        migrations.AlterField(
+            model_name='applicationimage',
+            name='thumb_small',
+            field=models.ImageField(blank=True, db_index=True, editable=False, storage=catalog.storage.application_storage, upload_to='applications/thumbs/'),
+        ),
+    ]
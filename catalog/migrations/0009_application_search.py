@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:00
+
+from django.db import migrations
+
+from catalog.search import create_search_index, drop_search_index
+
+
+def forwards(apps, schema_editor):
+    create_search_index(schema_editor)
+
+
+def backwards(apps, schema_editor):
+    drop_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:30
+
+from django.db import migrations, models
+
+from catalog.search import create_search_index
+
+
+def recreate_search_index(apps, schema_editor):
+    # SQLite добавляет столбец с значением по умолчанию, пересоздавая таблицу,
+    # а вместе со старой таблицей удаляются и триггеры полнотекстового индекса
+    create_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_application_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, recreate_search_index),
+        migrations.AddField(
+            model_name='application',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Изменена'),
+        ),
+        migrations.RunPython(recreate_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:40
+
+from django.db import migrations
+
+from catalog.accounts import EMAIL_INDEX, duplicate_email_accounts
+
+
+def check_duplicate_emails(apps, schema_editor):
+    # Уникальный индекс не создать, пока адреса повторяются. Какой из аккаунтов
+    # оставить с адресом, решает администратор: миграция данные не меняет
+    accounts = duplicate_email_accounts(apps.get_model('auth', 'User'))
+    if not accounts:
+        return
+    raise RuntimeError(
+        'Один email у нескольких пользователей (без учёта регистра), уникальный индекс '
+        'не создать. Измените или очистите адреса и повторите migrate '
+        '(список выводит manage.py find_duplicate_emails):\n'
+        + '\n'.join(f'  id={pk} {username} <{email}>' for pk, username, email in accounts)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('catalog', '0010_application_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        # Уникальность email без учёта регистра проверяет БД, а не форма:
+        # две одновременные регистрации не пройдут обе. Пустой адрес
+        # (createsuperuser без email) не ограничивается
+        migrations.RunSQL(
+            f"CREATE UNIQUE INDEX {EMAIL_INDEX} ON auth_user (lower(email)) WHERE email <> ''",
+            f'DROP INDEX {EMAIL_INDEX}',
+        ),
+    ]
@@ -1,20 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .storage import application_storage
 from django.core.exceptions import ValidationError
 import os
-from django.db.models.signals import post_save
-from django.dispatch import receiver
-
-
-# Добавим сигнал для установки email при создании пользователя
-@receiver(post_save, sender=User)
-def save_user_email(sender, instance, created, **kwargs):
-    """
-    Гарантируем, что email сохранится при создании пользователя
-    """
-    if created and hasattr(instance, '_email_to_save'):
-        instance.email = instance._email_to_save
-        instance.save(update_fields=['email'])
 
 
 class Category(models.Model):
@@ -23,10 +13,32 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
-    def delete(self, *args, **kwargs):
-        # При удалении категории удаляем все связанные заявки
-        Application.objects.filter(category=self).delete()
-        super().delete(*args, **kwargs)
+    def delete(self, *args, batch_size=None, **kwargs):
+        from .deletion import delete_category_applications
+
+        # При удалении категории удаляем все связанные заявки.
+        # Заявки удаляются пачками в коротких транзакциях, файлы - фоновыми задачами
+        delete_category_applications(self, batch_size=batch_size)
+        return super().delete(*args, **kwargs)
+
+
+class ApplicationQuerySet(models.QuerySet):
+    def with_related(self):
+        """Пользователь и категория подтягиваются JOIN-ом, а не запросом на каждую строку"""
+        return self.select_related('user', 'category')
+
+    def with_cover_image(self):
+        """
+        Первое изображение (план или дизайн) каждой заявки одним дополнительным запросом.
+        Срез внутри Prefetch выполняется оконной функцией, лишние картинки не загружаются.
+        """
+        return self.prefetch_related(
+            models.Prefetch(
+                'images',
+                queryset=ApplicationImage.objects.order_by('pk')[:1],
+                to_attr='first_images',
+            )
+        )
 
 
 class Application(models.Model):
@@ -48,15 +60,43 @@ class Application(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Временная метка')
     admin_comment = models.TextField(verbose_name='Комментарий администратора', blank=True, null=True)
+    # Обновляется при каждом save(); входит в ключ кэша строк в списках заявок, см. catalog.caching
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Изменена')
+
+    objects = ApplicationQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Заявка'
         verbose_name_plural = 'Заявки'
+        # Индексы под основные выборки: фильтр по статусу, пользователю
+        # или категории с сортировкой по дате создания
+        indexes = [
+            models.Index(fields=['created_at'], name='app_created_idx'),
+            models.Index(fields=['user', 'created_at'], name='app_user_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='app_status_created_idx'),
+            models.Index(fields=['user', 'status', 'created_at'], name='app_user_status_created_idx'),
+            models.Index(fields=['category', 'status', 'created_at'], name='app_cat_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.user.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем статус и категорию из БД, чтобы сигналы видели, откуда был переход
+        if 'status' in field_names:
+            instance._loaded_status = instance.status
+        if 'category_id' in field_names:
+            instance._loaded_category_id = instance.category_id
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Счётчики обновляются в post_save и должны попасть в ту же транзакцию
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def can_be_deleted(self):
         return self.status in ['new']
 
@@ -64,6 +104,35 @@ class Application(models.Model):
         """Проверяет, можно ли изменить статус заявки"""
         return self.status == 'new'
 
+    @property
+    def cover_image(self):
+        """Первое изображение заявки; без with_cover_image() делает отдельный запрос"""
+        if hasattr(self, 'first_images'):
+            return self.first_images[0] if self.first_images else None
+        return self.images.order_by('pk').first()
+
+
+class ApplicationCounter(models.Model):
+    """Денормализованное количество заявок по категории и статусу"""
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='counters')
+    status = models.CharField(max_length=20, choices=Application.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'status'], name='unique_counter_category_status'),
+        ]
+
+    def __str__(self):
+        return f"{self.category} / {self.get_status_display()}: {self.count}"
+
+
+# Ширина уменьшенных копий изображений в пикселях
+THUMBNAIL_WIDTHS = {
+    'thumb_small': 320,
+    'thumb_medium': 640,
+}
+
 
 class ApplicationImage(models.Model):
     IMAGE_TYPES = [
@@ -72,8 +141,11 @@ class ApplicationImage(models.Model):
     ]
 
     application = models.ForeignKey(Application, on_delete=models.CASCADE, related_name='images')
+    # Одинаковые файлы хранятся один раз, см. catalog.storage
     image = models.ImageField(
         upload_to='applications/',
+        storage=application_storage,
+        db_index=True,
         verbose_name='Фотография'
     )
     image_type = models.CharField(
@@ -84,5 +156,77 @@ class ApplicationImage(models.Model):
     )
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    # Уменьшенные копии и размеры оригинала заполняются в фоне, см. catalog.thumbnails
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name='Ширина')
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name='Высота')
+    thumb_small = models.ImageField(
+        upload_to='applications/thumbs/', storage=application_storage, db_index=True, blank=True, editable=False
+    )
+    thumb_medium = models.ImageField(
+        upload_to='applications/thumbs/', storage=application_storage, db_index=True, blank=True, editable=False
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['application', 'image_type'], name='appimage_app_type_idx'),
+        ]
+
+    def __str__(self):
+        return f"Фото ({self.get_image_type_display()}) для {self.application.title}"
+
+    @property
+    def display_url(self):
+        """Картинка для карточек: средняя копия, если она уже готова"""
+        if self.thumb_medium:
+            return self.thumb_medium.url
+        return self.image.url
+
+    @property
+    def preview_url(self):
+        if self.thumb_small:
+            return self.thumb_small.url
+        return self.image.url
+
+    @property
+    def srcset(self):
+        candidates = []
+        if self.thumb_small:
+            candidates.append(f'{self.thumb_small.url} {THUMBNAIL_WIDTHS["thumb_small"]}w')
+        if self.thumb_medium:
+            candidates.append(f'{self.thumb_medium.url} {THUMBNAIL_WIDTHS["thumb_medium"]}w')
+        if candidates and self.width:
+            candidates.append(f'{self.image.url} {self.width}w')
+        return ', '.join(candidates)
+
+
+class Job(models.Model):
+    """Фоновая задача для manage.py runworkers, см. catalog.jobs"""
+    STATUS_CHOICES = [
+        ('pending', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Выполнена'),
+        ('failed', 'Ошибка'),
+    ]
+
+    kind = models.CharField(max_length=100, verbose_name='Тип')
+    # Повторная постановка задачи с тем же ключом ничего не делает
+    key = models.CharField(max_length=255, unique=True, verbose_name='Ключ')
+    payload = models.JSONField(default=dict, verbose_name='Параметры')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='Статус')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попыток')
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name='Максимум попыток')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='Не раньше')
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name='Взята в работу')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+
     def __str__(self):
-        return f"Фото ({self.get_image_type_display()}) для {self.application.title}"
\ No newline at end of file
+        return f"{self.key} ({self.get_status_display()})"
@@ -0,0 +1,195 @@
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+PER_PAGE = 20
+# Сколько секунд живёт закэшированный COUNT(*) в CountedPaginator
+COUNT_CACHE_TIMEOUT = 60
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder обрезает микросекунды, а ключу нужна точная метка времени
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPage:
+    """Страница выборки с курсорами на соседние страницы"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Постраничный вывод по ключу сортировки (keyset) вместо OFFSET.
+
+    Курсор хранит значения ключа последней (или первой) строки страницы,
+    поэтому каждая страница - это один запрос с условием "после ключа"
+    и LIMIT, и её стоимость не зависит от глубины.
+    Последнее поле сортировки должно быть уникальным (обычно id).
+    """
+
+    def __init__(self, queryset, ordering=('-created_at', '-id'), per_page=PER_PAGE):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    def page(self, cursor=None):
+        queryset, backwards, values = self._query(cursor)
+        return self._build_page(list(queryset), backwards, values)
+
+    async def apage(self, cursor=None):
+        """То же, что page(), через асинхронный ORM"""
+        queryset, backwards, values = self._query(cursor)
+        return self._build_page([row async for row in queryset], backwards, values)
+
+    def _query(self, cursor):
+        direction, values = self.decode(cursor) if cursor else ('next', None)
+        backwards = direction == 'previous'
+
+        ordering = self.ordering
+        if backwards:
+            ordering = tuple(self._flip(name) for name in ordering)
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, backwards))
+        return queryset[:self.per_page + 1], backwards, values
+
+    def _build_page(self, rows, backwards, values):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        if not rows:
+            return KeysetPage(rows)
+
+        if backwards:
+            # Мы пришли со следующей страницы, значит она точно есть
+            next_cursor = self.encode('next', rows[-1])
+            previous_cursor = self.encode('previous', rows[0]) if has_more else None
+        else:
+            next_cursor = self.encode('next', rows[-1]) if has_more else None
+            previous_cursor = self.encode('previous', rows[0]) if values is not None else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def encode(self, direction, row):
+        values = [self._value(row, name) for name in self.fields]
+        payload = json.dumps([direction[0], values], cls=CursorEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (binascii.Error, UnicodeError, ValueError, TypeError):
+            raise InvalidCursor(cursor)
+
+        if direction not in ('n', 'p') or not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor(cursor)
+
+        return ('next' if direction == 'n' else 'previous'), [
+            self._to_python(name, value) for name, value in zip(self.fields, values)
+        ]
+
+    def _seek(self, values, backwards):
+        # (a, b) < (x, y)  ==>  a <= x AND (a < x OR (a = x AND b < y)).
+        # Условие a <= x избыточно, но только его SQLite использует как границу
+        # диапазона индекса: по одному OR он просматривал бы индекс с начала
+        condition = Q()
+        equal = {}
+        for name, ordered, value in zip(self.fields, self.ordering, values):
+            descending = ordered.startswith('-') != backwards
+            lookup = f'{name}__lt' if descending else f'{name}__gt'
+            condition |= Q(**equal, **{lookup: value})
+            equal[name] = value
+        descending = self.ordering[0].startswith('-') != backwards
+        bound = Q(**{f'{self.fields[0]}__lte' if descending else f'{self.fields[0]}__gte': values[0]})
+        return bound & condition
+
+    def _to_python(self, name, value):
+        try:
+            field = self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Аннотации (например, ранг поиска) уже хранятся в JSON-совместимом виде
+            return value
+        try:
+            return field.to_python(value)
+        except ValidationError:
+            raise InvalidCursor(value)
+
+    @staticmethod
+    def _value(row, name):
+        if isinstance(row, dict):
+            return row[name]
+        return getattr(row, name)
+
+    @staticmethod
+    def _flip(name):
+        return name[1:] if name.startswith('-') else f'-{name}'
+
+
+class CountedPaginator(Paginator):
+    """
+    Paginator без COUNT(*) при каждом открытии страницы. Если количество
+    известно заранее (например, из счётчиков), используется оно, иначе
+    результат COUNT(*) кэшируется на COUNT_CACHE_TIMEOUT секунд по тексту запроса.
+    """
+
+    def __init__(self, *args, count=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.known_count = count
+
+    @property
+    def count(self):
+        if self.known_count is None:
+            self.known_count = self._cached_count()
+        return self.known_count
+
+    def _cached_count(self):
+        try:
+            sql, params = self.object_list.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        digest = hashlib.md5(f'{sql}{params}'.encode(), usedforsecurity=False).hexdigest()
+        key = f'catalog:count:{digest}'
+        count = cache.get(key)
+        if count is None:
+            count = self.object_list.count()
+            cache.set(key, count, COUNT_CACHE_TIMEOUT)
+        return count
@@ -0,0 +1,44 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = 'replica'
+
+_read_only = ContextVar('catalog_read_only', default=False)
+
+
+@contextmanager
+def read_only():
+    """Чтения внутри блока идут через соединение только для чтения, если оно настроено"""
+    token = _read_only.set(True)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+class ReadReplicaRouter:
+    """
+    Направляет чтения в блоке read_only() (GET- и HEAD-запросы, см.
+    catalog.middleware) на алиас replica. Записи и все запросы вне блока
+    идут в default. Без алиаса replica в DATABASES роутер ничего не меняет.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _read_only.get() or REPLICA_DB_ALIAS not in connections.settings:
+            return None
+        # Внутри транзакции на default нужно видеть её собственные, ещё не закоммиченные записи
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replica - это тот же файл БД
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_DB_ALIAS
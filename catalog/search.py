@@ -0,0 +1,126 @@
+import re
+from functools import cache
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+
+SEARCH_TABLE = 'catalog_application_fts'
+
+# Полнотекстовый индекс по названию и описанию заявки (SQLite FTS5).
+# Таблица external content: текст хранится только в catalog_application,
+# индекс синхронизируют триггеры, поэтому он обновляется и при bulk_create,
+# QuerySet.update и пакетном удалении, где сигналы не срабатывают.
+# SQLite удаляет триггеры вместе с таблицей, поэтому миграции, которые
+# пересоздают catalog_application, должны снова вызвать create_search_index.
+_CREATE_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(
+        title, description,
+        content='catalog_application', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {SEARCH_TABLE}_insert AFTER INSERT ON catalog_application BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {SEARCH_TABLE}_delete AFTER DELETE ON catalog_application BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {SEARCH_TABLE}_update AFTER UPDATE OF title, description ON catalog_application BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {SEARCH_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')",
+]
+
+_DROP_SQL = [
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_update',
+    f'DROP TABLE IF EXISTS {SEARCH_TABLE}',
+]
+
+
+def create_search_index(schema_editor):
+    """Создаёт (или пересоздаёт) индекс и триггеры; на других СУБД ничего не делает"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    drop_search_index(schema_editor)
+    for sql in _CREATE_SQL:
+        schema_editor.execute(sql)
+    search_index_exists.cache_clear()
+
+
+def drop_search_index(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in _DROP_SQL:
+        schema_editor.execute(sql)
+    search_index_exists.cache_clear()
+
+
+@cache
+def search_index_exists(using):
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        return SEARCH_TABLE in connection.introspection.table_names(cursor)
+
+
+def match_query(text):
+    """
+    Превращает ввод пользователя в запрос FTS5: все слова обязательны,
+    каждое ищется по префиксу. Операторы и кавычки FTS5 из ввода отбрасываются.
+    """
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', text))
+
+
+def search_applications(queryset, text):
+    """
+    Фильтрует заявки по названию, описанию и имени пользователя и добавляет
+    аннотацию search_rank: чем меньше, тем релевантнее (bm25 в FTS5 отрицателен).
+    Сортировку оставляет вызывающему: ('search_rank', '-created_at', '-id').
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    # Пользователей мало: их id выбираются отдельным запросом, чтобы условие
+    # по имени не превращало поиск в соединение с полным перебором заявок
+    users = User.objects.all()
+    for word in words:
+        users = users.filter(username__icontains=word)
+    by_user = Q(user_id__in=users.values('pk'))
+
+    if not search_index_exists(queryset.db):
+        # Запасной вариант для СУБД без FTS5: LIKE по всем полям, без ранжирования
+        by_text = Q()
+        for word in words:
+            by_text &= Q(title__icontains=word) | Q(description__icontains=word)
+        return queryset.filter(by_text | by_user).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    query = match_query(text)
+    table = queryset.model._meta.db_table
+    matches = RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', (query,))
+    # Ранг считается только для уже отобранных строк, по rowid
+    rank = RawSQL(
+        f'SELECT rank FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND rowid = {table}.id',
+        (query,),
+        output_field=FloatField(),
+    )
+    # Совпавшие только по имени пользователя идут после найденных по тексту
+    return queryset.filter(Q(pk__in=matches) | by_user).annotate(
+        search_rank=Coalesce(rank, Value(0.0), output_field=FloatField())
+    )
@@ -0,0 +1,89 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .caching import INDEX_STATUSES, invalidate_index_context, invalidate_row_fragments
+from .counters import adjust_counter
+from .jobs import enqueue_on_commit
+from .models import Category, Application, ApplicationImage
+
+_bulk_delete = ContextVar('catalog_bulk_delete', default=False)
+
+
+@contextmanager
+def bulk_delete():
+    """
+    Отключает построчные обработчики удаления заявок и изображений.
+    Вызывающий код сам пересчитывает счётчики, кэш и удаляет файлы пачкой,
+    см. catalog.deletion
+    """
+    token = _bulk_delete.set(True)
+    try:
+        yield
+    finally:
+        _bulk_delete.reset(token)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, **kwargs):
+    # Название категории выводится в карточках главной страницы
+    if not created:
+        transaction.on_commit(invalidate_index_context)
+
+
+@receiver(post_save, sender=Application)
+def application_saved(sender, instance, created, **kwargs):
+    previous_status = getattr(instance, '_loaded_status', None)
+    previous_category_id = getattr(instance, '_loaded_category_id', None)
+
+    if created:
+        adjust_counter(instance.category_id, instance.status, 1)
+    elif previous_status is not None and previous_category_id is not None:
+        if (previous_category_id, previous_status) != (instance.category_id, instance.status):
+            adjust_counter(previous_category_id, previous_status, -1)
+            adjust_counter(instance.category_id, instance.status, 1)
+
+    if instance.status in INDEX_STATUSES or previous_status in INDEX_STATUSES:
+        transaction.on_commit(invalidate_index_context)
+    instance._loaded_status = instance.status
+    instance._loaded_category_id = instance.category_id
+
+
+@receiver(post_delete, sender=Application)
+def application_deleted(sender, instance, **kwargs):
+    if _bulk_delete.get():
+        return
+    # Удаление идёт через Collector, который уже открыл транзакцию
+    adjust_counter(
+        getattr(instance, '_loaded_category_id', instance.category_id),
+        getattr(instance, '_loaded_status', instance.status),
+        -1,
+    )
+    if instance.status in INDEX_STATUSES:
+        transaction.on_commit(invalidate_index_context)
+    # После save() ключ строки меняется сам, а удалённую строку убираем явно.
+    # Лишний сброс при откате транзакции безвреден
+    invalidate_row_fragments(instance)
+
+
+@receiver(post_save, sender=ApplicationImage)
+@receiver(post_delete, sender=ApplicationImage)
+def application_image_changed(sender, instance, **kwargs):
+    if _bulk_delete.get():
+        return
+    # На главной показываются только картинки выполненных заявок
+    if Application.objects.filter(pk=instance.application_id, status='completed').exists():
+        transaction.on_commit(invalidate_index_context)
+
+
+@receiver(post_delete, sender=ApplicationImage)
+def application_image_deleted(sender, instance, **kwargs):
+    if _bulk_delete.get():
+        return
+    names = [field.name for field in (instance.image, instance.thumb_small, instance.thumb_medium) if field]
+    if names:
+        # Хранилище само проверит, не ссылаются ли на файл другие изображения
+        enqueue_on_commit('delete_media', key=f'delete_media:image:{instance.pk}', names=names)
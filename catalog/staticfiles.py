@@ -0,0 +1,57 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него отдаются только gzip-варианты
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+# Файлы меньше этого размера сжатие почти не уменьшает
+MIN_COMPRESS_SIZE = 256
+
+
+def compress_file(path):
+    """Пишет рядом с файлом path.gz и path.br, если они получаются меньше оригинала"""
+    with open(path, 'rb') as file:
+        content = file.read()
+    if len(content) < MIN_COMPRESS_SIZE:
+        return []
+
+    variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(content, quality=11)))
+
+    written = []
+    for suffix, compressed in variants:
+        if len(compressed) < len(content):
+            with open(path + suffix, 'wb') as file:
+                file.write(compressed)
+            written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage, который после collectstatic сжимает файлы
+    с хэшем в имени в .gz и .br. Их отдаёт PrecompressedStaticMiddleware.
+    """
+
+    def post_process(self, *args, **kwargs):
+        yield from super().post_process(*args, **kwargs)
+        if kwargs.get('dry_run'):
+            return
+        for name in set(self.hashed_files.values()):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                compress_file(self.path(name))
+
+
+def precompressed_path(path, accept_encoding):
+    """Путь к сжатому варианту файла, который принимает клиент, и его кодировка"""
+    accepted = {part.split(';')[0].strip() for part in accept_encoding.split(',')}
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if encoding in accepted and os.path.isfile(path + suffix):
+            return path + suffix, encoding
+    return path, None
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+import time
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db.models import FileField
+
+from .timing import timed
+
+# Файл, которому _commit недавно отдал своё имя, не удаляется: строка новой
+# загрузки с этим именем может быть ещё не сохранена. Такие файлы потом
+# подбирает gc_media
+DELETE_GRACE_PERIOD = 10 * 60
+
+
+def remove_unless_recent(path, min_age):
+    """
+    Удаляет файл, если он не изменялся последние min_age секунд; возвращает, удалён ли он.
+
+    Файл сначала убирается с места: после этого _commit его не найдёт и запишет
+    свою копию, а время изменения уже не поменяется между проверкой и удалением.
+    Свежий файл возвращается на место.
+    """
+    removed = f'{path}.deleting'
+    try:
+        os.rename(path, removed)
+    except FileNotFoundError:
+        return False
+    if time.time() - os.stat(removed).st_mtime < min_age:
+        os.replace(removed, path)
+        return False
+    os.unlink(removed)
+    return True
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище, где имя файла - это SHA-256 его содержимого.
+
+    Хэш считается во время записи чанков во временный файл рядом с целевым,
+    после чего файл атомарно переименовывается. Если файл с таким хэшем уже
+    есть, временный файл просто удаляется: одинаковые загрузки занимают
+    место на диске один раз.
+
+    Удаление работает как подсчёт ссылок: файл удаляется, только если на
+    него больше не ссылается ни одно файловое поле с этим хранилищем
+    и его не отдавали новой загрузке последние DELETE_GRACE_PERIOD секунд.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Имя всё равно будет заменено хэшем в _save, суффиксы не нужны
+        return name
+
+    @timed('storage')
+    def _open(self, name, mode='rb'):
+        return super()._open(name, mode)
+
+    @timed('storage')
+    def _save(self, name, content):
+        directory, basename = posixpath.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+
+        # Файл уже принят в MEDIA_ROOT и захэширован обработчиком загрузки (catalog.uploads)
+        if getattr(content, 'sha256', None) and content.temporary_file_path().startswith(self.location):
+            content.file.close()
+            return self._commit(content.temporary_file_path(), directory, content.sha256, extension)
+
+        full_directory = self.path(directory)
+        os.makedirs(full_directory, exist_ok=True)
+        if self.directory_permissions_mode is not None:
+            os.chmod(full_directory, self.directory_permissions_mode)
+
+        digest = hashlib.sha256()
+        fd, temporary_path = tempfile.mkstemp(dir=full_directory, prefix='.upload-', suffix=extension)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+            return self._commit(temporary_path, directory, digest.hexdigest(), extension)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.unlink(temporary_path)
+            raise
+
+    def _commit(self, temporary_path, directory, hexdigest, extension):
+        """Переносит готовый временный файл на место, определяемое хэшем"""
+        name = posixpath.join(directory, hexdigest[:2], f'{hexdigest}{extension}')
+        full_path = self.path(name)
+
+        # Свежее время изменения защищает файл от delete и gc_media, пока новая ссылка не сохранена.
+        # Если файл как раз убирается delete или gc_media, записывается своя копия
+        try:
+            os.utime(full_path)
+        except FileNotFoundError:
+            pass
+        else:
+            os.unlink(temporary_path)
+            return name
+
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        os.replace(temporary_path, full_path)
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return name
+
+    def is_referenced(self, name):
+        for model in apps.get_models():
+            for field in model._meta.get_fields():
+                if isinstance(field, FileField) and field.storage is self:
+                    if model._default_manager.filter(**{field.name: name}).exists():
+                        return True
+        return False
+
+    def delete(self, name):
+        if not name or self.is_referenced(name):
+            return
+        remove_unless_recent(self.path(name), DELETE_GRACE_PERIOD)
+
+_application_storage = ContentAddressedStorage()
+
+
+def application_storage():
+    return _application_storage
@@ -0,0 +1,119 @@
+import datetime
+
+from django import template
+from django.utils import formats, timezone
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+register = template.Library()
+
+
+def _start(year, month=1, day=1):
+    return timezone.make_aware(datetime.datetime(year, month, day))
+
+
+def _next(moment, kind):
+    if kind == 'year':
+        return _start(moment.year + 1)
+    if kind == 'month':
+        return _start(moment.year + moment.month // 12, moment.month % 12 + 1)
+    return _start(moment.year, moment.month, moment.day) + datetime.timedelta(days=1)
+
+
+def _present_units(queryset, field_name, kind, start=None, end=None):
+    """
+    Годы, месяцы или дни, в которых есть строки. Вместо DISTINCT по всей
+    выборке каждый следующий период ищется одним запросом по индексу поля:
+    число запросов равно числу найденных периодов, а не числу строк
+    """
+    values = queryset.order_by(field_name).values_list(field_name, flat=True)
+    units = []
+    while True:
+        bounded = values
+        if start is not None:
+            bounded = bounded.filter(**{f'{field_name}__gte': start})
+        if end is not None:
+            bounded = bounded.filter(**{f'{field_name}__lt': end})
+        value = bounded.first()
+        if value is None:
+            return units
+        value = timezone.localtime(value)
+        units.append(value)
+        start = _next(value, kind)
+
+
+@register.inclusion_tag('admin/date_hierarchy.html')
+def indexed_date_hierarchy(cl):
+    """
+    Замена стандартного {% date_hierarchy %} для поля DateTimeField с индексом.
+    Если changelist предоставляет undated_queryset (выборку без выбранного
+    периода), периоды ищутся в ней
+    """
+    field_name = cl.date_hierarchy
+    queryset = getattr(cl, 'undated_queryset', cl.queryset)
+    year_field = f'{field_name}__year'
+    month_field = f'{field_name}__month'
+    day_field = f'{field_name}__day'
+    year_lookup = cl.params.get(year_field)
+    month_lookup = cl.params.get(month_field)
+    day_lookup = cl.params.get(day_field)
+
+    def link(filters):
+        return cl.get_query_string(filters, [f'{field_name}__'])
+
+    if not (year_lookup or month_lookup or day_lookup):
+        # Первая и последняя даты - два поиска по индексу вместо MIN/MAX по всей выборке
+        values = queryset.values_list(field_name, flat=True)
+        first = values.order_by(field_name).first()
+        last = values.order_by(f'-{field_name}').first()
+        if first and last:
+            first, last = timezone.localtime(first), timezone.localtime(last)
+            if first.year == last.year:
+                year_lookup = first.year
+                if first.month == last.month:
+                    month_lookup = first.month
+
+    if year_lookup and month_lookup and day_lookup:
+        day = datetime.date(int(year_lookup), int(month_lookup), int(day_lookup))
+        return {
+            'show': True,
+            'back': {
+                'link': link({year_field: year_lookup, month_field: month_lookup}),
+                'title': capfirst(formats.date_format(day, 'YEAR_MONTH_FORMAT')),
+            },
+            'choices': [{'title': capfirst(formats.date_format(day, 'MONTH_DAY_FORMAT'))}],
+        }
+    if year_lookup and month_lookup:
+        start = _start(int(year_lookup), int(month_lookup))
+        days = _present_units(queryset, field_name, 'day', start, _next(start, 'month'))
+        return {
+            'show': True,
+            'back': {'link': link({year_field: year_lookup}), 'title': str(year_lookup)},
+            'choices': [
+                {
+                    'link': link({year_field: year_lookup, month_field: month_lookup, day_field: day.day}),
+                    'title': capfirst(formats.date_format(day, 'MONTH_DAY_FORMAT')),
+                }
+                for day in days
+            ],
+        }
+    if year_lookup:
+        start = _start(int(year_lookup))
+        months = _present_units(queryset, field_name, 'month', start, _next(start, 'year'))
+        return {
+            'show': True,
+            'back': {'link': link({}), 'title': _('All dates')},
+            'choices': [
+                {
+                    'link': link({year_field: year_lookup, month_field: month.month}),
+                    'title': capfirst(formats.date_format(month, 'YEAR_MONTH_FORMAT')),
+                }
+                for month in months
+            ],
+        }
+    years = _present_units(queryset, field_name, 'year')
+    return {
+        'show': True,
+        'back': None,
+        'choices': [{'link': link({year_field: str(year.year)}), 'title': str(year.year)} for year in years],
+    }
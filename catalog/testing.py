@@ -0,0 +1,36 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+from django.utils.module_loading import import_string
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Запускает тесты с файловыми кэшами во временном каталоге.
+
+    Тесты очищают кэш, а каталоги кэша по умолчанию общие с запущенным
+    на той же машине сайтом и воркерами. Бэкенды остаются прежними,
+    меняется только LOCATION, и после прогона каталог удаляется.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='designpro-test-cache-')
+        caches = {}
+        for alias, config in settings.CACHES.items():
+            config = dict(config)
+            if issubclass(import_string(config['BACKEND']), FileBasedCache):
+                config['LOCATION'] = os.path.join(self.cache_dir, alias)
+            caches[alias] = config
+        self.cache_override = override_settings(CACHES=caches)
+        self.cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_override.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
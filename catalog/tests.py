@@ -1,3 +1,1759 @@
-from django.test import TestCase
+import gzip
+import datetime
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth.models import Permission, User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command, CommandError
+from django.db import IntegrityError, connection, connections, transaction
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import api, jobs
+from . import urls as catalog_urls
+from .accounts import EMAIL_INDEX, ConfigurablePBKDF2PasswordHasher
+from .benchmarking import percentile
+from .management.commands.benchmark import POST_ONLY_ROUTES
+from .caching import INDEX_GENERATION_KEY, get_index_context, invalidate_index_context, row_fragment_keys
+from .counters import actual_counts, rebuild_counters, status_count, stored_counts
+from .deletion import delete_category_applications
+from .filecache import LockingFileBasedCache
+from .jobs import enqueue
+from .middleware import ReadOnlyRequestMiddleware
+from .models import Application, ApplicationCounter, Category, ApplicationImage, Job
+from .pagination import InvalidCursor, KeysetPaginator
+from .routers import ReadReplicaRouter, read_only
+from .search import search_applications
+from .storage import DELETE_GRACE_PERIOD, application_storage
+from .transitions import bulk_change_status
+from .uploads import HEADER_SIZE, MAX_IMAGE_SIZE, UPLOAD_TEMP_DIR, read_image_header
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('manager', 'manager@example.com', 'password', is_staff=True)
+        cls.user = User.objects.create_user('client', 'client@example.com', 'password')
+        category = Category.objects.create(name='Кухня')
+        Application.objects.bulk_create(
+            Application(user=cls.user, title=f'Заявка {i}', description='Описание', category=category)
+            for i in range(55)
+        )
+        # Каждые пять заявок созданы в одну и ту же секунду: порядок внутри группы задаёт id
+        started = timezone.now()
+        for number, pk in enumerate(Application.objects.order_by('pk').values_list('pk', flat=True)):
+            Application.objects.filter(pk=pk).update(created_at=started + timedelta(seconds=number // 5))
+        cls.expected = list(Application.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def collect_pages(self, paginator):
+        """Страницы вперёд до конца, затем назад до начала"""
+        forward = [paginator.page()]
+        while forward[-1].has_next:
+            forward.append(paginator.page(forward[-1].next_cursor))
+        backward = [forward[-1]]
+        while backward[-1].has_previous:
+            backward.append(paginator.page(backward[-1].previous_cursor))
+        return forward, backward[::-1]
+
+    def test_forward_and_backward_with_ties(self):
+        paginator = KeysetPaginator(Application.objects.all(), per_page=7)
+        forward, backward = self.collect_pages(paginator)
+
+        pages = [[application.pk for application in page] for page in forward]
+        self.assertEqual([pk for page in pages for pk in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [7] * 7 + [6])
+        self.assertEqual([[application.pk for application in page] for page in backward], pages)
+        self.assertFalse(forward[0].has_previous)
+        self.assertFalse(forward[-1].has_next)
+
+    def test_invalid_cursor(self):
+        paginator = KeysetPaginator(Application.objects.all())
+        cursors = (
+            'broken',
+            paginator.encode('next', {'created_at': 'вчера', 'id': 1}),
+            paginator.encode('sideways', {'created_at': timezone.now(), 'id': 1}),
+        )
+        for cursor in cursors:
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                paginator.page(cursor)
+
+    def assertPagesThroughView(self, url, per_page):
+        response = self.client.get(url)
+        page = response.context['page']
+        self.assertEqual([application.pk for application in page], self.expected[:per_page])
+        self.assertFalse(page.has_previous)
+        self.assertContains(response, f'cursor={page.next_cursor}')
+
+        response = self.client.get(url, {'cursor': page.next_cursor})
+        page = response.context['page']
+        self.assertEqual([application.pk for application in page], self.expected[per_page:per_page * 2])
+
+        response = self.client.get(url, {'cursor': page.previous_cursor})
+        self.assertEqual([application.pk for application in response.context['page']], self.expected[:per_page])
+
+        # Испорченный курсор из адресной строки открывает первую страницу
+        response = self.client.get(url, {'cursor': 'broken'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([application.pk for application in response.context['page']], self.expected[:per_page])
+
+    def test_my_applications(self):
+        self.client.force_login(self.user)
+        self.assertPagesThroughView(reverse('my_applications'), 20)
+
+    def test_admin_application_list(self):
+        self.client.force_login(self.staff)
+        self.assertPagesThroughView(reverse('admin_application_list'), 50)
+
+
+class RelatedLoadingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('client', 'client@example.com', 'password')
+        cls.category = Category.objects.create(name='Кухня')
+
+    def add_applications(self, count):
+        for i in range(count):
+            application = Application.objects.create(
+                user=self.user, title=f'Заявка {i}', description='Описание', category=self.category,
+            )
+            # У каждой второй заявки две картинки, обложка - первая из них
+            for number in range(2 if i % 2 else 0):
+                ApplicationImage.objects.create(application=application, image=f'applications/{i}-{number}.png')
+
+    def render_rows(self):
+        rows = []
+        for application in Application.objects.with_related().with_cover_image():
+            cover = application.cover_image
+            rows.append((application.user.username, application.category.name, cover and cover.image.name))
+        return rows
+
+    def test_query_count_does_not_depend_on_rows(self):
+        for count in (2, 10):
+            self.add_applications(count)
+            # Заявки с пользователем и категорией, затем обложки одним запросом
+            with self.assertNumQueries(2):
+                rows = self.render_rows()
+        self.assertEqual(len(rows), 12)
+        self.assertIn(('client', 'Кухня', 'applications/1-0.png'), rows)
+        self.assertIn(('client', 'Кухня', None), rows)
+
+
+class MigrationsTests(TransactionTestCase):
+    def test_no_missing_migrations(self):
+        out = StringIO()
+        call_command('makemigrations', 'catalog', check=True, dry_run=True, stdout=out)
+
+    def test_indexes_are_created(self):
+        out = StringIO()
+        call_command('sqlmigrate', 'catalog', '0004', stdout=out)
+        sql = out.getvalue()
+        for name in (
+            'app_created_idx',
+            'app_status_created_idx',
+            'app_user_status_created_idx',
+            'app_cat_status_created_idx',
+            'appimage_app_type_idx',
+        ):
+            self.assertIn(f'CREATE INDEX "{name}"', sql)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть только в SQLite')
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('client', 'client@example.com', 'password')
+        cls.category = Category.objects.create(name='Кухня')
+        for i, status in enumerate(['new', 'in_progress', 'completed'] * 5):
+            application = Application.objects.create(
+                user=cls.user,
+                title=f'Заявка {i}',
+                description='Описание',
+                category=cls.category,
+                status=status,
+            )
+            ApplicationImage.objects.create(application=application, image='applications/plan.png')
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return ' '.join(row[-1] for row in cursor.fetchall())
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = self.query_plan(queryset)
+        self.assertIn(index_name, plan)
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_latest_applications(self):
+        self.assertUsesIndex(Application.objects.order_by('-created_at', '-id')[:50], 'app_created_idx')
+
+    def test_status_filter(self):
+        queryset = Application.objects.filter(status='completed').order_by('-created_at')[:4]
+        self.assertUsesIndex(queryset, 'app_status_created_idx')
+
+    def test_user_status_filter(self):
+        queryset = Application.objects.filter(user=self.user, status='new').order_by('-created_at', '-id')
+        self.assertUsesIndex(queryset, 'app_user_status_created_idx')
+
+    def test_category_status_filter(self):
+        queryset = Application.objects.filter(category=self.category, status='new').order_by('-created_at', '-id')
+        self.assertUsesIndex(queryset, 'app_cat_status_created_idx')
+
+    def test_images_by_type(self):
+        application = Application.objects.first()
+        queryset = ApplicationImage.objects.filter(application=application, image_type='design')
+        self.assertIn('appimage_app_type_idx', self.query_plan(queryset))
+
+    def test_keyset_pages_seek_in_index(self):
+        for queryset, index_name in (
+            (Application.objects.all(), 'app_created_idx'),
+            (Application.objects.filter(status='new'), 'app_status_created_idx'),
+            (Application.objects.filter(user=self.user), 'app_user_created_idx'),
+        ):
+            paginator = KeysetPaginator(queryset, per_page=2)
+            row = queryset.order_by('-created_at', '-id')[2]
+            for direction, bound in (('next', 'created_at<?'), ('previous', 'created_at>?')):
+                with self.subTest(index=index_name, direction=direction):
+                    with CaptureQueriesContext(connection) as context:
+                        paginator.page(paginator.encode(direction, row))
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'EXPLAIN QUERY PLAN {context.captured_queries[-1]["sql"]}')
+                        plan = ' '.join(line[-1] for line in cursor.fetchall())
+                    # Глубина страницы - граница диапазона индекса, а не просмотр с начала
+                    self.assertIn(f'SEARCH catalog_application USING INDEX {index_name}', plan)
+                    self.assertIn(bound, plan)
+                    self.assertNotIn('USE TEMP B-TREE', plan)
+
+    def test_search_does_not_scan_applications(self):
+        queryset = search_applications(Application.objects.all(), 'заявка').order_by('search_rank', '-created_at', '-id')
+        plan = self.query_plan(queryset[:50])
+        self.assertIn('catalog_application_fts VIRTUAL TABLE', plan)
+        self.assertNotIn('SCAN catalog_application ', plan)
+
+
+class IndexCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('client', 'client@example.com', 'password')
+        cls.category = Category.objects.create(name='Кухня')
+
+    def setUp(self):
+        cache.clear()
+
+    def create_application(self, status):
+        return Application.objects.create(
+            user=self.user, title='Заявка', description='Описание', category=self.category, status=status
+        )
+
+    def test_second_hit_is_served_from_cache(self):
+        self.client.get(reverse('index'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['in_progress_count'], 0)
+
+    def test_status_change_invalidates(self):
+        application = self.create_application('new')
+        self.client.get(reverse('index'))
+
+        application.status = 'in_progress'
+        with self.captureOnCommitCallbacks(execute=True):
+            application.save()
+
+        self.assertEqual(self.client.get(reverse('index')).context['in_progress_count'], 1)
+
+    def test_new_application_keeps_cache(self):
+        self.client.get(reverse('index'))
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.create_application('new')
+        self.assertEqual(callbacks, [])
+
+    def test_only_one_worker_rebuilds(self):
+        get_index_context()
+        invalidate_index_context()
+        # Другой воркер уже захватил блокировку пересчёта
+        cache.add(f'catalog:index:{cache.get(INDEX_GENERATION_KEY)}:lock', True)
+        self.create_application('in_progress')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_index_context()['in_progress_count'], 0)
+
+
+class LockingFileBasedCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def make_cache(self):
+        # Отдельный экземпляр на поток, как у отдельных процессов
+        return LockingFileBasedCache(self.directory, {})
+
+    def run_concurrently(self, target, count=8):
+        threads = [threading.Thread(target=target) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_concurrent_incr_loses_no_updates(self):
+        self.make_cache().set('generation', 0)
+
+        def bump():
+            instance = self.make_cache()
+            for _ in range(25):
+                instance.incr('generation')
+
+        self.run_concurrently(bump)
+        self.assertEqual(self.make_cache().get('generation'), 8 * 25)
+
+    def test_only_one_add_wins(self):
+        results = []
+        self.run_concurrently(lambda: results.append(self.make_cache().add('lock', True)))
+        self.assertEqual(results.count(True), 1)
+
+    def test_clear_keeps_lock_file(self):
+        instance = self.make_cache()
+        instance.add('lock', True)
+        instance.clear()
+        self.assertTrue(instance.add('lock', True))
+
+    def test_tests_do_not_share_default_cache_dir(self):
+        default = os.environ.get(
+            'DESIGNPRO_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'designpro-cache'),
+        )
+        for config in settings.CACHES.values():
+            self.assertNotEqual(config.get('LOCATION'), default)
+
+
+class RowFragmentCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('client', 'client@example.com', 'password')
+        cls.staff = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.category = Category.objects.create(name='Кухня')
+
+    def setUp(self):
+        cache.clear()
+        self.application = Application.objects.create(
+            user=self.user, title='Заявка', description='Описание', category=self.category
+        )
+        self.client.force_login(self.staff)
+
+    def test_row_is_cached(self):
+        self.client.get(reverse('admin_application_list'))
+        application = Application.objects.with_related().get(pk=self.application.pk)
+        self.assertEqual(len(cache.get_many(row_fragment_keys(application))), 1)
+
+    def test_save_changes_row(self):
+        self.client.get(reverse('admin_application_list'))
+        self.application.status = 'in_progress'
+        self.application.admin_comment = 'Принято в работу'
+        self.application.save()
+
+        response = self.client.get(reverse('admin_application_list'))
+        self.assertContains(response, 'Принято в работу')
+
+    def test_category_rename_changes_row(self):
+        self.client.get(reverse('admin_application_list'))
+        self.category.name = 'Ванная'
+        self.category.save()
+
+        self.assertContains(self.client.get(reverse('admin_application_list')), 'Ванная')
+
+    def test_delete_removes_row(self):
+        self.client.get(reverse('admin_application_list'))
+        self.client.force_login(self.user)
+        self.client.get(reverse('my_applications'))
+        application = Application.objects.with_related().get(pk=self.application.pk)
+        keys = row_fragment_keys(application)
+        self.assertEqual(len(cache.get_many(keys)), 2)
+
+        application.delete()
+        self.assertEqual(cache.get_many(keys), {})
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('client', 'client@example.com', 'password')
+        cls.category = Category.objects.create(name='Кухня')
+
+    def create_application(self, status='new', category=None):
+        return Application.objects.create(
+            user=self.user, title='Заявка', description='Описание',
+            category=category or self.category, status=status,
+        )
+
+    def assertCountersMatch(self):
+        self.assertEqual(stored_counts(), actual_counts())
+
+    def test_create_status_change_and_delete(self):
+        application = self.create_application()
+        self.create_application('completed')
+        self.assertEqual(status_count('new'), 1)
+
+        application = Application.objects.get(pk=application.pk)
+        application.status = 'in_progress'
+        application.save()
+        self.assertEqual(status_count('new'), 0)
+        self.assertEqual(status_count('in_progress'), 1)
+
+        application.delete()
+        self.assertEqual(status_count('in_progress'), 0)
+        self.assertCountersMatch()
+
+    def test_category_delete(self):
+        other = Category.objects.create(name='Спальня')
+        self.create_application(category=other)
+        self.create_application(category=other, status='completed')
+        self.create_application()
+        other.delete(batch_size=1)
+        self.assertFalse(ApplicationCounter.objects.filter(category_id=other.pk).exists())
+        self.assertCountersMatch()
+
+    def test_rebuild_and_verify(self):
+        self.create_application()
+        ApplicationCounter.objects.update(count=5)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', verify=True, stdout=StringIO())
+        call_command('rebuild_counters', stdout=StringIO())
+        call_command('rebuild_counters', verify=True, stdout=StringIO())
+        self.assertCountersMatch()
+
+
+def make_image_file(name='plan.png', size=(1600, 1200), image_format='PNG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 120, 40)).save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{image_format.lower()}')
+
+
+class MediaTestMixin:
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def age_media(self):
+        """Состаривает все файлы в MEDIA_ROOT, чтобы delete их больше не берёг"""
+        old = time.time() - DELETE_GRACE_PERIOD - 60
+        for directory, _, files in os.walk(settings.MEDIA_ROOT):
+            for name in files:
+                os.utime(os.path.join(directory, name), (old, old))
+
+
+class ThumbnailTests(MediaTestMixin, TestCase):
+    def test_generate_derivatives(self):
+        user = User.objects.create_user('client', 'client@example.com', 'password')
+        application = Application.objects.create(
+            user=user, title='Заявка', description='Описание', category=Category.objects.create(name='Кухня')
+        )
+        image = ApplicationImage.objects.create(application=application, image=make_image_file('plan.bmp', image_format='BMP'))
+
+        call_command('generate_thumbnails', stdout=StringIO())
+
+        image.refresh_from_db()
+        self.assertEqual((image.width, image.height), (1600, 1200))
+        with Image.open(image.thumb_small.path) as small:
+            self.assertEqual(small.size, (320, 240))
+        self.assertLess(image.thumb_medium.size, image.image.size / 10)
+        self.assertIn('320w', image.srcset)
+        self.assertEqual(image.display_url, image.thumb_medium.url)
+
+
+class JobsTests(MediaTestMixin, TestCase):
+    def test_enqueue_is_idempotent(self):
+        first = enqueue('process_image', key='process_image:1', image_id=1)
+        second = enqueue('process_image', key='process_image:1', image_id=1)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_failed_job_is_retried_later(self):
+        job = enqueue('unknown_kind', key='unknown', value=1)
+        self.assertEqual(jobs.work(once=True), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn('LookupError', job.last_error)
+
+        Job.objects.filter(pk=job.pk).update(attempts=job.max_attempts - 1, run_after=timezone.now())
+        with self.assertLogs('catalog.jobs', 'ERROR') as logs:
+            jobs.work(once=True)
+        self.assertEqual(
+            logs.output, [f'ERROR:catalog.jobs:Задача unknown не выполнена после {job.max_attempts} попыток'],
+        )
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+    def test_purge_finished(self):
+        old = timezone.now() - jobs.DONE_RETENTION - timedelta(hours=1)
+        for key, status in (('old-done', 'done'), ('old-failed', 'failed'), ('old-pending', 'pending')):
+            enqueue('noop', key=key)
+            Job.objects.filter(key=key).update(status=status, updated_at=old)
+        enqueue('noop', key='recent-done')
+        Job.objects.filter(key='recent-done').update(status='done')
+
+        self.assertEqual(jobs.purge_finished(batch_size=1), 1)
+        self.assertEqual(
+            sorted(Job.objects.values_list('key', flat=True)), ['old-failed', 'old-pending', 'recent-done'],
+        )
+
+    def test_retry_needs_change_permission(self):
+        job = enqueue('noop', key='failed')
+        Job.objects.filter(pk=job.pk).update(status='failed', attempts=5)
+        viewer = User.objects.create_user('viewer', 'viewer@example.com', 'password', is_staff=True)
+        viewer.user_permissions.add(Permission.objects.get(codename='view_job'))
+        self.client.force_login(viewer)
+
+        self.client.post(reverse('admin:catalog_job_changelist'), {
+            'action': 'retry', ACTION_CHECKBOX_NAME: [job.pk],
+        })
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 5))
+
+    def test_create_application_enqueues_on_commit(self):
+        user = User.objects.create_user('client', 'client@example.com', 'password')
+        category = Category.objects.create(name='Кухня')
+        self.client.force_login(user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('create_application'), {
+                'title': 'Кухня', 'description': 'Описание', 'category': category.pk, 'image': make_image_file(),
+            })
+        self.assertRedirects(response, reverse('my_applications'))
+
+        image = ApplicationImage.objects.get()
+        self.assertTrue(Job.objects.filter(key=f'process_image:{image.pk}', status='pending').exists())
+        self.assertEqual(jobs.work(once=True), 1)
+        image.refresh_from_db()
+        self.assertTrue(image.thumb_small)
+
+
+class ContentAddressedStorageTests(MediaTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('client', 'client@example.com', 'password')
+        category = Category.objects.create(name='Кухня')
+        cls.first, cls.second = (
+            Application.objects.create(user=user, title=f'Заявка {i}', description='Описание', category=category)
+            for i in range(2)
+        )
+
+    def test_identical_uploads_share_one_file(self):
+        one = ApplicationImage.objects.create(application=self.first, image=make_image_file('one.png'))
+        two = ApplicationImage.objects.create(application=self.second, image=make_image_file('two.png'))
+
+        self.assertEqual(one.image.name, two.image.name)
+        self.assertRegex(one.image.name, r'^applications/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(os.listdir(os.path.dirname(one.image.path)), [os.path.basename(one.image.path)])
+
+    def test_file_is_removed_with_last_reference(self):
+        one = ApplicationImage.objects.create(application=self.first, image=make_image_file())
+        two = ApplicationImage.objects.create(application=self.second, image=make_image_file())
+        path = one.image.path
+
+        self.age_media()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            one.delete()
+        jobs.work(once=True)
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            two.delete()
+        jobs.work(once=True)
+        self.assertFalse(os.path.exists(path))
+
+    def test_file_given_to_new_upload_is_kept(self):
+        storage = application_storage()
+        image = ApplicationImage.objects.create(application=self.first, image=make_image_file())
+        name = image.image.name
+        self.age_media()
+        ApplicationImage.objects.filter(pk=image.pk).delete()
+
+        # Такая же загрузка получила существующее имя, но её строка ещё не сохранена
+        self.assertEqual(storage.save('applications/plan.png', make_image_file()), name)
+        storage.delete(name)
+        self.assertTrue(storage.exists(name))
+
+        self.age_media()
+        storage.delete(name)
+        self.assertFalse(storage.exists(name))
+
+    def test_upload_during_delete_writes_own_copy(self):
+        storage = application_storage()
+        name = storage.save('applications/plan.png', make_image_file())
+        # delete уже убрал файл с места, но ещё не удалил его
+        os.rename(storage.path(name), f'{storage.path(name)}.deleting')
+
+        self.assertEqual(storage.save('applications/plan.png', make_image_file()), name)
+        self.assertTrue(storage.exists(name))
+
+
+class UploadValidationTests(MediaTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('client', 'client@example.com', 'password')
+        cls.category = Category.objects.create(name='Кухня')
+
+    def post(self, image):
+        self.client.force_login(self.user)
+        return self.client.post(reverse('create_application'), {
+            'title': 'Кухня', 'description': 'Описание', 'category': self.category.pk, 'image': image,
+        })
+
+    def test_read_image_header(self):
+        for image_format, expected in (('PNG', 'png'), ('JPEG', 'jpeg'), ('BMP', 'bmp')):
+            header = make_image_file(size=(37, 21), image_format=image_format).read()[:HEADER_SIZE]
+            self.assertEqual(read_image_header(header), (expected, 37, 21))
+        self.assertEqual(read_image_header(b'GIF89a'), (None, None, None))
+
+    def truncated(self, image_format, length):
+        return make_image_file(image_format=image_format).read()[:length]
+
+    def test_truncated_header_is_not_read_past_its_end(self):
+        self.assertEqual(read_image_header(self.truncated('PNG', 20)), (None, None, None))
+        self.assertEqual(read_image_header(self.truncated('BMP', 20)), (None, None, None))
+        self.assertEqual(read_image_header(self.truncated('JPEG', 10)), ('jpeg', None, None))
+
+    def test_truncated_upload_is_rejected(self):
+        mismatch = 'Содержимое файла не соответствует его расширению или не является изображением'
+        for name, image_format, length, error in (
+            ('plan.png', 'PNG', 20, mismatch),
+            ('plan.bmp', 'BMP', 20, mismatch),
+            ('plan.jpg', 'JPEG', 10, 'Не удалось определить размеры изображения'),
+        ):
+            with self.subTest(image_format):
+                response = self.post(SimpleUploadedFile(name, self.truncated(image_format, length)))
+                self.assertFormError(response.context['form'], 'image', error)
+        self.assertFalse(Application.objects.exists())
+
+    def test_valid_upload_is_stored_under_its_hash(self):
+        upload = make_image_file()
+        expected = hashlib.sha256(upload.read()).hexdigest()
+        upload.seek(0)
+
+        self.assertEqual(self.post(upload).status_code, 302)
+        image = ApplicationImage.objects.get()
+        self.assertIn(expected, image.image.name)
+        self.assertEqual(os.listdir(os.path.join(settings.MEDIA_ROOT, UPLOAD_TEMP_DIR)), [])
+
+    def test_oversize_upload_is_rejected(self):
+        upload = SimpleUploadedFile('big.png', make_image_file().read() + b'\0' * MAX_IMAGE_SIZE)
+        response = self.post(upload)
+        self.assertFormError(response.context['form'], 'image', 'Размер файла не должен превышать 2 МБ')
+        self.assertFalse(Application.objects.exists())
+
+    def test_content_must_match_extension(self):
+        upload = SimpleUploadedFile('plan.png', b'not an image at all')
+        response = self.post(upload)
+        self.assertFormError(
+            response.context['form'], 'image',
+            'Содержимое файла не соответствует его расширению или не является изображением',
+        )
+
+
+class CategoryDeleteTests(MediaTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user('client', 'client@example.com', 'password')
+        self.category = Category.objects.create(name='Кухня')
+        self.kept = Category.objects.create(name='Спальня')
+        for category, count in ((self.category, 5), (self.kept, 1)):
+            for i in range(count):
+                application = Application.objects.create(
+                    user=user, title=f'Заявка {i}', description='Описание', category=category
+                )
+                # Разные файлы у каждой заявки, кроме одного общего с оставшейся категорией
+                size = (10, 10) if category == self.kept or i == 0 else (10 + i, 10)
+                ApplicationImage.objects.create(application=application, image=make_image_file(size=size))
+
+    def test_dry_run_reports_counts(self):
+        out = StringIO()
+        call_command('delete_category', self.category.pk, dry_run=True, stdout=out)
+        self.assertIn('заявок 5, изображений 5, файлов 5', out.getvalue())
+        self.assertEqual(Application.objects.filter(category=self.category).count(), 5)
+
+    def test_batched_delete_removes_unreferenced_files(self):
+        paths = [image.image.path for image in ApplicationImage.objects.filter(application__category=self.category)]
+        shared = ApplicationImage.objects.get(application__category=self.kept).image.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('delete_category', self.category.pk, batch_size=2, stdout=StringIO())
+
+        self.assertFalse(Category.objects.filter(pk=self.category.pk).exists())
+        self.assertEqual(Job.objects.filter(kind='delete_media').count(), 3)
+        self.age_media()
+        jobs.work(once=True)
+
+        self.assertTrue(os.path.exists(shared))
+        self.assertEqual([path for path in paths if os.path.exists(path)], [shared])
+        self.assertEqual(stored_counts(), actual_counts())
+
+    def test_rerun_after_interruption_removes_files(self):
+        paths = [image.image.path for image in ApplicationImage.objects.filter(application__category=self.category)]
+        shared = ApplicationImage.objects.get(application__category=self.kept).image.path
+        self.age_media()
+
+        # Первый запуск падает на второй пачке: первая уже удалена, её задача выполнена
+        with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+            with mock.patch('catalog.deletion.adjust_counter', side_effect=[None, RuntimeError]):
+                call_command('delete_category', self.category.pk, batch_size=2, stdout=StringIO())
+        jobs.work(once=True)
+        self.assertEqual(Application.objects.filter(category=self.category).count(), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('delete_category', self.category.pk, batch_size=2, stdout=StringIO())
+        jobs.work(once=True)
+        self.assertEqual([path for path in paths if os.path.exists(path)], [shared])
+
+    def admin_login(self):
+        admin_user = User.objects.create_superuser('manager', 'manager@example.com', 'password')
+        self.client.force_login(admin_user)
+
+    def test_admin_deletes_small_category_in_request(self):
+        self.admin_login()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('admin:catalog_category_delete', args=[self.category.pk]), {'post': 'yes'},
+            )
+        self.assertRedirects(response, reverse('admin:catalog_category_changelist'))
+        self.assertFalse(Category.objects.filter(pk=self.category.pk).exists())
+        self.assertFalse(Job.objects.filter(kind='delete_category').exists())
+
+    @mock.patch('catalog.deletion.ADMIN_DELETE_LIMIT', 2)
+    def test_admin_queues_large_category(self):
+        self.admin_login()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('admin:catalog_category_delete', args=[self.category.pk]), {'post': 'yes'}, follow=True,
+            )
+        self.assertRedirects(response, reverse('admin:catalog_category_changelist'))
+        self.assertContains(response, 'manage.py delete_category')
+        # Запрос ничего не удалил, это сделает фоновая задача
+        self.assertEqual(Application.objects.filter(category=self.category).count(), 5)
+        self.assertEqual(Job.objects.get(kind='delete_category').payload, {'category_id': self.category.pk})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.work(once=True)
+        self.assertFalse(Category.objects.filter(pk=self.category.pk).exists())
+        self.assertTrue(Category.objects.filter(pk=self.kept.pk).exists())
+        self.assertEqual(stored_counts(), actual_counts())
+
+    @mock.patch('catalog.deletion.ADMIN_DELETE_LIMIT', 2)
+    def test_admin_action_queues_only_large_categories(self):
+        self.admin_login()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:catalog_category_changelist'), {
+                'action': 'delete_selected', 'post': 'yes',
+                ACTION_CHECKBOX_NAME: [self.category.pk, self.kept.pk],
+            })
+        self.assertFalse(Category.objects.filter(pk=self.kept.pk).exists())
+        self.assertTrue(Category.objects.filter(pk=self.category.pk).exists())
+        self.assertEqual(Job.objects.filter(kind='delete_category').count(), 1)
+
+
+class GarbageCollectMediaTests(MediaTestMixin, TestCase):
+    def test_removes_only_old_unreferenced_files(self):
+        user = User.objects.create_user('client', 'client@example.com', 'password')
+        application = Application.objects.create(
+            user=user, title='Заявка', description='Описание', category=Category.objects.create(name='Кухня')
+        )
+        kept = ApplicationImage.objects.create(application=application, image=make_image_file()).image.path
+
+        orphan = os.path.join(settings.MEDIA_ROOT, 'applications', 'ab', 'orphan.png')
+        fresh = os.path.join(settings.MEDIA_ROOT, 'applications', 'fresh.png')
+        for path in (orphan, fresh):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(b'x' * 10)
+        day_ago = time.time() - 2 * 24 * 3600
+        os.utime(orphan, (day_ago, day_ago))
+        os.utime(kept, (day_ago, day_ago))
+
+        out = StringIO()
+        call_command('gc_media', dry_run=True, stdout=out)
+        self.assertIn('applications/ab/orphan.png', out.getvalue())
+        self.assertTrue(os.path.exists(orphan))
+
+        call_command('gc_media', stdout=StringIO())
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(fresh))
+        self.assertTrue(os.path.exists(kept))
+
+
+    def test_file_touched_after_scan_is_kept(self):
+        orphan = os.path.join(settings.MEDIA_ROOT, 'applications', 'ab', 'orphan.png')
+        os.makedirs(os.path.dirname(orphan))
+        with open(orphan, 'wb') as file:
+            file.write(b'x' * 10)
+        day_ago = time.time() - 2 * 24 * 3600
+        os.utime(orphan, (day_ago, day_ago))
+
+        def give_to_new_upload(name):
+            # Между обходом и удалением _commit отдал это имя новой загрузке
+            os.utime(orphan)
+            return False
+
+        with mock.patch.object(application_storage(), 'is_referenced', give_to_new_upload):
+            call_command('gc_media', stdout=StringIO())
+        self.assertTrue(os.path.exists(orphan))
+        self.assertFalse(os.path.exists(f'{orphan}.deleting'))
+
+class TransferTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+        user = User.objects.create_user('client', 'client@example.com', 'password')
+        kitchen = Category.objects.create(name='Кухня')
+        Category.objects.create(name='Пустая')
+        for i in range(5):
+            application = Application.objects.create(
+                user=user, title=f'Заявка {i}', description='Описание\\nв две строки', category=kitchen,
+                status='completed' if i % 2 else 'new', admin_comment=None if i % 2 else 'Комментарий',
+            )
+            ApplicationImage.objects.create(application=application, image=f'applications/{i}.png', width=10, height=10)
+        Application.objects.filter(title='Заявка 0').update(created_at=timezone.now() - timedelta(days=30))
+
+    def snapshot(self):
+        return (
+            list(Category.objects.order_by('name').values_list('name', flat=True)),
+            list(Application.objects.order_by('pk').values_list(
+                'pk', 'user__username', 'category__name', 'title', 'description', 'status', 'created_at', 'admin_comment',
+            )),
+            list(ApplicationImage.objects.order_by('pk').values_list('application_id', 'image', 'width')),
+        )
+
+    def round_trip(self, export_format, output, **import_options):
+        expected = self.snapshot()
+        call_command('export_applications', output, format=export_format, chunk_size=2, stderr=StringIO())
+
+        Category.objects.all().delete()
+        User.objects.all().delete()
+        call_command(
+            'import_applications', output, format=export_format, batch_size=2, create_users=True,
+            stdout=StringIO(), **import_options,
+        )
+        self.assertEqual(self.snapshot(), expected)
+        self.assertEqual(stored_counts(), actual_counts())
+
+    def test_jsonl_round_trip(self):
+        self.round_trip('jsonl', os.path.join(self.directory, 'export.jsonl'))
+
+    def test_csv_round_trip(self):
+        self.round_trip('csv', os.path.join(self.directory, 'export'))
+
+    def test_resume_from_checkpoint(self):
+        output = os.path.join(self.directory, 'export.jsonl')
+        checkpoint = os.path.join(self.directory, 'import.checkpoint')
+        expected = self.snapshot()
+        call_command('export_applications', output, stderr=StringIO())
+
+        # Как будто предыдущий запуск упал после второй заявки
+        kept = list(Application.objects.order_by('pk').values_list('pk', flat=True)[:2])
+        Application.objects.exclude(pk__in=kept).delete()
+        with open(checkpoint, 'w') as file:
+            json.dump({'category': 2, 'application': 2, 'image': 0}, file)
+
+        stdout = StringIO()
+        call_command('import_applications', output, batch_size=2, checkpoint=checkpoint, stdout=stdout)
+        # Изображения двух оставшихся заявок уже в БД и не считаются загруженными
+        self.assertIn('Загружено строк: 6, пропущено: 0, уже были в БД: 2 ', stdout.getvalue())
+        self.assertEqual(self.snapshot(), expected)
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_refuses_non_empty_database(self):
+        output = os.path.join(self.directory, 'export.jsonl')
+        call_command('export_applications', output, stderr=StringIO())
+        with self.assertRaisesMessage(CommandError, 'В БД уже есть заявки или изображения'):
+            call_command('import_applications', output, stdout=StringIO())
+
+    def test_conflicting_ids_are_reported(self):
+        output = os.path.join(self.directory, 'export.jsonl')
+        checkpoint = os.path.join(self.directory, 'import.checkpoint')
+        call_command('export_applications', output, stderr=StringIO())
+
+        # Пока импорт стоял, id одной из заявок заняла другая заявка
+        first, taken = Application.objects.order_by('pk').values_list('pk', flat=True)[:2]
+        Application.objects.exclude(pk=first).delete()
+        Application.objects.create(
+            pk=taken, user=User.objects.get(), title='Чужая заявка', description='Описание',
+            category=Category.objects.get(name='Кухня'),
+        )
+        with open(checkpoint, 'w') as file:
+            json.dump({'category': 2, 'application': 1, 'image': 0}, file)
+
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_applications', output, checkpoint=checkpoint, stdout=stdout, stderr=stderr)
+        self.assertIn('Загружено строк: 6, пропущено: 1, уже были в БД: 1 ', stdout.getvalue())
+        self.assertIn(f'Не загружено строк с id, занятым другими данными: 1. Заявки: {taken}', stderr.getvalue())
+        self.assertEqual(Application.objects.get(pk=taken).title, 'Чужая заявка')
+        self.assertFalse(ApplicationImage.objects.filter(application_id=taken).exists())
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser('manager', 'manager@example.com', 'password')
+        cls.client_user = User.objects.create_user('ivanov', 'ivanov@example.com', 'password')
+        category = Category.objects.create(name='Кухня')
+        cls.kitchen = Application.objects.create(
+            user=cls.staff, title='Ремонт кухни', description='Нужен ремонт кухни, кухни в хрущёвке', category=category,
+        )
+        cls.bathroom = Application.objects.create(
+            user=cls.staff, title='Ванная', description='Плитка и немного кухни', category=category,
+        )
+        cls.garden = Application.objects.create(
+            user=cls.client_user, title='Сад', description='Ландшафтный дизайн', category=category,
+        )
+
+    def search(self, text):
+        return list(search_applications(Application.objects.all(), text).order_by('search_rank', '-created_at', '-id'))
+
+    def test_ranked_prefix_search(self):
+        self.assertEqual(self.search('КУХН'), [self.kitchen, self.bathroom])
+        self.assertEqual(self.search('ремонт кухни'), [self.kitchen])
+        self.assertEqual(self.search('ivan'), [self.garden])
+        self.assertEqual(self.search('кухни" ('), [self.kitchen, self.bathroom])
+
+    def test_index_follows_updates_and_deletes(self):
+        Application.objects.filter(pk=self.garden.pk).update(description='Летняя кухня')
+        self.assertIn(self.garden, self.search('кухня'))
+
+        self.bathroom.title = 'Санузел'
+        self.bathroom.description = 'Плитка'
+        self.bathroom.save()
+        self.assertEqual(self.search('плитка'), [self.bathroom])
+        self.assertEqual(self.search('ванная'), [])
+
+        self.kitchen.delete()
+        self.assertEqual(self.search('ремонт'), [])
+
+    def test_fallback_without_fts(self):
+        with mock.patch('catalog.search.search_index_exists', return_value=False):
+            self.assertEqual(set(self.search('кухни')), {self.kitchen, self.bathroom})
+            self.assertEqual(self.search('ivan'), [self.garden])
+
+    def test_admin_application_list_search(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('admin_application_list'), {'q': 'кухни'})
+        self.assertEqual(list(response.context['applications']), [self.kitchen, self.bathroom])
+
+        response = self.client.get(reverse('admin:catalog_application_changelist'), {'q': 'кухни'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.kitchen, self.bathroom])
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser('manager', 'manager@example.com', 'password')
+        user = User.objects.create_user('client', 'client@example.com', 'password')
+        cls.categories = [Category.objects.create(name=name) for name in ('Кухня', 'Ванная')]
+        rows = [
+            ((2024, 11, 3), 'new'), ((2024, 11, 3), 'completed'), ((2024, 11, 20), 'new'),
+            ((2025, 2, 1), 'completed'), ((2025, 2, 14), 'new'), ((2025, 6, 30), 'new'),
+        ]
+        for number, ((year, month, day), status) in enumerate(rows):
+            application = Application.objects.create(
+                user=user, title=f'Заявка {number}', description='Описание',
+                category=cls.categories[number % 2], status=status,
+            )
+            created_at = timezone.make_aware(datetime.datetime(year, month, day, 12))
+            Application.objects.filter(pk=application.pk).update(created_at=created_at)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.staff)
+
+    def changelist(self, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('admin:catalog_application_changelist'), params)
+        counts = [query['sql'] for query in context.captured_queries if 'COUNT(' in query['sql']]
+        return response, counts
+
+    def choices(self, response):
+        return [choice['title'] for choice in response.context['choices']]
+
+    def test_counts_come_from_counters(self):
+        response, counts = self.changelist()
+        self.assertEqual(response.context['cl'].result_count, 6)
+        self.assertEqual(counts, [])
+
+        response, counts = self.changelist(status__exact='completed', category__id__exact=self.categories[1].pk)
+        self.assertEqual(response.context['cl'].result_count, 2)
+        self.assertEqual(len(response.context['cl'].result_list), 2)
+        self.assertEqual(counts, [])
+
+    def test_other_filters_cache_count(self):
+        response, counts = self.changelist(created_at__year='2024')
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertEqual(len(counts), 1)
+
+        response, counts = self.changelist(created_at__year='2024')
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertEqual(counts, [])
+
+    def test_date_hierarchy(self):
+        response, _ = self.changelist()
+        self.assertEqual(self.choices(response), ['2024', '2025'])
+
+        response, _ = self.changelist(created_at__year='2025')
+        self.assertEqual(len(self.choices(response)), 2)
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+
+        response, _ = self.changelist(created_at__year='2024', created_at__month='11')
+        self.assertEqual(len(self.choices(response)), 2)
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+
+        response, _ = self.changelist(created_at__year='2024', created_at__month='11', created_at__day='3')
+        self.assertEqual(len(response.context['cl'].result_list), 2)
+
+    def test_date_hierarchy_follows_filters(self):
+        response, _ = self.changelist(status__exact='completed', created_at__year='2025')
+        self.assertEqual(len(self.choices(response)), 1)
+
+        # Новые заявки ноября 2024 года: 3-го и 20-го числа
+        response, _ = self.changelist(status__exact='new', created_at__year='2024', created_at__month='11')
+        self.assertEqual(len(self.choices(response)), 2)
+
+        response, _ = self.changelist(status__exact='completed')
+        self.assertEqual(self.choices(response), ['2024', '2025'])
+
+
+class BulkStatusTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser('manager', 'manager@example.com', 'password')
+        cls.user = User.objects.create_user('client', 'client@example.com', 'password')
+        cls.categories = [Category.objects.create(name=name) for name in ('Кухня', 'Ванная')]
+
+    def setUp(self):
+        self.applications = [
+            Application.objects.create(
+                user=self.user, title=f'Заявка {number}', description='Описание',
+                category=self.categories[number % 2], status=status,
+            )
+            for number, status in enumerate(['new', 'new', 'new', 'completed'])
+        ]
+        self.new = [application.pk for application in self.applications[:3]]
+        self.completed = self.applications[3].pk
+
+    def test_guarded_update(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            updated, skipped = bulk_change_status(self.new + [self.completed, 0], 'in_progress', 'Берём в работу')
+
+        self.assertEqual(sorted(updated), self.new)
+        self.assertEqual(skipped, {self.completed: 'completed', 0: None})
+        self.assertEqual(
+            set(Application.objects.filter(pk__in=self.new).values_list('status', 'admin_comment')),
+            {('in_progress', 'Берём в работу')},
+        )
+        self.assertEqual(stored_counts(), actual_counts())
+        self.assertEqual(len(callbacks), 1)
+
+        # Повторное применение ничего не меняет
+        updated, skipped = bulk_change_status(self.new, 'in_progress', 'Ещё раз', batch_size=2)
+        self.assertEqual(updated, [])
+        self.assertEqual(skipped, dict.fromkeys(self.new, 'in_progress'))
+
+    def test_query_count_does_not_grow(self):
+        # Первый вызов создаёт недостающие счётчики in_progress
+        bulk_change_status(self.new, 'in_progress', 'Комментарий')
+        counts = []
+        for size in (3, 30):
+            ids = [
+                Application.objects.create(
+                    user=self.user, title='Заявка', description='Описание', category=self.categories[i % 2],
+                ).pk
+                for i in range(size)
+            ]
+            with CaptureQueriesContext(connection) as context:
+                bulk_change_status(ids, 'in_progress', 'Комментарий')
+            counts.append(len(context))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_empty_comment_keeps_previous(self):
+        Application.objects.filter(pk=self.new[0]).update(admin_comment='Уточнить размеры')
+        bulk_change_status(self.new[:2], 'in_progress', '')
+        self.assertEqual(
+            list(Application.objects.filter(pk__in=self.new[:2]).order_by('pk').values_list('status', 'admin_comment')),
+            [('in_progress', 'Уточнить размеры'), ('in_progress', None)],
+        )
+
+    def test_only_in_progress_in_bulk(self):
+        with self.assertRaises(ValueError):
+            bulk_change_status(self.new, 'completed', 'Готово')
+
+    def test_row_fragments_refresh(self):
+        self.client.force_login(self.staff)
+        self.client.get(reverse('admin_application_list'))
+        bulk_change_status(self.new, 'in_progress', 'Берём в работу')
+        response = self.client.get(reverse('admin_application_list'))
+        self.assertContains(response, 'Берём в работу', count=3)
+
+    def test_bulk_endpoint(self):
+        url = reverse('admin_application_bulk_status')
+        next_url = reverse('admin_application_list') + '?status=new'
+        data = {'applications': self.new + [self.completed], 'status': 'in_progress', 'next': next_url}
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.post(url, {**data, 'comment': 'Берём'}).status_code, 302)
+        self.assertFalse(Application.objects.filter(status='in_progress').exists())
+
+        self.client.force_login(self.staff)
+        response = self.client.post(url, data, follow=True)
+        self.assertContains(response, 'необходим комментарий')
+        self.assertFalse(Application.objects.filter(status='in_progress').exists())
+
+        response = self.client.post(url, {**data, 'comment': 'Берём'})
+        self.assertRedirects(response, next_url, fetch_redirect_response=False)
+        self.assertEqual(Application.objects.filter(status='in_progress').count(), 3)
+        messages = [str(message) for message in response.wsgi_request._messages]
+        self.assertEqual(messages, [
+            'Статус "Принято в работу" установлен у заявок: 3',
+            f'Пропущено заявок: 1: №{self.completed} (Выполнено)',
+        ])
+
+    def test_bulk_endpoint_requires_change_permission(self):
+        viewer = User.objects.create_user('viewer', 'viewer@example.com', 'password', is_staff=True)
+        viewer.user_permissions.add(Permission.objects.get(codename='view_application'))
+        self.client.force_login(viewer)
+
+        response = self.client.post(reverse('admin_application_bulk_status'), {
+            'applications': self.new, 'status': 'in_progress', 'comment': 'Берём',
+        })
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Application.objects.filter(status='in_progress').exists())
+
+    def test_admin_action(self):
+        self.client.force_login(self.staff)
+        url = reverse('admin:catalog_application_changelist')
+        data = {'action': 'change_status', '_selected_action': self.new + [self.completed]}
+
+        response = self.client.post(url, data)
+        self.assertTemplateUsed(response, 'admin/catalog/application/change_status.html')
+        self.assertFalse(Application.objects.filter(status='in_progress').exists())
+
+        response = self.client.post(url, {
+            **data, 'index': 0, 'apply': 1, 'status': 'in_progress', 'comment': 'Берём',
+        }, follow=True)
+        self.assertEqual(Application.objects.filter(status='in_progress').count(), 3)
+        self.assertContains(response, f'№{self.completed} (Выполнено)')
+
+    def test_admin_action_needs_change_permission(self):
+        viewer = User.objects.create_user('viewer', 'viewer@example.com', 'password', is_staff=True)
+        viewer.user_permissions.add(Permission.objects.get(codename='view_application'))
+        self.client.force_login(viewer)
+
+        self.client.post(reverse('admin:catalog_application_changelist'), {
+            'action': 'change_status', ACTION_CHECKBOX_NAME: self.new,
+            'index': 0, 'apply': 1, 'status': 'in_progress', 'comment': 'Берём',
+        })
+        self.assertFalse(Application.objects.filter(status='in_progress').exists())
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('manager', 'manager@example.com', 'password', is_staff=True)
+        cls.user = User.objects.create_user('client', 'client@example.com', 'password')
+        cls.categories = [Category.objects.create(name=name) for name in ('Кухня', 'Ванная')]
+        cls.applications = [
+            Application.objects.create(
+                user=cls.user, title=f'Заявка {number}', description='Описание',
+                category=cls.categories[number % 2], status=['new', 'in_progress', 'completed'][number % 3],
+            )
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def get(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, json.loads(content) if content else None
+
+    def test_staff_only(self):
+        self.client.logout()
+        for account in (None, self.user):
+            if account:
+                self.client.force_login(account)
+            for name in ('api_applications', 'api_categories', 'api_status_counts'):
+                response, data = self.get(name)
+                self.assertEqual(response.status_code, 403)
+                self.assertIn('error', data)
+
+    def test_applications_cursor_paging(self):
+        newest_first = [application.pk for application in reversed(self.applications)]
+        seen = []
+        cursor = ''
+        while True:
+            response, data = self.get('api_applications', limit=2, cursor=cursor)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            seen += [row['id'] for row in data['results']]
+            if not data['next']:
+                break
+            cursor = data['next']
+        self.assertEqual(seen, newest_first)
+
+        _, data = self.get('api_applications', limit=2, cursor=data['previous'])
+        self.assertEqual([row['id'] for row in data['results']], newest_first[2:4])
+
+    def test_applications_fields_and_filters(self):
+        _, data = self.get('api_applications')
+        self.assertEqual(set(data['results'][0]), set(api.APPLICATION_DEFAULT_FIELDS))
+        self.assertEqual(data['results'][-1]['category'], 'Кухня')
+
+        _, data = self.get('api_applications', fields='title,user', status='new')
+        self.assertEqual(data['results'], [
+            {'title': 'Заявка 3', 'user': 'client'},
+            {'title': 'Заявка 0', 'user': 'client'},
+        ])
+
+        for params in ({'fields': 'title,password'}, {'cursor': 'broken'}, {'limit': '0'}, {'status': 'done'}):
+            response, data = self.get('api_applications', **params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', data)
+
+    def test_etag(self):
+        response, _ = self.get('api_applications', limit=2)
+        etag = response['ETag']
+        response = self.client.get(reverse('api_applications'), {'limit': 2}, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        self.applications[-1].title = 'Новое название'
+        self.applications[-1].save()
+        response = self.client.get(reverse('api_applications'), {'limit': 2}, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # Имя категории в строке меняется без изменения updated_at заявки
+        response, _ = self.get('api_applications', limit=2)
+        etag = response['ETag']
+        self.categories[0].name = 'Кухня и столовая'
+        self.categories[0].save()
+        response = self.client.get(reverse('api_applications'), {'limit': 2}, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+        response, _ = self.get('api_status_counts')
+        response = self.client.get(reverse('api_status_counts'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_categories_and_status_counts(self):
+        _, data = self.get('api_categories')
+        self.assertEqual(data['results'], [
+            {'id': self.categories[0].pk, 'name': 'Кухня', 'applications': 3},
+            {'id': self.categories[1].pk, 'name': 'Ванная', 'applications': 2},
+        ])
+        _, data = self.get('api_categories', fields='name')
+        self.assertEqual(data['results'], [{'name': 'Кухня'}, {'name': 'Ванная'}])
+
+        _, data = self.get('api_status_counts')
+        self.assertEqual(data['results'], {'new': 2, 'in_progress': 2, 'completed': 1})
+        _, data = self.get('api_status_counts', category=self.categories[1].pk)
+        self.assertEqual(data['results'], {'new': 1, 'in_progress': 1, 'completed': 0})
+
+
+class AsyncViewsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('manager', 'manager@example.com', 'password', is_staff=True)
+        cls.user = User.objects.create_user('client', 'client@example.com', 'password')
+        category = Category.objects.create(name='Кухня')
+        cls.application = Application.objects.create(
+            user=cls.user, title='Ремонт кухни', description='Описание', category=category,
+        )
+
+    async def test_anonymous_and_non_staff_are_redirected(self):
+        response = await self.async_client.get(reverse('my_applications'))
+        self.assertEqual(response.status_code, 302)
+
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('admin_application_list'))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_read_views(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('my_applications'))
+        self.assertEqual(list(response.context['applications']), [self.application])
+
+        await self.async_client.aforce_login(self.staff)
+        for url in (
+            reverse('index'),
+            reverse('admin_application_list'),
+            reverse('admin_application_detail', args=[self.application.pk]),
+        ):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get(reverse('admin_application_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_status_change_post(self):
+        self.client.force_login(self.staff)
+        response = self.client.post(
+            reverse('admin_application_detail', args=[self.application.pk]),
+            {'status': 'in_progress', 'comment': 'Взяли в работу'},
+        )
+        self.assertRedirects(response, reverse('admin_application_list'))
+        self.application.refresh_from_db()
+        self.assertEqual(self.application.status, 'in_progress')
+
+
+class BenchmarkingTests(SimpleTestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertIsNone(percentile([], 50))
+
+
+class ReadReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReadReplicaRouter()
+        replica = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'file:replica?mode=ro'}
+        patcher = mock.patch.dict(connections.settings, {'replica': replica})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_in_read_only_block_go_to_replica(self):
+        self.assertIsNone(self.router.db_for_read(Application))
+        with read_only():
+            self.assertEqual(self.router.db_for_read(Application), 'replica')
+            self.assertEqual(self.router.db_for_write(Application), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'catalog'))
+
+    def test_get_requests_are_read_only(self):
+        seen = []
+        middleware = ReadOnlyRequestMiddleware(lambda request: seen.append(self.router.db_for_read(Application)))
+        factory = RequestFactory()
+        middleware(factory.get('/'))
+        middleware(factory.post('/'))
+        self.assertEqual(seen, ['replica', None])
+
+
+class SeedAndBenchmarkTests(MediaTestMixin, TestCase):
+    def seed(self):
+        call_command('seed', users=5, categories=3, applications=40, seed=7, batch_size=15, stdout=StringIO())
+        return list(Application.objects.order_by('pk').values_list(
+            'user__username', 'category__name', 'title', 'status', 'created_at', 'images__image',
+        ))
+
+    def test_seed_is_deterministic(self):
+        first = self.seed()
+        self.assertEqual(Application.objects.count(), 40)
+        self.assertEqual(stored_counts(), actual_counts())
+        self.assertTrue(User.objects.filter(is_staff=True).exists())
+
+        Application.objects.all().delete()
+        self.assertEqual(self.seed(), first)
+
+    def test_benchmark_covers_catalog_routes(self):
+        self.seed()
+        baseline = os.path.join(settings.MEDIA_ROOT, 'baseline.json')
+        # В тестах чтения идут в default внутри транзакции TestCase; replica из профиля production не трогаем
+        call_command(
+            'benchmark', iterations=2, warmup=0, host='testserver', databases=['default'], save=baseline,
+            stdout=StringIO(),
+        )
+        with open(baseline) as file:
+            routes = json.load(file)['routes']
+
+        self.assertEqual(set(routes), {pattern.name for pattern in catalog_urls.urlpatterns} - POST_ONLY_ROUTES)
+        for name, result in routes.items():
+            self.assertEqual(result['status'], 200, name)
+            self.assertGreater(result['bytes'], 0)
+
+        stdout = StringIO()
+        call_command(
+            'benchmark', iterations=2, warmup=0, host='testserver', databases=['default'], compare=baseline,
+            stdout=stdout,
+        )
+        self.assertIn('admin_application_list', stdout.getvalue())
+
+
+class RegistrationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('client', 'Client@Example.com', 'password')
+
+    def register(self, username, email):
+        return self.client.post(reverse('register'), {
+            'username': username,
+            'full_name': 'Иванов Иван',
+            'email': email,
+            'password1': 'password',
+            'password2': 'password',
+            'agreement': 'on',
+        })
+
+    def test_register(self):
+        response = self.register('newuser', 'NewUser@example.com')
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+        user = User.objects.get(username='newuser')
+        self.assertEqual(user.email, 'newuser@example.com')
+        self.assertEqual(user.first_name, 'Иванов Иван')
+
+    def test_duplicates_become_field_errors(self):
+        response = self.register('client', 'other@example.com')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['form'].errors, {
+            'username': ['Пользователь с таким именем уже существует'],
+        })
+
+        response = self.register('other', 'client@example.com')
+        self.assertEqual(response.context['form'].errors, {
+            'email': ['Пользователь с таким email уже существует'],
+        })
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_email_index_ignores_case_and_blank(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user('other', 'CLIENT@example.com')
+        User.objects.create_user('first', '')
+        User.objects.create_user('second', '')
+
+    def test_migration_refuses_duplicate_emails(self):
+        migration = import_module('catalog.migrations.0011_user_email_unique')
+        # Как в БД до миграции: индекса ещё нет, адрес повторяется
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP INDEX {EMAIL_INDEX}')
+        other = User.objects.create_user('other', 'CLIENT@example.com')
+
+        with self.assertRaisesMessage(RuntimeError, (
+            f'  id={self.user.pk} client <Client@example.com>\n  id={other.pk} other <CLIENT@example.com>'
+        )):
+            migration.check_duplicate_emails(django_apps, None)
+        self.assertEqual(
+            list(User.objects.order_by('pk').values_list('email', flat=True)),
+            ['Client@example.com', 'CLIENT@example.com'],
+        )
+
+    def test_find_duplicate_emails_lists_conflicts(self):
+        out = StringIO()
+        call_command('find_duplicate_emails', stdout=out)
+        self.assertIn('Повторяющихся адресов нет', out.getvalue())
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP INDEX {EMAIL_INDEX}')
+        other = User.objects.create_user('other', 'CLIENT@example.com')
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, 'Пользователей с повторяющимся email: 2'):
+            call_command('find_duplicate_emails', stdout=out)
+        self.assertEqual(out.getvalue(), (
+            f'  id={self.user.pk} client <Client@example.com>\n  id={other.pk} other <CLIENT@example.com>\n'
+        ))
+
+    def test_hasher_work_factor_from_settings(self):
+        hasher = ConfigurablePBKDF2PasswordHasher()
+        with self.settings(PASSWORD_HASH_ITERATIONS=1000):
+            encoded = hasher.encode('password', hasher.salt())
+        self.assertEqual(hasher.decode(encoded)['iterations'], 1000)
+        self.assertTrue(hasher.verify('password', encoded))
+        with self.settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.assertTrue(hasher.must_update(encoded))
+
+    def test_benchmark_signups(self):
+        stdout = StringIO()
+        call_command('benchmark_signups', count=2, work_factors='1000,2000', host='testserver', stdout=stdout)
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[1:]], ['1000', '2000'])
+        self.assertEqual([line.split()[-1] for line in lines[1:]], ['0', '0'])
+        self.assertEqual(User.objects.count(), 1)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-sessions'},
+})
+class SessionProfileTests(MediaTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('client', 'client@example.com', 'password')
+        cls.category = Category.objects.create(name='Кухня')
+
+    def profile_queries(self, profile):
+        # SessionMiddleware выбирает хранилище при создании, поэтому нужен новый клиент
+        with self.settings(**settings.SESSION_PROFILES[profile]):
+            client = Client()
+            client.force_login(self.user)
+            client.get(reverse('profile'))
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(client.get(reverse('profile')).status_code, 200)
+        return len(context)
+
+    def test_lean_profiles_skip_session_table(self):
+        queries = self.profile_queries('db')
+        self.assertEqual(self.profile_queries('cached_db'), queries - 1)
+        self.assertEqual(self.profile_queries('signed_cookies'), queries - 1)
+
+    def test_signed_cookie_sessions_keep_messages_out_of_db(self):
+        application = Application.objects.create(
+            user=self.user, title='Заявка', description='Описание', category=self.category
+        )
+        with self.settings(**settings.SESSION_PROFILES['signed_cookies']):
+            self.client.force_login(self.user)
+            response = self.client.post(reverse('delete_application', args=[application.pk]), follow=True)
+        self.assertContains(response, 'Заявка успешно удалена!')
+        self.assertEqual(Session.objects.count(), 0)
+
+    def test_clear_expired_sessions_in_batches(self):
+        for expiry in [-60] * 5 + [3600]:
+            session = SessionStore()
+            session.set_expiry(expiry)
+            session.create()
+
+        stdout = StringIO()
+        with CaptureQueriesContext(connection) as context:
+            call_command('clear_expired_sessions', batch_size=2, stdout=stdout)
+        self.assertIn('5', stdout.getvalue())
+        self.assertEqual(Session.objects.count(), 1)
+        # Три пачки и пустая выборка в конце
+        self.assertEqual(sum(query['sql'].startswith('DELETE') for query in context.captured_queries), 3)
+
+    def test_benchmark_session_profile(self):
+        call_command('seed', users=2, categories=2, applications=5, stdout=StringIO())
+        queries = {}
+        for profile in ('db', 'cached_db'):
+            report = os.path.join(settings.MEDIA_ROOT, f'{profile}.json')
+            call_command(
+                'benchmark', iterations=1, warmup=0, host='testserver', route=['my_applications'],
+                databases=['default'], session_profile=profile, save=report, stdout=StringIO(),
+            )
+            with open(report) as file:
+                queries[profile] = json.load(file)['routes']['my_applications']['queries']
+        self.assertLess(queries['cached_db'], queries['db'])
+
+
+class QueryBudgetTests(MediaTestMixin, TestCase):
+    """
+    Число SQL-запросов каждой страницы не должно зависеть от количества строк.
+    Каждый бюджет проверяется на двух размерах данных; при превышении в
+    сообщении об ошибке выводятся все перехваченные запросы.
+    """
+
+    SIZES = (5, 60)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser('manager', 'manager@example.com', 'password')
+        cls.user = User.objects.create_user('client', 'client@example.com', 'password')
+        cls.categories = [Category.objects.create(name=f'Категория {i}') for i in range(3)]
+
+    def fill(self, count):
+        """Доводит число заявок пользователя до count, у каждой по изображению"""
+        statuses = ['new', 'in_progress', 'completed']
+        existing = Application.objects.count()
+        applications = Application.objects.bulk_create(
+            Application(
+                user=self.user, category=self.categories[i % 3], title=f'Заявка {i}', description='Описание',
+                status=statuses[i % 3], admin_comment='Комментарий' if i % 3 else None,
+            )
+            for i in range(existing, count)
+        )
+        ApplicationImage.objects.bulk_create(
+            ApplicationImage(application=application, image=f'applications/{application.pk}.png')
+            for application in applications
+        )
+        rebuild_counters()
+        invalidate_index_context()
+
+    def assertQueryBudget(self, budget, request, prepare=None):
+        """
+        Выполняет request на каждом размере данных и сравнивает число запросов с бюджетом.
+        Первый запрос не считается: в нём разовые проверки и прогрев кэшей процесса.
+        """
+        request()
+        counts = []
+        for size in self.SIZES:
+            self.fill(size)
+            if prepare:
+                prepare()
+            with CaptureQueriesContext(connection) as context:
+                response = request()
+            self.assertLess(response.status_code, 400)
+            # Точки сохранения появляются из-за транзакции TestCase, вне тестов atomic() их не создаёт
+            queries = [
+                query['sql'] for query in context.captured_queries
+                if not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT'))
+            ]
+            counts.append(len(queries))
+            if len(queries) > budget:
+                self.fail(
+                    f'{len(queries)} запросов при бюджете {budget} на {size} заявках:\n'
+                    + '\n'.join(f'{number}. {sql}' for number, sql in enumerate(queries, 1))
+                )
+        self.assertEqual(counts[0], counts[-1], f'Число запросов растёт с числом строк: {counts}')
+
+    def test_index(self):
+        def request():
+            return self.client.get(reverse('index'))
+
+        # Промах кэша: страница собирается из БД
+        self.assertQueryBudget(3, request, prepare=cache.clear)
+        # Попадание в кэш обходится без БД
+        self.assertQueryBudget(0, request, prepare=request)
+
+    def test_my_applications(self):
+        self.client.force_login(self.user)
+        self.assertQueryBudget(4, lambda: self.client.get(reverse('my_applications')))
+
+    def test_admin_application_list(self):
+        self.client.force_login(self.staff)
+        self.assertQueryBudget(5, lambda: self.client.get(reverse('admin_application_list')))
+        self.assertQueryBudget(5, lambda: self.client.get(reverse('admin_application_list'), {'q': 'заявка'}))
+
+    def test_admin_application_detail(self):
+        self.client.force_login(self.staff)
+        self.fill(1)
+        application = Application.objects.order_by('pk').first()
+        url = reverse('admin_application_detail', args=[application.pk])
+        self.assertQueryBudget(4, lambda: self.client.get(url))
+
+    def test_api(self):
+        self.client.force_login(self.staff)
+        # Сессия, пользователь и одна страница строк; счётчики для сводок
+        self.assertQueryBudget(3, lambda: self.client.get(reverse('api_applications'), {'limit': 20}))
+        self.assertQueryBudget(3, lambda: self.client.get(reverse('api_categories')))
+        self.assertQueryBudget(3, lambda: self.client.get(reverse('api_status_counts')))
+
+    def test_create_application_post(self):
+        self.client.force_login(self.user)
+
+        def request():
+            return self.client.post(reverse('create_application'), {
+                'title': 'Новая заявка',
+                'description': 'Описание',
+                'category': self.categories[0].pk,
+                'image': make_image_file('plan.png', (60, 40), 'PNG'),
+            })
+
+        self.assertQueryBudget(8, request)
+
+    def test_register_post(self):
+        usernames = itertools.count()
+
+        def request():
+            number = next(usernames)
+            return self.client.post(reverse('register'), {
+                'username': f'newuser{number}',
+                'full_name': 'Иванов Иван',
+                'email': f'newuser{number}@example.com',
+                'password1': 'password',
+                'password2': 'password',
+                'agreement': 'on',
+            })
+
+        # Одна вставка: уникальность имени и email проверяет БД
+        self.assertQueryBudget(1, request)
+
+
+class ServerTimingTests(MediaTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('client', 'client@example.com', 'password')
+        cls.category = Category.objects.create(name='Кухня')
+
+    def metrics(self, response):
+        header = response.headers['Server-Timing']
+        return {item.split(';')[0].strip(): item for item in header.split(',')}
+
+    @override_settings(SERVER_TIMING=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('index'))
+        self.assertNotIn('Server-Timing', response.headers)
+
+    @override_settings(SERVER_TIMING=True, SERVER_TIMING_LOG_SAMPLE_RATE=1.0)
+    def test_header_and_sampled_log(self):
+        self.client.force_login(self.user)
+        with self.assertLogs('catalog.timing', 'INFO') as logs:
+            response = self.client.get(reverse('my_applications'))
+
+        metrics = self.metrics(response)
+        self.assertEqual(set(metrics), {'db', 'tpl', 'total'})
+        self.assertIn('desc="', metrics['db'])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], reverse('my_applications'))
+        self.assertGreater(record['db_count'], 0)
+
+    @override_settings(SERVER_TIMING=True)
+    def test_storage_writes_are_measured(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('create_application'), {
+            'title': 'Заявка',
+            'description': 'Описание',
+            'category': self.category.pk,
+            'image': make_image_file('plan.png', (60, 40), 'PNG'),
+        })
+        self.assertIn('desc="1"', self.metrics(response)['storage'])
+
+    @override_settings(SERVER_TIMING=True)
+    async def test_async_requests_measure_db(self):
+        # Под ASGI запросы async-представлений выполняются в другом потоке, чем middleware
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('my_applications'))
+        self.assertIn('db;', response.headers['Server-Timing'])
+
+
+class StaticAssetsTests(TestCase):
+    def setUp(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root, ignore_errors=True)
+        storages = {
+            **settings.STORAGES,
+            'staticfiles': {'BACKEND': 'catalog.staticfiles.CompressedManifestStaticFilesStorage'},
+        }
+        override = override_settings(STATIC_ROOT=static_root, STORAGES=storages)
+        override.enable()
+        self.addCleanup(override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_pages_link_hashed_css_instead_of_inline_styles(self):
+        response = self.client.get(reverse('register'))
+        self.assertNotContains(response, '<style>')
+        hashed = staticfiles_storage.stored_name('catalog/css/register.css')
+        self.assertNotEqual(hashed, 'catalog/css/register.css')
+        self.assertContains(response, f'{settings.STATIC_URL}{hashed}')
+
+    def test_precompressed_variant_with_far_future_cache(self):
+        hashed = staticfiles_storage.stored_name('catalog/css/base.css')
+        self.assertTrue(os.path.exists(staticfiles_storage.path(hashed) + '.gz'))
+
+        response = self.client.get(f'{settings.STATIC_URL}{hashed}', headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        content = gzip.decompress(b''.join(response.streaming_content))
+        with open(staticfiles_storage.path(hashed), 'rb') as file:
+            self.assertEqual(content, file.read())
+
+        response = self.client.get(f'{settings.STATIC_URL}catalog/css/base.css')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        response.close()
@@ -0,0 +1,67 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+from .jobs import job
+from .models import ApplicationImage, THUMBNAIL_WIDTHS
+from .storage import application_storage
+
+THUMBNAIL_QUALITY = 80
+
+
+def _output_format():
+    if features.check('webp'):
+        return 'WEBP', 'webp'
+    return 'JPEG', 'jpg'
+
+
+def generate_derivatives(image):
+    """Создаёт уменьшенные копии изображения и записывает размеры оригинала"""
+    image_format, extension = _output_format()
+    stem = os.path.splitext(os.path.basename(image.image.name))[0]
+    previous = [getattr(image, field_name).name for field_name in THUMBNAIL_WIDTHS]
+
+    with image.image.open('rb') as file, Image.open(file) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode not in ('RGB', 'RGBA') or image_format == 'JPEG':
+            source = source.convert('RGB')
+        image.width, image.height = source.size
+
+        for field_name, target_width in THUMBNAIL_WIDTHS.items():
+            derivative = source.copy()
+            # Высоту не ограничиваем, уменьшаем только по ширине с сохранением пропорций
+            derivative.thumbnail((target_width, source.height), Image.Resampling.LANCZOS)
+
+            buffer = BytesIO()
+            derivative.save(buffer, image_format, quality=THUMBNAIL_QUALITY)
+
+            getattr(image, field_name).save(
+                f'{stem}_{target_width}.{extension}', ContentFile(buffer.getvalue()), save=False
+            )
+
+    image.save(update_fields=['width', 'height', *THUMBNAIL_WIDTHS])
+
+    # Старые копии удаляем после сохранения, когда строка на них уже не ссылается
+    stale = [name for name in previous if name and name not in {getattr(image, f).name for f in THUMBNAIL_WIDTHS}]
+    if stale:
+        delete_media(stale)
+
+
+@job('process_image')
+def process_image(image_id):
+    """Обработка загруженного изображения после сохранения заявки"""
+    try:
+        image = ApplicationImage.objects.get(pk=image_id)
+    except ApplicationImage.DoesNotExist:
+        return
+    generate_derivatives(image)
+
+
+@job('delete_media')
+def delete_media(names):
+    """Удаляет файлы, на которые больше не ссылается ни одно изображение"""
+    storage = application_storage()
+    for name in names:
+        storage.delete(name)
@@ -0,0 +1,104 @@
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+_timings = ContextVar('catalog_request_timings', default=None)
+
+
+class RequestTimings:
+    """Суммарное время и количество операций по видам за один запрос"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.metrics = {}
+
+    def add(self, name, duration):
+        total, count = self.metrics.get(name, (0.0, 0))
+        self.metrics[name] = (total + duration, count + 1)
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+
+@contextmanager
+def collect_timings():
+    timings = RequestTimings()
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+@contextmanager
+def measure(name):
+    """Засчитывает время блока в метрику name, если идёт замер запроса"""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def timed(name):
+    """Декоратор: время каждого вызова засчитывается в метрику name"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with measure(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def db_timing_wrapper(execute, sql, params, many, context):
+    """Обёртка для connection.execute_wrappers"""
+    if _timings.get() is None:
+        return execute(sql, params, many, context)
+    with measure('db'):
+        return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_db_timing(sender, connection, **kwargs):
+    """
+    Ставит db_timing_wrapper на соединение при подключении.
+
+    Соединения с БД у каждого потока свои, а под ASGI запросы async-представлений
+    выполняются в потоке sync_to_async, а не там, где работает middleware.
+    Обёртка стоит на всех соединениях постоянно и засчитывает время, только
+    если в контексте идёт замер запроса: ContextVar переходит в sync_to_async.
+    Она ставится первой, потому что connection.execute_wrapper снимает
+    последнюю обёртку списка, а подключение может случиться внутри него.
+    """
+    if db_timing_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, db_timing_wrapper)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with measure('tpl'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    Шаблонизатор Django, засчитывающий время рендеринга в метрику tpl.
+    Замеряется только шаблон верхнего уровня, include и extends входят в его время.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
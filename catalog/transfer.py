@@ -0,0 +1,70 @@
+# Общий формат выгрузки для команд export_applications и import_applications
+from contextlib import contextmanager
+
+from django.utils.dateparse import parse_datetime
+
+from .models import Application, ApplicationImage, Category
+
+# Порядок важен: при импорте категории и заявки должны появиться раньше изображений
+EXPORT_FIELDS = {
+    'category': ('id', 'name'),
+    'application': (
+        'id', 'user__username', 'category__name', 'title', 'description', 'status', 'created_at', 'admin_comment',
+    ),
+    'image': (
+        'id', 'application_id', 'image', 'image_type', 'uploaded_at', 'width', 'height', 'thumb_small', 'thumb_medium',
+    ),
+}
+
+EXPORT_QUERYSETS = {
+    'category': lambda: Category.objects.order_by('pk'),
+    'application': lambda: Application.objects.order_by('pk'),
+    'image': lambda: ApplicationImage.objects.order_by('pk'),
+}
+
+CSV_FILES = {
+    'category': 'categories.csv',
+    'application': 'applications.csv',
+    'image': 'images.csv',
+}
+
+DATETIME_FIELDS = {'created_at', 'uploaded_at'}
+NULLABLE_FIELDS = {'admin_comment', 'width', 'height'}
+INTEGER_FIELDS = {'id', 'application_id', 'width', 'height'}
+
+
+def serialize(row):
+    return {
+        name: value.isoformat() if name in DATETIME_FIELDS and value is not None else value
+        for name, value in row.items()
+    }
+
+
+def deserialize(row):
+    """Приводит строку из CSV или JSONL к типам модели"""
+    result = {}
+    for name, value in row.items():
+        if value == '' and name in NULLABLE_FIELDS:
+            value = None
+        elif value is not None and name in INTEGER_FIELDS:
+            value = int(value)
+        elif value and name in DATETIME_FIELDS:
+            value = parse_datetime(value)
+        result[name] = value
+    return result
+
+
+@contextmanager
+def preserve_timestamps():
+    """
+    bulk_create перезаписывает поля с auto_now_add текущим временем.
+    На время импорта отключаем это, чтобы сохранить даты из выгрузки.
+    """
+    fields = [Application._meta.get_field('created_at'), ApplicationImage._meta.get_field('uploaded_at')]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
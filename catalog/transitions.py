@@ -0,0 +1,71 @@
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import INDEX_STATUSES, invalidate_index_context
+from .counters import adjust_counter
+from .models import Application
+
+# Массово заявки можно только принять в работу: для статуса "Выполнено"
+# у каждой заявки должно быть своё изображение дизайна
+BULK_STATUSES = ('in_progress',)
+BULK_BATCH_SIZE = 500
+# Сколько пропущенных заявок перечислять в сообщении
+SKIPPED_SHOWN = 20
+
+
+def bulk_change_status(application_ids, status, comment, batch_size=None):
+    """
+    Переводит заявки в статус status с общим комментарием, если он не пустой.
+
+    Условие Application.can_change_status проверяет сам UPDATE ... WHERE status='new',
+    поэтому заявку, которую уже изменил кто-то другой, запрос не тронет. Все пачки
+    выполняются в одной транзакции. Возвращает список изменённых pk и словарь
+    пропущенных {pk: текущий статус или None, если заявки нет}.
+    """
+    if status not in BULK_STATUSES:
+        raise ValueError(f'Статус {status} нельзя установить массово')
+
+    batch_size = batch_size or BULK_BATCH_SIZE
+    ids = sorted(set(application_ids))
+    # Метка времени отличает строки этого UPDATE и меняет ключи кэша строк в списках
+    now = timezone.now()
+    changes = {'status': status, 'updated_at': now}
+    # Как и при изменении одной заявки, пустой комментарий не затирает прежний
+    if comment:
+        changes['admin_comment'] = comment
+    updated = []
+    with transaction.atomic():
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            Application.objects.filter(pk__in=batch, status='new').update(**changes)
+            # После UPDATE транзакция держит блокировку записи: строки с меткой - изменённые здесь
+            updated += Application.objects.filter(pk__in=batch, status=status, updated_at=now).values_list(
+                'pk', 'category_id',
+            )
+
+        # post_save при update() не вызывается, счётчики и кэш обновляются здесь
+        for category_id, total in Counter(category_id for _, category_id in updated).items():
+            adjust_counter(category_id, 'new', -total)
+            adjust_counter(category_id, status, total)
+        if updated and status in INDEX_STATUSES:
+            transaction.on_commit(invalidate_index_context)
+
+    updated_ids = [pk for pk, _ in updated]
+    rest = sorted(set(ids) - set(updated_ids))
+    skipped = dict.fromkeys(rest)
+    for start in range(0, len(rest), batch_size):
+        skipped.update(Application.objects.filter(pk__in=rest[start:start + batch_size]).values_list('pk', 'status'))
+    return updated_ids, skipped
+
+
+def skipped_message(skipped):
+    """Текст о пропущенных заявках для messages"""
+    labels = dict(Application.STATUS_CHOICES)
+    shown = [
+        f'№{pk} ({labels.get(status, status) if status else "не найдена"})'
+        for pk, status in list(skipped.items())[:SKIPPED_SHOWN]
+    ]
+    more = f' и ещё {len(skipped) - SKIPPED_SHOWN}' if len(skipped) > SKIPPED_SHOWN else ''
+    return f'Пропущено заявок: {len(skipped)}: {", ".join(shown)}{more}'
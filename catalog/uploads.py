@@ -0,0 +1,188 @@
+import hashlib
+import os
+import struct
+import tempfile
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+from .storage import application_storage
+
+ALLOWED_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp']
+ALLOWED_FORMATS = {'.jpg': 'jpeg', '.jpeg': 'jpeg', '.png': 'png', '.bmp': 'bmp'}
+MAX_IMAGE_SIZE = 2097152
+MAX_IMAGE_SIDE = 10000
+
+# Сколько первых байт файла храним для определения формата и размеров
+HEADER_SIZE = 256 * 1024
+# Каталог внутри MEDIA_ROOT: оттуда файл переименовывается на место без копирования
+UPLOAD_TEMP_DIR = '.uploads'
+
+# Сколько байт нужно, чтобы прочитать размеры: PNG - сигнатура и IHDR,
+# BMP - заголовок файла и BITMAPINFOHEADER
+_PNG_MIN_HEADER = 24
+_BMP_MIN_HEADER = 26
+# Маркеры JPEG, после которых идут размеры кадра (SOF0-SOF15, кроме DHT, JPG и DAC)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def read_image_header(header):
+    """
+    Определяет формат и размеры изображения по первым байтам файла, не декодируя пиксели.
+    Возвращает (формат, ширина, высота); неизвестные значения - None.
+    Обрезанный PNG или BMP даёт (None, None, None), JPEG без полного кадра SOF - ('jpeg', None, None).
+    """
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        if len(header) < _PNG_MIN_HEADER or header[12:16] != b'IHDR':
+            return None, None, None
+        width, height = struct.unpack('>II', header[16:24])
+        return 'png', width, height
+
+    if header.startswith(b'BM'):
+        if len(header) < _BMP_MIN_HEADER:
+            return None, None, None
+        dib_size = struct.unpack('<I', header[14:18])[0]
+        if dib_size == 12:
+            width, height = struct.unpack('<HH', header[18:22])
+        else:
+            width, height = struct.unpack('<ii', header[18:26])
+        return 'bmp', abs(width), abs(height)
+
+    if header.startswith(b'\xff\xd8'):
+        position = 2
+        while position + 4 <= len(header):
+            if header[position] != 0xFF:
+                break
+            marker = header[position + 1]
+            if marker == 0xFF:
+                position += 1
+                continue
+            if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+                position += 2
+                continue
+            length = struct.unpack('>H', header[position + 2:position + 4])[0]
+            if marker in _JPEG_SOF_MARKERS and position + 9 <= len(header):
+                height, width = struct.unpack('>HH', header[position + 5:position + 9])
+                return 'jpeg', width, height
+            position += 2 + length
+        return 'jpeg', None, None
+
+    return None, None, None
+
+
+class ValidatedUpload(UploadedFile):
+    """
+    Загруженный файл, уже записанный во временный файл внутри MEDIA_ROOT.
+    Несёт результаты проверки, сделанной во время приёма: хэш, формат и размеры.
+    """
+
+    def __init__(self, path, name, content_type, size, charset, content_type_extra,
+                 sha256=None, image_format=None, width=None, height=None, upload_error=None):
+        super().__init__(open(path, 'rb'), name, content_type, size, charset, content_type_extra)
+        self.path = path
+        self.sha256 = sha256
+        self.image_format = image_format
+        self.image_width = width
+        self.image_height = height
+        self.upload_error = upload_error
+
+    def temporary_file_path(self):
+        return self.path
+
+    def close(self):
+        try:
+            return self.file.close()
+        finally:
+            # После сохранения хранилище уже забрало файл себе
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    Принимает файлы потоком прямо в каталог хранилища.
+
+    По ходу приёма считает SHA-256 (его использует ContentAddressedStorage),
+    прекращает запись, как только файл превысил MAX_IMAGE_SIZE, и определяет
+    формат и размеры по заголовку. Файл целиком в памяти не держится.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        directory = application_storage().path(UPLOAD_TEMP_DIR)
+        os.makedirs(directory, exist_ok=True)
+        extension = os.path.splitext(self.file_name or '')[1].lower()
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix='upload-', suffix=extension)
+        self.file = os.fdopen(fd, 'wb')
+        self.digest = hashlib.sha256()
+        self.header = bytearray()
+        self.size = 0
+        self.oversize = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.oversize:
+            return None
+        if self.size > MAX_IMAGE_SIZE:
+            # Остаток тела дочитываем, но больше ничего не пишем на диск
+            self.oversize = True
+            self.file.truncate(0)
+            return None
+
+        if len(self.header) < HEADER_SIZE:
+            self.header += raw_data[:HEADER_SIZE - len(self.header)]
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.file.close()
+        if self.oversize:
+            return ValidatedUpload(
+                self.path, self.file_name, self.content_type, self.size, self.charset, self.content_type_extra,
+                upload_error='Размер файла не должен превышать 2 МБ',
+            )
+
+        image_format, width, height = read_image_header(bytes(self.header))
+        return ValidatedUpload(
+            self.path, self.file_name, self.content_type, file_size, self.charset, self.content_type_extra,
+            sha256=self.digest.hexdigest(), image_format=image_format, width=width, height=height,
+        )
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+def validate_image_upload(upload):
+    """Проверки загруженного изображения для форм; пиксели не декодируются"""
+    upload_error = getattr(upload, 'upload_error', None)
+    if upload_error:
+        raise ValidationError(upload_error)
+
+    extension = os.path.splitext(upload.name)[1].lower()
+    if extension not in ALLOWED_EXTENSIONS:
+        raise ValidationError(
+            f'Недопустимый формат файла. Разрешенные форматы: {", ".join(ALLOWED_EXTENSIONS)}'
+        )
+    if upload.size > MAX_IMAGE_SIZE:
+        raise ValidationError('Размер файла не должен превышать 2 МБ')
+
+    if hasattr(upload, 'image_format'):
+        image_format, width, height = upload.image_format, upload.image_width, upload.image_height
+    else:
+        # Файл принят другим обработчиком загрузки: читаем только заголовок
+        upload.seek(0)
+        image_format, width, height = read_image_header(upload.read(HEADER_SIZE))
+        upload.seek(0)
+
+    if image_format != ALLOWED_FORMATS[extension]:
+        raise ValidationError('Содержимое файла не соответствует его расширению или не является изображением')
+    if not width or not height:
+        raise ValidationError('Не удалось определить размеры изображения')
+    if max(width, height) > MAX_IMAGE_SIDE:
+        raise ValidationError(f'Сторона изображения не должна превышать {MAX_IMAGE_SIDE} пикселей')
+    return upload
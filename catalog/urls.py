@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.index, name='index'),
@@ -10,4 +10,8 @@ urlpatterns = [
     path('delete-application/<int:pk>/', views.delete_application, name='delete_application'),
     path('admin/applications/', views.admin_application_list, name='admin_application_list'),
     path('admin/applications/<int:pk>/', views.admin_application_detail, name='admin_application_detail'),
+    path('admin/applications/bulk-status/', views.admin_application_bulk_status, name='admin_application_bulk_status'),
+    path('api/applications/', api.applications, name='api_applications'),
+    path('api/categories/', api.categories, name='api_categories'),
+    path('api/status-counts/', api.status_counts, name='api_status_counts'),
 ]
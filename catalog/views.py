@@ -1,17 +1,27 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.views.generic.edit import CreateView
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import Count
 from django.core.files.storage import FileSystemStorage
 from .forms import CustomUserCreationForm, ApplicationForm
 from .models import Application, Category, ApplicationImage
+from .pagination import KeysetPaginator, InvalidCursor
+from .caching import aget_index_context
+from .search import search_applications
+from .jobs import enqueue_on_commit
 from django.contrib.admin.views.decorators import staff_member_required
-from .forms import AdminApplicationForm
+from django.core.exceptions import PermissionDenied
+from .forms import AdminApplicationForm, BulkStatusForm
+from .transitions import bulk_change_status, skipped_message
 from django.contrib.auth.models import User
 from django.contrib.auth import login, authenticate
 from django.views import View
+from django.views.decorators.http import require_POST
+from django.utils.http import url_has_allowed_host_and_scheme
 
 
 # Заменяем CreateView на обычный View
@@ -24,10 +34,8 @@ class RegisterView(View):
 
     def post(self, request):
         form = CustomUserCreationForm(request.POST)
-        if form.is_valid():
-            # Сохраняем пользователя
-            user = form.save()
-
+        # save() возвращает None, если имя или email уже заняты
+        if form.is_valid() and form.save() is not None:
             messages.success(
                 request,
                 'Регистрация прошла успешно! Теперь вы можете войти в систему.'
@@ -38,17 +46,24 @@ class RegisterView(View):
         return render(request, self.template_name, {'form': form})
 
 
-def index(request):
-    completed_applications = Application.objects.filter(
-        status='completed'
-    ).order_by('-created_at')[:4]
-    in_progress_count = Application.objects.filter(status='in_progress').count()
+# Страницы только для чтения - асинхронные: под ASGI ожидание БД не занимает поток.
+# Шаблоны обращаются к request.user, сессии и сообщениям синхронно,
+# поэтому рендеринг выполняется через arender в потоке.
+arender = sync_to_async(render)
+
+
+async def index(request):
+    # Счётчик и карточки выполненных работ берутся из кэша, см. catalog.caching
+    return await arender(request, 'index.html', await aget_index_context())
 
-    context = {
-        'completed_applications': completed_applications,
-        'in_progress_count': in_progress_count,
-    }
-    return render(request, 'index.html', context)
+
+async def paginate_applications(request, applications, per_page=20, ordering=('-created_at', '-id')):
+    # Сортировка (-created_at, -id) совпадает с Meta.ordering, id добавлен для уникальности ключа
+    paginator = KeysetPaginator(applications, ordering=ordering, per_page=per_page)
+    try:
+        return await paginator.apage(request.GET.get('cursor'))
+    except InvalidCursor:
+        return await paginator.apage()
 
 
 @login_required
@@ -62,17 +77,24 @@ def create_application(request):
         form = ApplicationForm(request.POST, request.FILES)
         if form.is_valid():
             try:
-                application = form.save(commit=False)
-                application.user = request.user
-                application.status = 'new'
-                application.save()
-
-                image = request.FILES.get('image')
-                if image:
-                    ApplicationImage.objects.create(
-                        application=application,
-                        image=image
-                    )
+                with transaction.atomic():
+                    application = form.save(commit=False)
+                    application.user = request.user
+                    application.status = 'new'
+                    application.save()
+
+                    image = request.FILES.get('image')
+                    if image:
+                        application_image = ApplicationImage.objects.create(
+                            application=application,
+                            image=image
+                        )
+                        # Обработка картинки уходит воркерам, ответ не ждёт её
+                        enqueue_on_commit(
+                            'process_image',
+                            key=f'process_image:{application_image.pk}',
+                            image_id=application_image.pk,
+                        )
 
                 messages.success(request, 'Заявка успешно создана!')
                 return redirect('my_applications')
@@ -85,23 +107,27 @@ def create_application(request):
 
 
 @login_required
-def my_applications(request):
-    applications = Application.objects.filter(user=request.user)
+async def my_applications(request):
+    user = await request.auser()
+    applications = Application.objects.filter(user=user).with_related()
     status_filter = request.GET.get('status')
 
     if status_filter:
         applications = applications.filter(status=status_filter)
 
+    page = await paginate_applications(request, applications)
+
     context = {
-        'applications': applications,
+        'applications': page.object_list,
+        'page': page,
         'status_filter': status_filter,
     }
-    return render(request, 'catalog/my_applications.html', context)
+    return await arender(request, 'catalog/my_applications.html', context)
 
 
 @login_required
 def delete_application(request, pk):
-    application = get_object_or_404(Application, pk=pk, user=request.user)
+    application = get_object_or_404(Application.objects.with_related(), pk=pk, user=request.user)
 
     if not application.can_be_deleted():
         messages.error(
@@ -119,8 +145,8 @@ def delete_application(request, pk):
 
 
 @staff_member_required
-def admin_application_list(request):
-    applications = Application.objects.all()
+async def admin_application_list(request):
+    applications = Application.objects.with_related()
     status_filter = request.GET.get('status')
 
     if status_filter:
@@ -130,51 +156,106 @@ def admin_application_list(request):
     if category_filter:
         applications = applications.filter(category_id=category_filter)
 
-    categories = Category.objects.all()
+    ordering = ('-created_at', '-id')
+    search_query = request.GET.get('q', '').strip()
+    if search_query:
+        # Наличие индекса FTS5 при первом поиске проверяется запросом к БД
+        applications = await sync_to_async(search_applications)(applications, search_query)
+        ordering = ('search_rank', '-created_at', '-id')
+
+    categories = [category async for category in Category.objects.all()]
+    page = await paginate_applications(request, applications, per_page=50, ordering=ordering)
 
     context = {
-        'applications': applications,
+        'applications': page.object_list,
+        'page': page,
         'categories': categories,
         'status_filter': status_filter,
         'category_filter': category_filter,
+        'search_query': search_query,
+        'bulk_form': BulkStatusForm(),
     }
-    return render(request, 'catalog/admin_application_list.html', context)
+    return await arender(request, 'catalog/admin_application_list.html', context)
 
 
 @staff_member_required
-def admin_application_detail(request, pk):
-    application = get_object_or_404(Application, pk=pk)
+async def admin_application_detail(request, pk):
+    application = await aget_object_or_404(Application.objects.with_related(), pk=pk)
 
     if request.method == 'POST':
-        form = AdminApplicationForm(request.POST, request.FILES)
-        if form.is_valid():
-            if not application.can_change_status():
-                messages.error(request, 'Нельзя изменить статус заявки, которая уже в работе или выполнена')
-                return redirect('admin_application_detail', pk=pk)
+        # Изменение статуса с загрузкой файла и транзакцией остаётся синхронным
+        return await sync_to_async(change_application_status)(request, application)
+
+    form = AdminApplicationForm(initial={'status': application.status})
+    context = {
+        'application': application,
+        'form': form,
+    }
+    return await arender(request, 'catalog/admin_application_detail.html', context)
 
-            new_status = form.cleaned_data['status']
-            application.status = new_status
 
-            if form.cleaned_data.get('comment'):
-                application.admin_comment = form.cleaned_data['comment']
+def change_application_status(request, application):
+    form = AdminApplicationForm(request.POST, request.FILES)
+    if form.is_valid():
+        if not application.can_change_status():
+            messages.error(request, 'Нельзя изменить статус заявки, которая уже в работе или выполнена')
+            return redirect('admin_application_detail', pk=application.pk)
 
+        new_status = form.cleaned_data['status']
+        application.status = new_status
+
+        if form.cleaned_data.get('comment'):
+            application.admin_comment = form.cleaned_data['comment']
+
+        with transaction.atomic():
             application.save()
 
             design_image = form.cleaned_data.get('design_image')
             if design_image and new_status == 'completed':
-                ApplicationImage.objects.create(
+                application_image = ApplicationImage.objects.create(
                     application=application,
                     image=design_image,
                     image_type='design'
                 )
+                enqueue_on_commit(
+                    'process_image',
+                    key=f'process_image:{application_image.pk}',
+                    image_id=application_image.pk,
+                )
 
-            messages.success(request, f'Статус заявки успешно изменен на "{application.get_status_display()}"')
-            return redirect('admin_application_list')
-    else:
-        form = AdminApplicationForm(initial={'status': application.status})
+        messages.success(request, f'Статус заявки успешно изменен на "{application.get_status_display()}"')
+        return redirect('admin_application_list')
 
     context = {
         'application': application,
         'form': form,
     }
-    return render(request, 'catalog/admin_application_detail.html', context)
\ No newline at end of file
+    return render(request, 'catalog/admin_application_detail.html', context)
+
+
+@staff_member_required
+@require_POST
+def admin_application_bulk_status(request):
+    """Изменение статуса сразу у всех отмеченных в списке заявок"""
+    # staff_member_required пускает и сотрудников с правом только на просмотр
+    if not request.user.has_perm('catalog.change_application'):
+        raise PermissionDenied
+    next_url = request.POST.get('next')
+    if not url_has_allowed_host_and_scheme(next_url, {request.get_host()}, request.is_secure()):
+        next_url = reverse('admin_application_list')
+
+    ids = [int(pk) for pk in request.POST.getlist('applications') if pk.isdigit()]
+    form = BulkStatusForm(request.POST)
+    if not ids:
+        messages.error(request, 'Не выбрано ни одной заявки')
+    elif not form.is_valid():
+        for errors in form.errors.values():
+            messages.error(request, ' '.join(errors))
+    else:
+        updated, skipped = bulk_change_status(ids, form.cleaned_data['status'], form.cleaned_data['comment'])
+        if updated:
+            status = dict(Application.STATUS_CHOICES)[form.cleaned_data['status']]
+            messages.success(request, f'Статус "{status}" установлен у заявок: {len(updated)}')
+        if skipped:
+            messages.warning(request, skipped_message(skipped))
+    return redirect(next_url)
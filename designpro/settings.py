@@ -1,6 +1,7 @@
 
 from pathlib import Path
 import os
+import tempfile
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -20,24 +21,35 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'catalog.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'catalog.middleware.PrecompressedStaticMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'catalog.middleware.ReadOnlyRequestMiddleware',
 ]
 
 ROOT_URLCONF = 'designpro.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени рендеринга для Server-Timing
+        'BACKEND': 'catalog.timing.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates']
         ,
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Скомпилированные шаблоны хранятся в памяти процесса.
+            # В DEBUG автоперезагрузчик сбрасывает кэш при изменении файлов шаблонов
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -50,6 +62,11 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'designpro.wsgi.application'
 
+# Заголовок Server-Timing: время БД, шаблонов и файлового хранилища по каждому запросу.
+# Доля запросов, которые дополнительно пишутся в лог catalog.timing
+SERVER_TIMING = os.environ.get('DESIGNPRO_SERVER_TIMING', '1' if DEBUG else '0') == '1'
+SERVER_TIMING_LOG_SAMPLE_RATE = float(os.environ.get('DESIGNPRO_SERVER_TIMING_SAMPLE_RATE', '0'))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -57,6 +74,127 @@ DATABASES = {
     }
 }
 
+# Профиль БД для нагрузки: DESIGNPRO_DB_PROFILE=production.
+# WAL позволяет читать во время записи, synchronous=NORMAL в режиме WAL
+# не теряет целостность при сбое процесса, busy_timeout заставляет ждать
+# блокировку вместо ошибки "database is locked", а BEGIN IMMEDIATE берёт
+# блокировку записи сразу и исключает взаимоблокировку при её повышении.
+# Сравнение профилей под нагрузкой: manage.py stress_sqlite
+DB_PROFILE = os.environ.get('DESIGNPRO_DB_PROFILE', 'development')
+
+SQLITE_PRODUCTION_PRAGMAS = (
+    'PRAGMA journal_mode=WAL;'
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA busy_timeout=5000;'
+    'PRAGMA cache_size=-20000;'
+    'PRAGMA mmap_size=134217728;'
+    'PRAGMA temp_store=MEMORY;'
+)
+
+if DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'OPTIONS': {
+            'init_command': SQLITE_PRODUCTION_PRAGMAS,
+            'transaction_mode': 'IMMEDIATE',
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    })
+    # Тот же файл, открытый только для чтения: GET-запросы читают через него,
+    # см. catalog.routers. В тестах это зеркало основной БД
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{BASE_DIR / "db.sqlite3"}?mode=ro',
+        'OPTIONS': {
+            'init_command': 'PRAGMA query_only=1;PRAGMA busy_timeout=5000;PRAGMA cache_size=-20000;'
+                            'PRAGMA mmap_size=134217728;',
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['catalog.routers.ReadReplicaRouter']
+
+# Тесты получают файловые кэши во временном каталоге, см. catalog.testing
+TEST_RUNNER = 'catalog.testing.TestRunner'
+
+# Кэш по умолчанию должен быть общим для всех процессов: в нём лежат номер
+# поколения главной страницы (его увеличивают и веб-воркеры, и runworkers,
+# и команды manage.py), фрагменты строк списков и закэшированные COUNT(*).
+# Файловый кэш общий для процессов на одной машине; add и incr в нём выполняются
+# под блокировкой файла (catalog.filecache), поэтому номер поколения не теряет
+# увеличений, а блокировку пересчёта получает один воркер. Для нескольких машин
+# нужен Redis или Memcached: там эти операции атомарны сами по себе.
+# locmem (DESIGNPRO_CACHE=locmem) подходит только для одного процесса:
+# инвалидация из другого процесса до него не дойдёт, и главная страница
+# останется устаревшей до INDEX_TIMEOUT
+CACHES = {
+    'default': {
+        'BACKEND': 'catalog.filecache.LockingFileBasedCache',
+        'LOCATION': os.environ.get(
+            'DESIGNPRO_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'designpro-cache'),
+        ),
+    } if os.environ.get('DESIGNPRO_CACHE', 'file') == 'file' else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Кэш сессий профиля cached_db. Файловый кэш общий для всех воркеров
+    # на одной машине; locmem (DESIGNPRO_SESSION_CACHE=locmem) подходит только
+    # для одного процесса, иначе воркер может прочитать устаревшую копию сессии.
+    # Потеря кэша безопасна: cached_db дочитает сессию из БД
+    'sessions': {
+        'BACKEND': 'catalog.filecache.LockingFileBasedCache',
+        'LOCATION': os.environ.get(
+            'DESIGNPRO_SESSION_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'designpro-sessions'),
+        ),
+    } if os.environ.get('DESIGNPRO_SESSION_CACHE', 'file') == 'file' else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+    },
+}
+
+# Хранение сессий и сообщений: DESIGNPRO_SESSION_PROFILE.
+# db - сессия читается из django_session в каждом запросе (по умолчанию);
+# cached_db - чтение из кэша sessions, запись в кэш и БД;
+# signed_cookies - сессия в подписанной cookie, БД не используется совсем.
+# Данные такой cookie видны клиенту (подпись защищает только от подделки),
+# а выход не отзывает уже выданную cookie до истечения срока.
+# В cached_db и signed_cookies сообщения хранятся только в cookie и не трогают сессию.
+# Сравнение числа запросов: manage.py benchmark --session-profile <профиль>;
+# просроченные сессии удаляет manage.py clear_expired_sessions
+SESSION_PROFILES = {
+    'db': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'MESSAGE_STORAGE': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    },
+    'cached_db': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'MESSAGE_STORAGE': 'django.contrib.messages.storage.cookie.CookieStorage',
+    },
+    'signed_cookies': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies',
+        'MESSAGE_STORAGE': 'django.contrib.messages.storage.cookie.CookieStorage',
+    },
+}
+SESSION_PROFILE = os.environ.get('DESIGNPRO_SESSION_PROFILE', 'db')
+SESSION_ENGINE = SESSION_PROFILES[SESSION_PROFILE]['SESSION_ENGINE']
+MESSAGE_STORAGE = SESSION_PROFILES[SESSION_PROFILE]['MESSAGE_STORAGE']
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Стоимость хэширования пароля: число итераций PBKDF2 (DESIGNPRO_PASSWORD_ITERATIONS).
+# Без переменной используется значение Django. Хэши с другим числом итераций
+# проверяются как обычно и пересчитываются при следующем входе.
+# Регистраций в секунду при текущем значении: manage.py benchmark_signups
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('DESIGNPRO_PASSWORD_ITERATIONS', 0)) or None
+
+PASSWORD_HASHERS = [
+    'catalog.accounts.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -82,6 +220,22 @@ USE_L10N = True
 USE_TZ = True
 
 STATIC_URL = '/static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Без DEBUG статика собирается collectstatic с хэшем содержимого в именах,
+# рядом пишутся .gz и .br (brotli - если установлен пакет brotli).
+# Отдаёт её catalog.middleware.PrecompressedStaticMiddleware
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'catalog.staticfiles.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_REDIRECT_URL = '/catalog/profile/'
@@ -91,4 +245,6 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 FILE_UPLOAD_MAX_MEMORY_SIZE = 2097152  # 2MB
+# Файлы пишутся потоком сразу в MEDIA_ROOT с проверкой размера и заголовка, см. catalog.uploads
+FILE_UPLOAD_HANDLERS = ['catalog.uploads.ImageUploadHandler']
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
\ No newline at end of file